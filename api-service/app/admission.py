@@ -0,0 +1,183 @@
+import json
+import math
+import time
+from collections import deque
+from contextvars import ContextVar
+from typing import Deque, Dict, Optional, Sequence, Tuple
+from starlette.types import ASGIApp, Receive, Scope, Send
+from app.slots import SlotQueue
+
+# Path prefixes and the route class that limits them, first match wins.
+# Paths not listed (cheap reads, health checks, live streams) are never queued.
+# /insights is bounded by the LLMScheduler alone, whose deadline covers the
+# whole call; a second queue in front of it would only shorten that deadline.
+ROUTE_CLASSES: Tuple[Tuple[str, str], ...] = (
+    ("/overview", "heavy"),
+    ("/weather/historical", "heavy"),
+    ("/weather/analytics", "heavy"),
+    ("/weather/nearby", "heavy"),
+)
+
+# Route class of the request being handled, "" outside any gate. Lets
+# DatabaseService run the queries of heavy routes on their own threads.
+current_route_class: ContextVar[str] = ContextVar("current_route_class", default="")
+
+
+class AdmissionGate:
+    """
+    Concurrency limit for one class of routes.
+
+    Up to max_concurrency requests run at once; the next max_queue_depth wait
+    in FIFO order for at most queue_timeout seconds. Anything beyond that is
+    shed immediately, so a burst on an expensive route cannot occupy the
+    worker and slow down every other endpoint.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_concurrency: int,
+        max_queue_depth: int,
+        queue_timeout: float,
+        window: int = 500
+    ):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.max_queue_depth = max_queue_depth
+        self.queue_timeout = queue_timeout
+        self.slots = SlotQueue(max_concurrency)
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.queue_waits: Deque[float] = deque(maxlen=window)
+        self.service_times: Deque[float] = deque(maxlen=window)
+
+    @property
+    def running(self) -> int:
+        """Requests holding a slot"""
+        return self.slots.running
+
+    @property
+    def queue_depth(self) -> int:
+        """Requests waiting for a slot"""
+        return self.slots.queue_depth
+
+    def retry_after(self) -> int:
+        """Seconds until a slot is likely to be free, from recent service times"""
+        if not self.service_times:
+            return 1
+        average = sum(self.service_times) / len(self.service_times)
+        return max(1, math.ceil(average * (self.queue_depth + 1) / self.max_concurrency))
+
+    async def acquire(self) -> Optional[float]:
+        """
+        Wait for a slot
+
+        Returns:
+            Seconds spent queued, or None if the request was shed
+        """
+        started = time.perf_counter()
+        if self.slots.must_wait and self.queue_depth >= self.max_queue_depth:
+            self.rejected += 1
+            return None
+        if not await self.slots.acquire(self.queue_timeout):
+            self.timed_out += 1
+            return None
+
+        waited = time.perf_counter() - started
+        self.admitted += 1
+        self.queue_waits.append(waited)
+        return waited
+
+    def release(self) -> None:
+        """Give the slot back"""
+        self.slots.release()
+
+    def report(self) -> dict:
+        """Counters and queue-time percentiles"""
+        waits = sorted(self.queue_waits)
+
+        def percentile(fraction: float) -> Optional[float]:
+            if not waits:
+                return None
+            return round(waits[int(fraction * (len(waits) - 1))] * 1000, 2)
+
+        return {
+            "running": self.running,
+            "queued": self.queue_depth,
+            "max_concurrency": self.max_concurrency,
+            "max_queue_depth": self.max_queue_depth,
+            "queue_timeout_seconds": self.queue_timeout,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "queue_wait_p50_ms": percentile(0.5),
+            "queue_wait_p95_ms": percentile(0.95),
+            "queue_wait_p99_ms": percentile(0.99),
+            "avg_service_ms": (
+                round(sum(self.service_times) / len(self.service_times) * 1000, 2)
+                if self.service_times else None
+            )
+        }
+
+
+class AdmissionControlMiddleware:
+    """
+    Route requests through the AdmissionGate of their route class and answer
+    503 with Retry-After when the class is saturated. Requests are shed
+    before any routing or database work is done.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        gates: Dict[str, AdmissionGate],
+        route_classes: Sequence[Tuple[str, str]] = ROUTE_CLASSES
+    ):
+        self.app = app
+        self.gates = gates
+        self.route_classes = route_classes
+
+    def gate_for(self, path: str) -> Optional[AdmissionGate]:
+        """AdmissionGate limiting a path, or None if it is not limited"""
+        for prefix, route_class in self.route_classes:
+            if path.startswith(prefix):
+                return self.gates.get(route_class)
+        return None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        gate = self.gate_for(scope["path"]) if scope["type"] == "http" else None
+        if gate is None:
+            await self.app(scope, receive, send)
+            return
+
+        waited = await gate.acquire()
+        if waited is None:
+            await self._shed(gate, send)
+            return
+
+        started = time.perf_counter()
+        token = current_route_class.set(gate.name)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            current_route_class.reset(token)
+            gate.service_times.append(time.perf_counter() - started)
+            gate.release()
+
+    @staticmethod
+    async def _shed(gate: AdmissionGate, send: Send) -> None:
+        """Send a 503 telling the client when to retry"""
+        body = json.dumps({
+            "detail": f"Too many {gate.name} requests in progress, try again shortly"
+        }).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 503,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(gate.retry_after()).encode())
+            ]
+        })
+        await send({"type": "http.response.body", "body": body})
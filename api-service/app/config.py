@@ -20,13 +20,94 @@ class Settings(BaseSettings):
 
     # OpenAI Configuration (for LangGraph)
     openai_api_key: str = ""
+    llm_model: str = "gpt-4o-mini"
+    llm_max_concurrency: int = 4
+    llm_max_queue_depth: int = 20
+    llm_deadline_seconds: float = 20.0
+    # USD per million tokens, for cost reporting
+    llm_prompt_price_per_million: float = 0.15
+    llm_completion_price_per_million: float = 0.60
 
     # CORS
     cors_origins: List[str] = ["http://localhost:3000", "http://localhost:3001"]
 
+    # HTTP caching for read endpoints
+    cache_max_age_seconds: int = 60
+    cache_stale_while_revalidate_seconds: int = 300
+
+    # Upstream resilience
+    upstream_timeout_seconds: float = 10.0
+    upstream_fresh_seconds: int = 60
+    upstream_stale_seconds: int = 900
+    upstream_cache_size: int = 1000
+    breaker_failure_threshold: int = 5
+    breaker_reset_seconds: float = 30.0
+    upstream_hedge_enabled: bool = False
+    upstream_hedge_percentile: float = 0.95
+    upstream_hedge_min_delay_ms: int = 50
+    upstream_hedge_min_samples: int = 20
+
+    # Current/forecast payload cache shared by all workers on a host
+    snapshot_enabled: bool = True
+    snapshot_path: str = "/dev/shm/weather-api-snapshot"
+    snapshot_slots: int = 2048
+    snapshot_slot_bytes: int = 32768
+    forecast_cache_seconds: int = 600
+
+    # Shared upstream request budget (upstream_quota table)
+    quota_enabled: bool = True
+    quota_bucket: str = "openweathermap"
+    quota_chunk_size: int = 5
+
+    # Spatial index for /weather/nearby
+    city_index_cell_degrees: float = 1.0
+    city_index_refresh_seconds: int = 300
+    nearby_max_radius_km: float = 500.0
+
+    # Per-worker admission control by route class, see app/admission.py.
+    # Requests beyond concurrency + queue, or queued past the timeout, get 503.
+    # /insights is limited by the llm_* settings above instead.
+    admission_enabled: bool = True
+    admission_heavy_concurrency: int = 16
+    admission_heavy_queue_depth: int = 32
+    admission_heavy_queue_timeout_seconds: float = 2.0
+    # Database threads for heavy routes, separate from the default executor
+    # so a full heavy gate cannot starve cheap reads of threads
+    db_heavy_threads: int = 8
+
+    # City overview: per-section timeout
+    overview_section_timeout_seconds: float = 8.0
+
+    # Reuse generated daily summaries for this long
+    insight_cache_seconds: int = 3600
+
+    # Responses smaller than this are sent uncompressed
+    gzip_minimum_size: int = 1000
+
+    # Live updates (SSE / WebSocket)
+    live_queue_size: int = 100
+    live_heartbeat_seconds: float = 15.0
+    live_max_cities: int = 50
+
+    # City demand reporting for adaptive collection
+    demand_flush_seconds: int = 60
+
     # Database
     database_url: str = ""
 
+    # Admin endpoints (/admin/*) require this in X-Admin-Token; disabled when empty
+    admin_token: str = ""
+
+    # Per-request profiling, see app/profiling.py. When enabled, requests
+    # with "X-Profile: 1" and a valid X-Admin-Token are profiled, plus a
+    # random profiling_sample_rate fraction of all requests.
+    profiling_enabled: bool = False
+    profiling_sample_rate: float = 0.0
+    profiling_interval_ms: float = 5.0
+    profiling_max_concurrent: int = 2
+    profiling_dir: str = ""
+    profiling_max_profiles: int = 50
+
     model_config = SettingsConfigDict(
         env_file=".env",
         env_file_encoding="utf-8",
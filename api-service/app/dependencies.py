@@ -0,0 +1,61 @@
+from typing import Optional
+from fastapi import Header, HTTPException, Request
+from app.config import settings
+from app.profiling import ProfileStore, is_admin_token
+from app.services.database import DatabaseService
+from app.services.weather_api import WeatherAPIService
+from app.services.ai_insights import AIInsightsService
+from app.services.live_updates import LiveUpdateBroker
+from app.services.demand import DemandTracker
+from app.services.overview import CityOverviewService
+
+
+def get_db_service(request: Request) -> DatabaseService:
+    """Shared DatabaseService created in the application lifespan"""
+    return request.app.state.db_service
+
+
+def get_weather_api(request: Request) -> WeatherAPIService:
+    """Shared WeatherAPIService created in the application lifespan"""
+    return request.app.state.weather_api
+
+
+def get_ai_insights(request: Request) -> AIInsightsService:
+    """Shared AIInsightsService created in the application lifespan"""
+    return request.app.state.ai_insights
+
+
+def get_live_broker(request: Request) -> LiveUpdateBroker:
+    """Shared LiveUpdateBroker created in the application lifespan"""
+    return request.app.state.live_broker
+
+
+def get_demand_tracker(request: Request) -> DemandTracker:
+    """Shared DemandTracker created in the application lifespan"""
+    return request.app.state.demand_tracker
+
+
+def get_overview_service(request: Request) -> CityOverviewService:
+    """Shared CityOverviewService created in the application lifespan"""
+    return request.app.state.overview
+
+
+def track_city_demand(city_id: int, request: Request) -> None:
+    """Count a request for the city in the path towards its collection priority"""
+    request.app.state.demand_tracker.record(city_id)
+
+
+def require_admin(x_admin_token: Optional[str] = Header(None)) -> None:
+    """Reject requests without the configured admin token"""
+    if not settings.admin_token:
+        raise HTTPException(status_code=404, detail="Admin endpoints are disabled")
+    if not is_admin_token(x_admin_token, settings.admin_token):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+
+def get_profile_store(request: Request) -> ProfileStore:
+    """ProfileStore created when profiling is enabled"""
+    store = getattr(request.app.state, "profile_store", None)
+    if store is None:
+        raise HTTPException(status_code=404, detail="Profiling is disabled")
+    return store
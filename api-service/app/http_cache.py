@@ -0,0 +1,146 @@
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Optional
+from fastapi import Request, Response
+from starlette.middleware.gzip import GZipMiddleware
+from starlette.types import Receive, Scope, Send
+from app.config import settings
+
+# Opt-in compact representation for record lists, see RecordBatch.to_compact
+COMPACT_MEDIA_TYPE = "application/vnd.weather.compact+json"
+
+
+def make_etag(*parts) -> str:
+    """
+    Build a weak ETag from the values that determine a response body
+
+    Args:
+        parts: Values such as city id, latest record id and query parameters
+
+    Returns:
+        Quoted weak ETag string
+    """
+    digest = hashlib.sha1("|".join(str(part) for part in parts).encode()).hexdigest()
+    return f'W/"{digest[:20]}"'
+
+
+def _as_utc(value: datetime) -> datetime:
+    """Treat naive datetimes as UTC so they can be sent in HTTP headers"""
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def cache_headers(
+    etag: str,
+    last_modified: Optional[datetime] = None,
+    max_age: Optional[int] = None
+) -> dict:
+    """
+    Build validator and Cache-Control headers for a read endpoint
+
+    Args:
+        etag: ETag for the response
+        last_modified: Timestamp of the newest record the response depends on
+        max_age: Freshness lifetime in seconds, defaults to settings
+
+    Returns:
+        Dictionary of response headers
+    """
+    if max_age is None:
+        max_age = settings.cache_max_age_seconds
+
+    headers = {
+        "ETag": etag,
+        "Cache-Control": (
+            f"public, max-age={max_age}, "
+            f"stale-while-revalidate={settings.cache_stale_while_revalidate_seconds}"
+        )
+    }
+    if last_modified is not None:
+        headers["Last-Modified"] = format_datetime(_as_utc(last_modified), usegmt=True)
+
+    return headers
+
+
+def is_not_modified(
+    request: Request,
+    etag: str,
+    last_modified: Optional[datetime] = None
+) -> bool:
+    """
+    Check the request's validators against the current representation
+
+    If-None-Match takes precedence over If-Modified-Since, as in RFC 9110.
+
+    Args:
+        request: Incoming request
+        etag: Current ETag
+        last_modified: Current Last-Modified timestamp
+
+    Returns:
+        True when the client's cached copy is still valid
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        candidates = [tag.strip() for tag in if_none_match.split(",")]
+        weak = etag.removeprefix("W/")
+        return "*" in candidates or any(
+            tag.removeprefix("W/") == weak for tag in candidates
+        )
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        return _as_utc(last_modified).replace(microsecond=0) <= _as_utc(since)
+
+    return False
+
+
+def not_modified_response(headers: dict) -> Response:
+    """Empty 304 response carrying the current validators"""
+    return Response(status_code=304, headers=headers)
+
+
+def accepts_media_type(request: Request, media_type: str) -> bool:
+    """
+    Check whether the client explicitly listed a media type in Accept
+
+    Args:
+        request: Incoming request
+        media_type: Media type to look for
+
+    Returns:
+        True when Accept names the media type with a non-zero q value
+    """
+    for entry in request.headers.get("accept", "").split(","):
+        name, *params = [part.strip() for part in entry.split(";")]
+        if name.lower() != media_type:
+            continue
+        for param in params:
+            key, _, value = param.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    return float(value) > 0
+                except ValueError:
+                    return False
+        return True
+    return False
+
+
+class StreamingSafeGZipMiddleware(GZipMiddleware):
+    """GZip responses, except live update streams which must not be buffered"""
+
+    def __init__(self, app, minimum_size: int = 500, excluded_prefixes: tuple = ("/live",)):
+        super().__init__(app, minimum_size=minimum_size)
+        self.excluded_prefixes = excluded_prefixes
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http" and scope["path"].startswith(self.excluded_prefixes):
+            await self.app(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
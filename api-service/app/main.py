@@ -1,14 +1,101 @@
-from fastapi import FastAPI
+import os
+import tempfile
+import time
+
+_import_started = time.perf_counter()
+
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from app.config import settings
-from app.routers import weather, cities, insights, demo
+from app.admission import AdmissionControlMiddleware, AdmissionGate
+from app.http_cache import StreamingSafeGZipMiddleware
+from app.profiling import ProfileStore, RequestProfilingMiddleware
+from app.routers import weather, cities, insights, demo, live, overview, admin
+from app.services.database import DatabaseService
+from app.services.weather_api import WeatherAPIService
+from app.services.snapshot_cache import LocalSnapshotCache, SharedSnapshotCache
+from app.services.ai_insights import AIInsightsService
+from app.services.live_updates import LiveUpdateBroker
+from app.services.demand import DemandTracker
+from app.services.overview import CityOverviewService
+
+_import_finished = time.perf_counter()
+
+
+def create_snapshot_cache():
+    """Shared-memory payload cache, or a per-worker one if it cannot be created"""
+    if settings.snapshot_enabled:
+        path = settings.snapshot_path
+        if not os.path.isdir(os.path.dirname(path)):
+            path = os.path.join(tempfile.gettempdir(), os.path.basename(path))
+        try:
+            return SharedSnapshotCache(path, settings.snapshot_slots, settings.snapshot_slot_bytes)
+        except OSError as e:
+            print(f"Shared snapshot cache unavailable, using per-worker cache: {e}")
+    return LocalSnapshotCache(settings.upstream_cache_size)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Create shared services once per worker and report cold-start cost"""
+    services_started = time.perf_counter()
+
+    db_service = DatabaseService()
+    app.state.db_service = db_service
+    app.state.snapshot_cache = create_snapshot_cache()
+    app.state.live_broker = LiveUpdateBroker()
+    app.state.weather_api = WeatherAPIService(
+        db_service, app.state.snapshot_cache, app.state.live_broker
+    )
+    app.state.ai_insights = AIInsightsService(db_service)
+    app.state.overview = CityOverviewService(db_service, app.state.weather_api, app.state.ai_insights)
+    await app.state.live_broker.start()
+    app.state.demand_tracker = DemandTracker(db_service)
+    await app.state.demand_tracker.start()
+
+    services_finished = time.perf_counter()
+    app.state.startup_report = {
+        "pid": os.getpid(),
+        "import_ms": round((_import_finished - _import_started) * 1000, 2),
+        "services_ms": round((services_finished - services_started) * 1000, 2),
+        "total_ms": round((services_finished - _import_started) * 1000, 2)
+    }
+    report = app.state.startup_report
+    print(
+        f"Worker {report['pid']} started in {report['total_ms']}ms "
+        f"(imports {report['import_ms']}ms, services {report['services_ms']}ms)"
+    )
+
+    yield
+
+    await app.state.demand_tracker.stop()
+    await app.state.live_broker.stop()
+    await app.state.weather_api.aclose()
+    app.state.snapshot_cache.close()
+    db_service.close()
+
 
 app = FastAPI(
     title=settings.app_name,
     version=settings.app_version,
-    description="Weather API Service with AI-powered insights using LangGraph and Pydantic"
+    description="Weather API Service with AI-powered insights using LangGraph and Pydantic",
+    lifespan=lifespan
 )
 
+# Shed load per route class; inside CORS so 503s still carry CORS headers
+app.state.admission_gates = {}
+if settings.admission_enabled:
+    app.state.admission_gates = {
+        "heavy": AdmissionGate(
+            "heavy",
+            settings.admission_heavy_concurrency,
+            settings.admission_heavy_queue_depth,
+            settings.admission_heavy_queue_timeout_seconds
+        )
+    }
+    app.add_middleware(AdmissionControlMiddleware, gates=app.state.admission_gates)
+
 # Configure CORS
 app.add_middleware(
     CORSMiddleware,
@@ -18,11 +105,32 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress responses; live update streams are left alone
+app.add_middleware(StreamingSafeGZipMiddleware, minimum_size=settings.gzip_minimum_size)
+
+# Per-request profiling; outermost, so middleware and serialization are included
+if settings.profiling_enabled:
+    app.state.profile_store = ProfileStore(
+        settings.profiling_dir or os.path.join(tempfile.gettempdir(), "weather-api-profiles"),
+        settings.profiling_max_profiles
+    )
+    app.add_middleware(
+        RequestProfilingMiddleware,
+        store=app.state.profile_store,
+        admin_token=settings.admin_token,
+        sample_rate=settings.profiling_sample_rate,
+        interval_ms=settings.profiling_interval_ms,
+        max_concurrent=settings.profiling_max_concurrent
+    )
+
 # Include routers
 app.include_router(weather.router)
 app.include_router(cities.router)
 app.include_router(insights.router)
 app.include_router(demo.router)
+app.include_router(live.router)
+app.include_router(overview.router)
+app.include_router(admin.router)
 
 
 @app.get("/")
@@ -35,15 +143,47 @@ async def root():
         "endpoints": {
             "weather": "/weather",
             "cities": "/cities",
-            "insights": "/insights"
+            "insights": "/insights",
+            "live": "/live/weather",
+            "overview": "/overview/{city_id}"
         }
     }
 
 
 @app.get("/health")
-async def health_check():
+async def health_check(request: Request):
     """Health check endpoint"""
-    return {"status": "healthy"}
+    return {
+        "status": "healthy",
+        "upstream": request.app.state.weather_api.breaker.state
+    }
+
+
+@app.get("/health/admission")
+async def admission_report(request: Request):
+    """Admission control state and queue times per route class, for this worker"""
+    return {
+        "enabled": settings.admission_enabled,
+        "classes": {name: gate.report() for name, gate in request.app.state.admission_gates.items()}
+    }
+
+
+@app.get("/health/startup")
+async def startup_report(request: Request):
+    """Cold-start timings for the worker serving this request"""
+    return request.app.state.startup_report
+
+
+@app.get("/health/quota")
+async def upstream_quota(request: Request):
+    """Remaining shared OpenWeatherMap budget and grant/deny counts per priority"""
+    quota = request.app.state.weather_api.quota
+    if not quota:
+        return {"enabled": False}
+    try:
+        return {"enabled": True, **quota.status()}
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=f"Quota status unavailable: {e}")
 
 
 if __name__ == "__main__":
@@ -54,3 +194,4 @@ if __name__ == "__main__":
         port=8000,
         reload=settings.debug
     )
+
@@ -1,6 +1,7 @@
 from datetime import datetime
-from typing import Optional, List
+from typing import Any, Dict, Literal, Optional, List
 from pydantic import BaseModel, Field
+from weather_common.models import WeatherRecord
 
 
 class Coordinates(BaseModel):
@@ -114,32 +115,20 @@ class ForecastResponse(BaseModel):
     city: City
 
 
-class WeatherRecord(BaseModel):
-    """Database model for storing weather records"""
-    id: Optional[int] = None
-    city_id: int
-    city_name: str
-    country: str
-    latitude: float
-    longitude: float
-    temperature: float
-    feels_like: float
-    temp_min: float
-    temp_max: float
-    pressure: int
-    humidity: int
-    wind_speed: float
-    wind_direction: int
-    cloudiness: int
-    visibility: int
-    weather_main: str
-    weather_description: str
-    weather_icon: str
-    recorded_at: datetime
-    created_at: Optional[datetime] = None
+class ForecastSeries(BaseModel):
+    """5-day forecast as one array per field, aligned with dt"""
+    city: City
+    cnt: int = Field(..., description="Number of forecast steps")
+    dt: List[int] = Field(..., description="Forecast times, unix UTC")
+    series: Dict[str, List[Any]] = Field(..., description="Requested fields, one value per forecast step")
 
-    class Config:
-        from_attributes = True
+
+class HistoryMarker(BaseModel):
+    """Summary of the weather records a response reads, used for cache validation"""
+    row_count: int
+    latest_recorded_at: datetime
+    oldest_recorded_at: datetime
+    last_written_at: datetime
 
 
 class CityModel(BaseModel):
@@ -178,3 +167,34 @@ class WeatherAnalytics(BaseModel):
     avg_wind_speed: float
     most_common_condition: str
     total_records: int
+
+
+class OverviewSection(BaseModel):
+    """One independently fetched part of a city overview"""
+    status: Literal["ok", "empty", "error"]
+    data: Optional[Any] = None
+    error: Optional[str] = None
+    elapsed_ms: float
+
+
+class CityOverview(BaseModel):
+    """Everything a city page needs, gathered server-side"""
+    city: CityModel
+    generated_at: datetime
+    sections: Dict[str, OverviewSection]
+
+
+class NearbyCityWeather(BaseModel):
+    """A city near the requested point with its latest observation"""
+    city: CityModel
+    distance_km: float
+    weather: Optional[WeatherRecord] = None
+
+
+class NearbyWeatherResponse(BaseModel):
+    """Cities within a radius of a point, nearest first"""
+    lat: float
+    lon: float
+    radius_km: float
+    index_ms: float = Field(..., description="Time spent in the spatial index lookup")
+    cities: List[NearbyCityWeather]
@@ -0,0 +1,275 @@
+import asyncio
+import hmac
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timezone
+from typing import List, Optional, Tuple
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+PROFILE_ID_PATTERN = re.compile(r"^[0-9a-f]{16}$")
+
+# Leaf label for samples taken while the request was waiting on I/O
+AWAITING = "[awaiting]"
+
+
+def _frame_label(frame) -> str:
+    """module:qualified.name for a frame, safe for folded-stack lines"""
+    code = frame.f_code
+    name = getattr(code, "co_qualname", code.co_name)
+    module = frame.f_globals.get("__name__", "?")
+    return f"{module}:{name}".replace(";", ",").replace(" ", "_")
+
+
+class RequestSampler:
+    """
+    Samples the stack of one in-flight request from a background thread.
+
+    Only frames below the request's own middleware frame are recorded, so
+    concurrent requests on the same event loop do not leak into the profile.
+    When the request is not running it is suspended on an await; those
+    samples record the chain of awaiting coroutines, ending in [awaiting], so
+    the profile covers wall time spent on upstream calls as well as CPU.
+    Work handed to other threads (asyncio.to_thread, sync dependencies) is
+    not attributed.
+    """
+
+    def __init__(self, root_frame, task: Optional[asyncio.Task], interval_seconds: float):
+        self.root_frame = root_frame
+        self.task = task
+        self.interval_seconds = interval_seconds
+        self.thread_id = threading.get_ident()
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="request-sampler", daemon=True)
+
+    def start(self) -> None:
+        """Start sampling"""
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop sampling and wait for the sampler thread"""
+        self._stop.set()
+        self._thread.join()
+
+    def _running_stack(self) -> Optional[Tuple[str, ...]]:
+        """Stack of the request if it is executing on the loop thread right now"""
+        frame = sys._current_frames().get(self.thread_id)
+        labels = []
+        while frame is not None:
+            if frame is self.root_frame:
+                return tuple(reversed(labels))
+            labels.append(_frame_label(frame))
+            frame = frame.f_back
+        return None
+
+    def _suspended_stack(self) -> Optional[Tuple[str, ...]]:
+        """Chain of coroutines the request is awaiting, from below the root frame"""
+        if self.task is None or self.task.done():
+            return None
+        labels = []
+        found = False
+        coro = self.task.get_coro()
+        while coro is not None:
+            frame = getattr(coro, "cr_frame", None) or getattr(coro, "gi_frame", None)
+            if frame is None:
+                break
+            if found:
+                labels.append(_frame_label(frame))
+            elif frame is self.root_frame:
+                found = True
+            coro = getattr(coro, "cr_await", None) or getattr(coro, "gi_yieldfrom", None)
+        if not found:
+            return None
+        labels.append(AWAITING)
+        return tuple(labels)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval_seconds):
+            try:
+                stack = self._running_stack() or self._suspended_stack()
+            except Exception:
+                # The loop thread moved on while we walked its frames
+                continue
+            if stack:
+                self.stacks[stack] += 1
+                self.samples += 1
+
+
+class ProfileStore:
+    """
+    Request profiles on local disk, shared by the workers on a host.
+
+    Each profile is a folded-stack file ("frame;frame;frame count" per line)
+    that flamegraph.pl, inferno or speedscope render directly, plus a small
+    JSON metadata file. Only the newest max_profiles are kept.
+    """
+
+    def __init__(self, directory: str, max_profiles: int):
+        self.directory = directory
+        self.max_profiles = max_profiles
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, profile_id: str, suffix: str) -> str:
+        if not PROFILE_ID_PATTERN.match(profile_id):
+            raise KeyError(profile_id)
+        return os.path.join(self.directory, f"{profile_id}{suffix}")
+
+    def save(self, profile_id: str, metadata: dict, stacks: Counter) -> None:
+        """
+        Write a profile and prune old ones
+
+        Args:
+            profile_id: 16 hex character id
+            metadata: Request details stored alongside the stacks
+            stacks: Sample counts per stack (root first)
+        """
+        lines = [f"{';'.join(stack)} {count}" for stack, count in stacks.most_common()]
+        with open(self._path(profile_id, ".folded"), "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        with open(self._path(profile_id, ".json"), "w", encoding="utf-8") as f:
+            json.dump(metadata, f)
+        self.prune()
+
+    def prune(self) -> None:
+        """Delete all but the newest max_profiles profiles"""
+        for metadata in self.list()[self.max_profiles:]:
+            for suffix in (".folded", ".json"):
+                try:
+                    os.remove(self._path(metadata["id"], suffix))
+                except OSError:
+                    pass
+
+    def list(self) -> List[dict]:
+        """Metadata of stored profiles, newest first"""
+        profiles = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.directory, name), encoding="utf-8") as f:
+                    profiles.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+        profiles.sort(key=lambda metadata: metadata.get("created_at", ""), reverse=True)
+        return profiles
+
+    def get_folded(self, profile_id: str) -> Optional[str]:
+        """
+        Folded stacks of a profile
+
+        Args:
+            profile_id: Profile id from the X-Profile-Id response header
+
+        Returns:
+            File contents, or None if there is no such profile
+        """
+        try:
+            with open(self._path(profile_id, ".folded"), encoding="utf-8") as f:
+                return f.read()
+        except (KeyError, OSError):
+            return None
+
+
+def is_admin_token(token: Optional[str], admin_token: str) -> bool:
+    """Constant-time check of a presented admin token; always False when none is configured"""
+    if not admin_token or not token:
+        return False
+    return hmac.compare_digest(token.encode(), admin_token.encode())
+
+
+class RequestProfilingMiddleware:
+    """
+    Profile individual requests: those sent with "X-Profile: 1" and a valid
+    X-Admin-Token, plus a random sample_rate fraction of all requests. The
+    response of a profiled request carries X-Profile-Id; the profile is then
+    available from /admin/profiles/{id}.
+
+    Only installed when profiling is enabled, so it costs nothing otherwise.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        store: ProfileStore,
+        admin_token: str = "",
+        sample_rate: float = 0.0,
+        interval_ms: float = 5.0,
+        max_concurrent: int = 2
+    ):
+        self.app = app
+        self.store = store
+        self.admin_token = admin_token
+        self.sample_rate = sample_rate
+        self.interval_seconds = interval_ms / 1000
+        self.max_concurrent = max_concurrent
+        self.active = 0
+
+    def _trigger(self, scope: Scope) -> Optional[str]:
+        """Why this request should be profiled, or None"""
+        requested = False
+        token = None
+        for name, value in scope["headers"]:
+            if name == b"x-profile":
+                requested = value.strip() in (b"1", b"true")
+            elif name == b"x-admin-token":
+                token = value.decode("latin-1")
+        if requested and is_admin_token(token, self.admin_token):
+            return "header"
+        if self.sample_rate and random.random() < self.sample_rate:
+            return "sampled"
+        return None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or self.active >= self.max_concurrent:
+            await self.app(scope, receive, send)
+            return
+        trigger = self._trigger(scope)
+        if trigger is None:
+            await self.app(scope, receive, send)
+            return
+
+        profile_id = uuid.uuid4().hex[:16]
+        status = {}
+
+        async def send_with_profile_id(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                MutableHeaders(scope=message).append("X-Profile-Id", profile_id)
+            await send(message)
+
+        sampler = RequestSampler(sys._getframe(), asyncio.current_task(), self.interval_seconds)
+        self.active += 1
+        started = time.perf_counter()
+        sampler.start()
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            elapsed = time.perf_counter() - started
+            sampler.stop()
+            self.active -= 1
+            metadata = {
+                "id": profile_id,
+                "method": scope["method"],
+                "path": scope["path"],
+                "query": scope.get("query_string", b"").decode("latin-1"),
+                "status": status.get("code"),
+                "trigger": trigger,
+                "duration_ms": round(elapsed * 1000, 2),
+                "samples": sampler.samples,
+                "interval_ms": self.interval_seconds * 1000,
+                "pid": os.getpid(),
+                "created_at": datetime.now(timezone.utc).isoformat()
+            }
+            try:
+                await asyncio.to_thread(self.store.save, profile_id, metadata, sampler.stacks)
+            except OSError as e:
+                print(f"Could not store profile {profile_id}: {e}")
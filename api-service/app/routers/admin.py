@@ -0,0 +1,29 @@
+from typing import List
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import PlainTextResponse
+from app.profiling import ProfileStore
+from app.dependencies import get_profile_store, require_admin
+
+router = APIRouter(prefix="/admin", tags=["admin"], dependencies=[Depends(require_admin)])
+
+
+@router.get("/profiles")
+async def list_profiles(store: ProfileStore = Depends(get_profile_store)) -> List[dict]:
+    """Stored request profiles on this host, newest first"""
+    return store.list()
+
+
+@router.get("/profiles/{profile_id}", response_class=PlainTextResponse)
+async def get_profile(profile_id: str, store: ProfileStore = Depends(get_profile_store)):
+    """
+    Folded stacks for one profile ("frame;frame;frame count" per line).
+    Render with e.g. `flamegraph.pl profile.folded > profile.svg`, or load
+    into speedscope.
+    """
+    folded = store.get_folded(profile_id)
+    if folded is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return PlainTextResponse(
+        folded,
+        headers={"Content-Disposition": f'attachment; filename="{profile_id}.folded"'}
+    )
@@ -1,17 +1,17 @@
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query
 from typing import List
 from app.models.weather import CityModel
 from app.services.database import DatabaseService
 from app.services.weather_api import WeatherAPIService
+from app.dependencies import get_db_service, get_weather_api
 
 router = APIRouter(prefix="/cities", tags=["cities"])
 
-db_service = DatabaseService()
-weather_api = WeatherAPIService()
-
 
 @router.get("/", response_model=List[CityModel])
-async def get_all_cities():
+async def get_all_cities(
+    db_service: DatabaseService = Depends(get_db_service)
+):
     """Get all cities from the database"""
     try:
         cities = await db_service.get_all_cities()
@@ -23,7 +23,9 @@ async def get_all_cities():
 
 @router.get("/search", response_model=List[CityModel])
 async def search_cities(
-    q: str = Query(..., min_length=1, description="Search term for city name")
+    q: str = Query(..., min_length=1, description="Search term for city name"),
+    db_service: DatabaseService = Depends(get_db_service),
+    weather_api: WeatherAPIService = Depends(get_weather_api)
 ):
     """
     Search for cities by name.
@@ -1,11 +1,11 @@
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query
 from pydantic import BaseModel
 from app.services.ai_insights import AIInsightsService
+from app.services.llm_scheduler import LLMOverloadedError, LLMDeadlineError
+from app.dependencies import get_ai_insights, require_admin
 
 router = APIRouter(prefix="/insights", tags=["ai-insights"])
 
-ai_insights = AIInsightsService()
-
 
 class InsightRequest(BaseModel):
     """Request model for AI insights"""
@@ -22,8 +22,22 @@ class InsightResponse(BaseModel):
     insight: str
 
 
+def llm_http_error(error: Exception) -> HTTPException:
+    """503 with Retry-After when the LLM queue is full, 504 when the deadline passed"""
+    if isinstance(error, LLMOverloadedError):
+        return HTTPException(
+            status_code=503,
+            detail=str(error),
+            headers={"Retry-After": str(int(error.retry_after))}
+        )
+    return HTTPException(status_code=504, detail=str(error))
+
+
 @router.post("/ai", response_model=InsightResponse)
-async def get_ai_insight(request: InsightRequest):
+async def get_ai_insight(
+    request: InsightRequest,
+    ai_insights: AIInsightsService = Depends(get_ai_insights)
+):
     """
     Get AI-powered weather insights using LangGraph.
     Ask natural language questions about weather patterns, trends, and recommendations.
@@ -42,6 +56,8 @@ async def get_ai_insight(request: InsightRequest):
             insight=insight
         )
 
+    except (LLMOverloadedError, LLMDeadlineError) as e:
+        raise llm_http_error(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -49,7 +65,8 @@ async def get_ai_insight(request: InsightRequest):
 @router.get("/summary/{city_id}", response_model=InsightResponse)
 async def get_daily_summary(
     city_id: int,
-    city_name: str = Query(..., description="City name for context")
+    city_name: str = Query(..., description="City name for context"),
+    ai_insights: AIInsightsService = Depends(get_ai_insights)
 ):
     """Get AI-generated daily weather summary for a city"""
     try:
@@ -65,6 +82,8 @@ async def get_daily_summary(
             insight=summary
         )
 
+    except (LLMOverloadedError, LLMDeadlineError) as e:
+        raise llm_http_error(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -72,7 +91,8 @@ async def get_daily_summary(
 @router.get("/clothing/{city_id}", response_model=InsightResponse)
 async def get_clothing_recommendation(
     city_id: int,
-    city_name: str = Query(..., description="City name for context")
+    city_name: str = Query(..., description="City name for context"),
+    ai_insights: AIInsightsService = Depends(get_ai_insights)
 ):
     """Get AI-generated clothing recommendations based on weather"""
     try:
@@ -88,5 +108,15 @@ async def get_clothing_recommendation(
             insight=recommendation
         )
 
+    except (LLMOverloadedError, LLMDeadlineError) as e:
+        raise llm_http_error(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/usage", dependencies=[Depends(require_admin)])
+async def get_insight_usage(
+    ai_insights: AIInsightsService = Depends(get_ai_insights)
+):
+    """LLM queue state and per-route request, token, latency and cost figures for this worker"""
+    return ai_insights.usage_report()
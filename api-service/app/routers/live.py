@@ -0,0 +1,121 @@
+import asyncio
+import json
+from typing import List
+from fastapi import APIRouter, Depends, Query, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from app.config import settings
+from app.services.live_updates import LiveUpdateBroker
+from app.dependencies import get_live_broker
+
+router = APIRouter(prefix="/live", tags=["live"])
+
+
+@router.get("/weather")
+async def stream_weather(
+    city_ids: List[int] = Query(..., description="City IDs to subscribe to"),
+    broker: LiveUpdateBroker = Depends(get_live_broker)
+):
+    """
+    Server-Sent Events stream of new weather records for the given cities.
+    Each event's data is a WeatherRecord as JSON.
+    """
+    subscription = broker.subscribe(city_ids[:settings.live_max_cities])
+
+    async def events():
+        try:
+            while True:
+                try:
+                    message = await asyncio.wait_for(
+                        subscription.queue.get(),
+                        timeout=settings.live_heartbeat_seconds
+                    )
+                except asyncio.TimeoutError:
+                    # Keep idle connections open through proxies
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"event: weather\ndata: {message}\n\n"
+        finally:
+            broker.unsubscribe(subscription)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+def parse_subscription(text: str) -> List[int]:
+    """
+    Parse a WebSocket subscribe message
+
+    Args:
+        text: Text frame sent by the client
+
+    Returns:
+        Requested city IDs, at most live_max_cities of them
+
+    Raises:
+        ValueError: When the frame is not {"subscribe": [int, ...]}
+    """
+    try:
+        request = json.loads(text)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Invalid JSON: {e.msg}")
+
+    if not isinstance(request, dict):
+        raise ValueError('Expected an object like {"subscribe": [city_id, ...]}')
+    city_ids = request.get("subscribe", [])
+    if not isinstance(city_ids, list) or not all(
+        isinstance(city_id, int) and not isinstance(city_id, bool) for city_id in city_ids
+    ):
+        raise ValueError('"subscribe" must be a list of integer city IDs')
+    return city_ids[:settings.live_max_cities]
+
+
+@router.websocket("/weather/ws")
+async def weather_websocket(websocket: WebSocket):
+    """
+    WebSocket stream of new weather records.
+    The client sends {"subscribe": [city_id, ...]} (at any time, replacing the
+    previous set) and receives each new WeatherRecord as a JSON text frame.
+    A malformed message is answered with {"error": ...} and the current
+    subscription is kept.
+    """
+    broker: LiveUpdateBroker = websocket.app.state.live_broker
+    await websocket.accept()
+
+    subscription = None
+    receiver = asyncio.create_task(websocket.receive_text())
+
+    try:
+        while True:
+            waiters = {receiver}
+            getter = None
+            if subscription is not None:
+                getter = asyncio.create_task(subscription.queue.get())
+                waiters.add(getter)
+
+            done, _ = await asyncio.wait(waiters, return_when=asyncio.FIRST_COMPLETED)
+
+            if getter is not None and getter in done:
+                await websocket.send_text(getter.result())
+            elif getter is not None:
+                getter.cancel()
+
+            if receiver in done:
+                try:
+                    city_ids = parse_subscription(receiver.result())
+                except ValueError as e:
+                    await websocket.send_json({"error": str(e)})
+                else:
+                    if subscription is not None:
+                        broker.unsubscribe(subscription)
+                    subscription = broker.subscribe(city_ids)
+                receiver = asyncio.create_task(websocket.receive_text())
+
+    except WebSocketDisconnect:
+        pass
+    finally:
+        receiver.cancel()
+        if subscription is not None:
+            broker.unsubscribe(subscription)
@@ -0,0 +1,44 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from typing import Optional
+from app.models.weather import CityOverview
+from app.services.overview import CityOverviewService
+from app.services.weather_api import FORECAST_SERIES_FIELDS
+from app.dependencies import get_overview_service, track_city_demand
+
+router = APIRouter(prefix="/overview", tags=["overview"])
+
+
+@router.get(
+    "/{city_id}",
+    response_model=CityOverview,
+    dependencies=[Depends(track_city_demand)]
+)
+async def get_city_overview(
+    city_id: int,
+    forecast_fields: Optional[str] = Query(
+        None,
+        description="Comma-separated forecast series to return instead of full forecast items, e.g. 'temp,pop'"
+    ),
+    overview: CityOverviewService = Depends(get_overview_service)
+):
+    """
+    Get current weather, forecast, latest record, analytics (24h, 7d, 30d) and
+    any cached AI summary for a city in one response. Sections are fetched
+    concurrently; each reports its own status, so one failing source does not
+    fail the whole response.
+    """
+    fields = None
+    if forecast_fields:
+        fields = [field.strip() for field in forecast_fields.split(",") if field.strip()]
+        unknown = [field for field in fields if field not in FORECAST_SERIES_FIELDS]
+        if unknown:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Unknown forecast fields: {', '.join(unknown)}"
+            )
+
+    result = await overview.get_overview(city_id, forecast_fields=fields)
+    if not result:
+        raise HTTPException(status_code=404, detail="City not found")
+
+    return result
@@ -1,58 +1,78 @@
-from fastapi import APIRouter, HTTPException, Query
-from typing import Optional, List
+import time
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import JSONResponse
+from typing import Literal, Optional, List, Union
 from datetime import datetime, timedelta
 from app.models.weather import (
     CurrentWeatherResponse,
     ForecastResponse,
+    ForecastSeries,
     WeatherRecord,
     HistoricalWeatherQuery,
-    WeatherAnalytics,
-    CityModel
+    NearbyCityWeather,
+    NearbyWeatherResponse,
+    WeatherAnalytics
+)
+from weather_common import QuotaExhaustedError
+from app.config import settings
+from app.services.weather_api import (
+    WeatherAPIService,
+    FORECAST_SERIES_FIELDS,
+    DEFAULT_FORECAST_SERIES
 )
-from app.services.weather_api import WeatherAPIService
 from app.services.database import DatabaseService
+from app.services.resilience import UpstreamUnavailableError
+from app.services.demand import DemandTracker
+from app.dependencies import (
+    get_db_service,
+    get_weather_api,
+    get_demand_tracker,
+    track_city_demand
+)
+from app.http_cache import (
+    COMPACT_MEDIA_TYPE,
+    accepts_media_type,
+    make_etag,
+    cache_headers,
+    is_not_modified,
+    not_modified_response
+)
 
 router = APIRouter(prefix="/weather", tags=["weather"])
 
-weather_api = WeatherAPIService()
-db_service = DatabaseService()
-
 
 @router.get("/current", response_model=CurrentWeatherResponse)
 async def get_current_weather(
+    response: Response,
     city: Optional[str] = Query(None, description="City name (e.g., 'London' or 'London,UK')"),
     lat: Optional[float] = Query(None, description="Latitude"),
-    lon: Optional[float] = Query(None, description="Longitude")
+    lon: Optional[float] = Query(None, description="Longitude"),
+    weather_api: WeatherAPIService = Depends(get_weather_api),
+    demand: DemandTracker = Depends(get_demand_tracker)
 ):
     """
     Get current weather data for a city or coordinates.
-    This also stores the data in the database for historical tracking.
+    New observations are also stored in the database for historical tracking.
+    A recent observation may be served while the upstream is refreshed in
+    the background; X-Weather-Source and X-Observation-Age describe it.
     """
     try:
-        # Fetch weather from external API
-        weather_data = await weather_api.get_current_weather(city=city, lat=lat, lon=lon)
-
-        # Transform and store in database
-        weather_record = weather_api.transform_to_weather_record(weather_data)
-
-        # Upsert city information
-        city_model = CityModel(
-            city_id=weather_data.id,
-            name=weather_data.name,
-            country=weather_data.sys.country,
-            latitude=weather_data.coord.lat,
-            longitude=weather_data.coord.lon,
-            timezone=weather_data.timezone
-        )
-        await db_service.upsert_city(city_model)
-
-        # Store weather record
-        await db_service.insert_weather_record(weather_record)
-
+        result = await weather_api.get_current_observation(city=city, lat=lat, lon=lon)
+        data = result.data
+        weather_data = CurrentWeatherResponse(**data)
+        demand.record(weather_data.id)
+        response.headers["X-Weather-Source"] = result.source
+        response.headers["X-Observation-Age"] = str(max(0, int(result.age_seconds)))
         return weather_data
 
     except HTTPException:
         raise
+    except (UpstreamUnavailableError, QuotaExhaustedError) as e:
+        raise HTTPException(
+            status_code=503,
+            detail=str(e),
+            headers={"Retry-After": str(int(e.retry_after) + 1)}
+        )
     except Exception as e:
         # Check if it's an API key error
         error_msg = str(e)
@@ -64,14 +84,38 @@ async def get_current_weather(
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.get("/forecast", response_model=ForecastResponse)
+@router.get("/forecast", response_model=Union[ForecastResponse, ForecastSeries])
 async def get_forecast(
     city: Optional[str] = Query(None, description="City name"),
     lat: Optional[float] = Query(None, description="Latitude"),
-    lon: Optional[float] = Query(None, description="Longitude")
+    lon: Optional[float] = Query(None, description="Longitude"),
+    response_format: Literal["full", "series"] = Query(
+        "full", alias="format", description="'full' nested items or columnar 'series'"
+    ),
+    fields: Optional[str] = Query(None, description="Comma-separated series to return, e.g. 'temp,pop' (implies format=series)"),
+    weather_api: WeatherAPIService = Depends(get_weather_api)
 ):
-    """Get 5-day weather forecast (3-hour intervals)"""
+    """
+    Get 5-day weather forecast (3-hour intervals).
+    With format=series or fields, returns one array per field instead of nested items.
+    """
+    if fields:
+        requested = [field.strip() for field in fields.split(",") if field.strip()]
+        unknown = [field for field in requested if field not in FORECAST_SERIES_FIELDS]
+        if unknown:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Unknown forecast fields: {', '.join(unknown)}. "
+                       f"Available: {', '.join(FORECAST_SERIES_FIELDS)}"
+            )
+        response_format = "series"
+    else:
+        requested = DEFAULT_FORECAST_SERIES
+
     try:
+        if response_format == "series":
+            return await weather_api.get_forecast_series(requested, city=city, lat=lat, lon=lon)
+
         forecast_data = await weather_api.get_forecast(city=city, lat=lat, lon=lon)
         return forecast_data
 
@@ -79,15 +123,81 @@ async def get_forecast(
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.get("/historical/{city_id}", response_model=List[WeatherRecord])
+@router.get("/nearby", response_model=NearbyWeatherResponse)
+async def get_nearby_weather(
+    lat: float = Query(..., ge=-90, le=90, description="Latitude"),
+    lon: float = Query(..., ge=-180, le=180, description="Longitude"),
+    radius_km: float = Query(50, gt=0, le=settings.nearby_max_radius_km, description="Search radius in km"),
+    limit: int = Query(20, ge=1, le=100, description="Maximum number of cities"),
+    db_service: DatabaseService = Depends(get_db_service)
+):
+    """Get tracked cities within a radius of a point with their latest observations"""
+    try:
+        index = await db_service.get_city_index()
+
+        started = time.perf_counter()
+        matches = index.nearby(lat, lon, radius_km, limit=limit)
+        index_ms = (time.perf_counter() - started) * 1000
+
+        latest = await db_service.get_latest_weather_for_cities([city.city_id for _, city in matches])
+
+        return NearbyWeatherResponse(
+            lat=lat,
+            lon=lon,
+            radius_km=radius_km,
+            index_ms=round(index_ms, 3),
+            cities=[
+                NearbyCityWeather(
+                    city=city,
+                    distance_km=round(distance, 2),
+                    weather=latest.get(city.city_id)
+                )
+                for distance, city in matches
+            ]
+        )
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get(
+    "/historical/{city_id}",
+    response_model=List[WeatherRecord],
+    dependencies=[Depends(track_city_demand)]
+)
 async def get_historical_weather(
+    request: Request,
+    response: Response,
     city_id: int,
     start_date: Optional[datetime] = Query(None, description="Start date for historical data"),
     end_date: Optional[datetime] = Query(None, description="End date for historical data"),
-    limit: int = Query(100, le=1000, description="Maximum number of records")
+    limit: int = Query(100, le=1000, description="Maximum number of records"),
+    db_service: DatabaseService = Depends(get_db_service)
 ):
-    """Get historical weather data for a city"""
+    """
+    Get historical weather data for a city.
+    Send `Accept: application/vnd.weather.compact+json` for the compact columnar format.
+    """
     try:
+        compact = accepts_media_type(request, COMPACT_MEDIA_TYPE)
+        headers = {"Vary": "Accept"}
+
+        # Validate against a summary of the rows the query returns before
+        # running it. Last-Modified is the last write to those rows, so
+        # backfilled rows older than the newest observation still invalidate
+        # it; only the ETag also catches rows removed by retention, so
+        # If-Modified-Since alone is not honoured here.
+        marker = await db_service.get_history_marker(city_id, start_date, end_date, limit)
+        if marker:
+            etag = make_etag(
+                "historical", city_id, marker.row_count, marker.latest_recorded_at,
+                marker.oldest_recorded_at, marker.last_written_at,
+                start_date, end_date, limit, compact
+            )
+            headers.update(cache_headers(etag, marker.last_written_at))
+            if is_not_modified(request, etag):
+                return not_modified_response(headers)
+
         query = HistoricalWeatherQuery(
             city_id=city_id,
             start_date=start_date,
@@ -95,6 +205,11 @@ async def get_historical_weather(
             limit=limit
         )
 
+        if compact:
+            batch = await db_service.get_historical_batch(query)
+            return JSONResponse(batch.to_compact(), media_type=COMPACT_MEDIA_TYPE, headers=headers)
+
+        response.headers.update(headers)
         records = await db_service.get_historical_weather(query)
         return records
 
@@ -102,16 +217,37 @@ async def get_historical_weather(
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.get("/analytics/{city_id}", response_model=WeatherAnalytics)
+@router.get(
+    "/analytics/{city_id}",
+    response_model=WeatherAnalytics,
+    dependencies=[Depends(track_city_demand)]
+)
 async def get_weather_analytics(
+    request: Request,
+    response: Response,
     city_id: int,
-    days: int = Query(7, ge=1, le=30, description="Number of days to analyze")
+    days: int = Query(7, ge=1, le=30, description="Number of days to analyze"),
+    db_service: DatabaseService = Depends(get_db_service)
 ):
     """Get weather analytics and trends for a city"""
     try:
         end_date = datetime.now()
         start_date = end_date - timedelta(days=days)
 
+        # The window slides with time, so the hour is part of the validator
+        # alongside a summary of the records in the window
+        marker = await db_service.get_history_marker(city_id, start_date, end_date)
+        if marker:
+            etag = make_etag(
+                "analytics", city_id, marker.row_count, marker.latest_recorded_at,
+                marker.oldest_recorded_at, marker.last_written_at,
+                days, end_date.strftime("%Y%m%d%H")
+            )
+            headers = cache_headers(etag, marker.last_written_at)
+            if is_not_modified(request, etag):
+                return not_modified_response(headers)
+            response.headers.update(headers)
+
         analytics = await db_service.get_weather_analytics(
             city_id=city_id,
             start_date=start_date,
@@ -132,8 +268,17 @@ async def get_weather_analytics(
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.get("/latest/{city_id}", response_model=WeatherRecord)
-async def get_latest_weather(city_id: int):
+@router.get(
+    "/latest/{city_id}",
+    response_model=WeatherRecord,
+    dependencies=[Depends(track_city_demand)]
+)
+async def get_latest_weather(
+    request: Request,
+    response: Response,
+    city_id: int,
+    db_service: DatabaseService = Depends(get_db_service)
+):
     """Get the most recent weather record for a city from the database"""
     try:
         latest = await db_service.get_latest_weather(city_id)
@@ -144,6 +289,12 @@ async def get_latest_weather(city_id: int):
                 detail="No weather data found for this city"
             )
 
+        etag = make_etag("latest", city_id, latest.id, latest.recorded_at)
+        headers = cache_headers(etag, latest.recorded_at)
+        if is_not_modified(request, etag, latest.recorded_at):
+            return not_modified_response(headers)
+        response.headers.update(headers)
+
         return latest
 
     except HTTPException:
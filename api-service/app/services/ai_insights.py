@@ -1,95 +1,165 @@
 from datetime import datetime, timedelta
-from openai import AsyncOpenAI
+from typing import Dict, Optional, Tuple, TYPE_CHECKING
 from app.config import settings
 from app.services.database import DatabaseService
+from app.services.llm_scheduler import (
+    LLMScheduler,
+    PRIORITY_INTERACTIVE,
+    PRIORITY_NORMAL,
+    PRIORITY_BACKGROUND
+)
+
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI
+
+# Sent unchanged on every call; the weather data goes in the user message
+SYSTEM_PROMPT = (
+    "You are a concise weather assistant. The user message starts with data: "
+    "t=temperature C, fl=feels like C, rh=humidity %, wind=m/s; 'now' is the latest "
+    "observation and '7d' the last 7 days. Answer the question that follows with "
+    "clear, actionable advice, comparing now with 7d when relevant."
+)
 
 
 class AIInsightsService:
     """Service for generating AI-powered weather insights using OpenAI"""
 
-    def __init__(self):
-        self.client = AsyncOpenAI(api_key=settings.openai_api_key)
-        self.db_service = DatabaseService()
+    def __init__(self, db_service: DatabaseService):
+        self.db_service = db_service
+        self._client: Optional["AsyncOpenAI"] = None
+        self.scheduler = LLMScheduler(settings.llm_max_concurrency, settings.llm_max_queue_depth)
+        # city_id -> (generated at, summary)
+        self._summaries: Dict[int, Tuple[datetime, str]] = {}
 
-    async def get_insight(
-        self,
-        city_id: int,
-        city_name: str,
-        query: str
-    ) -> str:
+    @property
+    def client(self) -> "AsyncOpenAI":
+        """OpenAI client, imported and created on first use"""
+        if self._client is None:
+            from openai import AsyncOpenAI
+
+            self._client = AsyncOpenAI(api_key=settings.openai_api_key)
+        return self._client
+
+    async def build_context(self, city_id: int, city_name: str) -> str:
         """
-        Get AI-powered weather insights for a city
+        Compact structured context: one line for the latest observation and
+        one for the 7-day analytics, with short keys and rounded values
 
         Args:
             city_id: City ID
-            city_name: City name for context
-            query: User's question or request
+            city_name: City name
 
         Returns:
-            AI-generated insight as a string
+            Context text for the user message
         """
-        # Fetch weather data
         latest_weather = await self.db_service.get_latest_weather(city_id)
 
-        # Get analytics from last 7 days
         end_date = datetime.now()
         start_date = end_date - timedelta(days=7)
-
         analytics = await self.db_service.get_weather_analytics(
             city_id=city_id,
             start_date=start_date,
             end_date=end_date
         )
 
-        # Build context
-        current_weather_str = ""
+        lines = [f"city={city_name}"]
         if latest_weather:
-            current_weather_str = f"""Current Weather:
-- Temperature: {latest_weather.temperature}°C (feels like {latest_weather.feels_like}°C)
-- Conditions: {latest_weather.weather_main} - {latest_weather.weather_description}
-- Humidity: {latest_weather.humidity}%
-- Wind Speed: {latest_weather.wind_speed} m/s
-- Recorded: {latest_weather.recorded_at}"""
-
-        analytics_str = ""
+            lines.append(
+                f"now: t={latest_weather.temperature:.1f} fl={latest_weather.feels_like:.1f} "
+                f"rh={latest_weather.humidity} wind={latest_weather.wind_speed:.1f} "
+                f"cond={latest_weather.weather_description} "
+                f"at={latest_weather.recorded_at:%Y-%m-%d %H:%M}"
+            )
         if analytics:
-            analytics_str = f"""7-Day Analytics:
-- Average Temperature: {analytics.avg_temperature}°C
-- Max Temperature: {analytics.max_temperature}°C
-- Min Temperature: {analytics.min_temperature}°C
-- Average Humidity: {analytics.avg_humidity}%
-- Average Wind Speed: {analytics.avg_wind_speed} m/s
-- Most Common Condition: {analytics.most_common_condition}"""
-
-        system_prompt = f"""You are a weather analysis assistant providing insightful and helpful information about weather patterns for {city_name}.
-
-{current_weather_str}
-
-{analytics_str}
-
-Provide clear, concise, and actionable insights. Compare current conditions to weekly averages when relevant."""
-
-        # Call OpenAI API
-        response = await self.client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": query}
-            ],
-            temperature=0.7,
-            max_tokens=500
+            lines.append(
+                f"7d: avg={analytics.avg_temperature:.1f} max={analytics.max_temperature:.1f} "
+                f"min={analytics.min_temperature:.1f} rh={analytics.avg_humidity:.0f} "
+                f"wind={analytics.avg_wind_speed:.1f} mode={analytics.most_common_condition}"
+            )
+        return "\n".join(lines)
+
+    async def get_insight(
+        self,
+        city_id: int,
+        city_name: str,
+        query: str,
+        route: str = "ai",
+        priority: int = PRIORITY_INTERACTIVE,
+        max_tokens: int = 500
+    ) -> str:
+        """
+        Get AI-powered weather insights for a city
+
+        Args:
+            city_id: City ID
+            city_name: City name for context
+            query: User's question or request
+            route: Accounting bucket for token and latency stats
+            priority: Scheduling priority (PRIORITY_* from llm_scheduler)
+            max_tokens: Completion token limit
+
+        Returns:
+            AI-generated insight as a string
+
+        Raises:
+            LLMOverloadedError: When too many requests are queued
+            LLMDeadlineError: When the request cannot finish within the deadline
+        """
+        async def call():
+            # Built once admitted, so a rejected request does no database
+            # work and the deadline covers the context queries as well
+            context = await self.build_context(city_id, city_name)
+            return await self.client.chat.completions.create(
+                model=settings.llm_model,
+                messages=[
+                    # Fixed first message, so the provider can reuse its prompt cache
+                    {"role": "system", "content": SYSTEM_PROMPT},
+                    {"role": "user", "content": f"{context}\n\n{query}"}
+                ],
+                temperature=0.7,
+                max_tokens=max_tokens
+            )
+
+        response = await self.scheduler.submit(
+            call,
+            route=route,
+            priority=priority,
+            deadline_seconds=settings.llm_deadline_seconds
         )
 
         return response.choices[0].message.content
 
+    def usage_report(self) -> dict:
+        """Scheduler state and per-route token, latency and cost figures"""
+        return self.scheduler.report(
+            settings.llm_prompt_price_per_million,
+            settings.llm_completion_price_per_million
+        )
+
     async def generate_daily_summary(
         self,
         city_id: int,
         city_name: str
     ) -> str:
-        """Generate a daily weather summary for a city"""
-        query = f"Provide a comprehensive daily weather summary for {city_name}, including current conditions, how they compare to this week's average, and any notable trends."
-        return await self.get_insight(city_id, city_name, query)
+        """Generate a daily weather summary for a city, reusing a recent one"""
+        cached = self.get_cached_summary(city_id)
+        if cached:
+            return cached
+
+        query = "Daily summary: current conditions vs the 7-day figures, and notable trends."
+        summary = await self.get_insight(
+            city_id, city_name, query,
+            route="summary", priority=PRIORITY_BACKGROUND, max_tokens=300
+        )
+        self._summaries[city_id] = (datetime.now(), summary)
+        return summary
+
+    def get_cached_summary(self, city_id: int) -> Optional[str]:
+        """Daily summary generated within insight_cache_seconds, if any"""
+        cached = self._summaries.get(city_id)
+        if cached and datetime.now() - cached[0] < timedelta(seconds=settings.insight_cache_seconds):
+            return cached[1]
+        return None
 
     async def get_clothing_recommendation(
         self,
@@ -97,5 +167,8 @@ Provide clear, concise, and actionable insights. Compare current conditions to w
         city_name: str
     ) -> str:
         """Get clothing recommendations based on weather"""
-        query = f"Based on the current weather conditions in {city_name}, what clothing would you recommend for someone going outside today?"
-        return await self.get_insight(city_id, city_name, query)
+        query = "What clothing do you recommend for going outside today?"
+        return await self.get_insight(
+            city_id, city_name, query,
+            route="clothing", priority=PRIORITY_NORMAL, max_tokens=200
+        )
@@ -0,0 +1,123 @@
+import math
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+from app.models.weather import CityModel
+
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE = 111.32
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Great-circle distance between two points in kilometres"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+class CityGridIndex:
+    """
+    In-memory spatial index of tracked cities: a grid of fixed-size
+    latitude/longitude cells, each holding the cities inside it. A radius
+    query only visits the cells overlapping the search box, so it stays fast
+    with tens of thousands of cities.
+    """
+
+    def __init__(self, cell_degrees: float = 1.0):
+        self.cell_degrees = cell_degrees
+        self.lon_cells = int(math.ceil(360 / cell_degrees))
+        self._cells: Dict[Tuple[int, int], Dict[int, CityModel]] = {}
+        self._cell_of: Dict[int, Tuple[int, int]] = {}
+        self.loaded_at: Optional[float] = None
+
+    def __len__(self) -> int:
+        return len(self._cell_of)
+
+    def _cell(self, lat: float, lon: float) -> Tuple[int, int]:
+        """Grid cell containing a point"""
+        return (
+            int(math.floor(lat / self.cell_degrees)),
+            int(math.floor((lon + 180) / self.cell_degrees)) % self.lon_cells
+        )
+
+    def load(self, cities: Iterable[CityModel]) -> None:
+        """
+        Replace the index contents
+
+        Args:
+            cities: All tracked cities
+        """
+        self._cells = {}
+        self._cell_of = {}
+        for city in cities:
+            self.add(city)
+        self.loaded_at = time.monotonic()
+
+    def add(self, city: CityModel) -> None:
+        """
+        Insert or move a city
+
+        Args:
+            city: City to index
+        """
+        self.remove(city.city_id)
+        cell = self._cell(city.latitude, city.longitude)
+        self._cells.setdefault(cell, {})[city.city_id] = city
+        self._cell_of[city.city_id] = cell
+
+    def remove(self, city_id: int) -> None:
+        """Remove a city if present"""
+        cell = self._cell_of.pop(city_id, None)
+        if cell is not None:
+            bucket = self._cells[cell]
+            bucket.pop(city_id, None)
+            if not bucket:
+                del self._cells[cell]
+
+    def nearby(
+        self,
+        lat: float,
+        lon: float,
+        radius_km: float,
+        limit: Optional[int] = None
+    ) -> List[Tuple[float, CityModel]]:
+        """
+        Cities within a radius of a point, nearest first
+
+        Args:
+            lat: Latitude of the centre
+            lon: Longitude of the centre
+            radius_km: Search radius in kilometres
+            limit: Maximum number of cities to return
+
+        Returns:
+            List of (distance in km, city)
+        """
+        dlat = radius_km / KM_PER_DEGREE
+        lat_min_cell = int(math.floor(max(-90.0, lat - dlat) / self.cell_degrees))
+        lat_max_cell = int(math.floor(min(90.0, lat + dlat) / self.cell_degrees))
+
+        # Widest longitude span of the box is at the latitude furthest from the equator
+        edge_lat = min(89.9, abs(lat) + dlat)
+        dlon = radius_km / (KM_PER_DEGREE * math.cos(math.radians(edge_lat)))
+        if dlon >= 180:
+            lon_cells = range(self.lon_cells)
+        else:
+            first = int(math.floor((lon - dlon + 180) / self.cell_degrees))
+            last = int(math.floor((lon + dlon + 180) / self.cell_degrees))
+            lon_cells = sorted({cell % self.lon_cells for cell in range(first, last + 1)})
+
+        matches = []
+        for lat_cell in range(lat_min_cell, lat_max_cell + 1):
+            for lon_cell in lon_cells:
+                bucket = self._cells.get((lat_cell, lon_cell))
+                if not bucket:
+                    continue
+                for city in bucket.values():
+                    distance = haversine_km(lat, lon, city.latitude, city.longitude)
+                    if distance <= radius_km:
+                        matches.append((distance, city))
+
+        matches.sort(key=lambda match: match[0])
+        return matches[:limit] if limit else matches
@@ -1,49 +1,112 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import Optional, List
-from supabase import create_client, Client
+from typing import Any, Optional, List, Dict, TYPE_CHECKING
 from app.config import settings
+from app.admission import current_route_class
+from weather_common import RecordBatch, expand_record
+from app.services.city_index import CityGridIndex
 from app.models.weather import (
     WeatherRecord,
     CityModel,
     WeatherAnalytics,
-    HistoricalWeatherQuery
+    HistoricalWeatherQuery,
+    HistoryMarker
 )
 
+if TYPE_CHECKING:
+    from supabase import Client
+
 
 class DatabaseService:
-    """Service for interacting with Supabase database"""
+    """
+    Service for interacting with Supabase database.
+
+    The Supabase client is synchronous; queries are built on the event loop
+    and executed in a worker thread, so a database round trip never blocks
+    other requests and independent queries can run concurrently. Heavy
+    routes get a thread pool of their own so they cannot use up the threads
+    cheap reads run on.
+    """
 
     def __init__(self):
-        self.client: Client = create_client(
-            settings.supabase_url,
-            settings.supabase_key
+        self._client: Optional["Client"] = None
+        self._client_lock = threading.Lock()
+        # Last recorded_at stored per city by this process, so repeated
+        # requests for an unchanged upstream observation skip the database
+        self._last_recorded: Dict[int, str] = {}
+        # Spatial index over the cities table, loaded on first use
+        self.city_index = CityGridIndex(settings.city_index_cell_degrees)
+        self._city_index_reload: Optional[asyncio.Task] = None
+        # Queries of heavy routes, see _execute
+        self._heavy_executor = ThreadPoolExecutor(
+            max_workers=settings.db_heavy_threads,
+            thread_name_prefix="db-heavy"
         )
 
-    async def insert_weather_record(
-        self,
-        weather_record: WeatherRecord
-    ) -> WeatherRecord:
+    @property
+    def client(self) -> "Client":
+        """Supabase client, imported and created on first use"""
+        with self._client_lock:
+            if self._client is None:
+                from supabase import create_client
+
+                self._client = create_client(
+                    settings.supabase_url,
+                    settings.supabase_key
+                )
+        return self._client
+
+    async def _execute(self, query: Any) -> Any:
+        """
+        Execute a built PostgREST query or RPC in a worker thread.
+        Requests admitted through the heavy gate use their own bounded pool,
+        everything else the default executor.
+
+        Args:
+            query: Query builder; nothing is sent until execute()
+
+        Returns:
+            The APIResponse
+        """
+        if current_route_class.get() == "heavy":
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._heavy_executor, query.execute)
+        return await asyncio.to_thread(query.execute)
+
+    def close(self) -> None:
+        """Stop the heavy-route database threads"""
+        self._heavy_executor.shutdown(wait=False)
+
+    async def insert_weather_row(self, row: dict, city: dict) -> Optional[WeatherRecord]:
         """
-        Insert a new weather record into the database
+        Insert a database-ready weather_records row.
+        Records are unique on (city_id, recorded_at); an observation that is
+        already stored is dropped, either by the in-memory last-seen check or
+        by the database ignoring the conflicting row.
 
         Args:
-            weather_record: WeatherRecord to insert
+            row: Row as produced by weather_common.decode_current_weather
+            city: The observation's cities row, used to expand the stored row
 
         Returns:
-            Inserted WeatherRecord with id
+            Inserted WeatherRecord with id, or None if it was a duplicate
         """
-        record_dict = weather_record.model_dump(exclude={"id", "created_at"})
+        if self._last_recorded.get(row["city_id"]) == row["recorded_at"]:
+            return None
 
-        # Convert datetime to ISO format string
-        if isinstance(record_dict.get("recorded_at"), datetime):
-            record_dict["recorded_at"] = record_dict["recorded_at"].isoformat()
+        query = self.client.table("weather_records")\
+            .upsert(row, on_conflict="city_id,recorded_at", ignore_duplicates=True)
+        response = await self._execute(query)
 
-        response = self.client.table("weather_records").insert(record_dict).execute()
+        self._last_recorded[row["city_id"]] = row["recorded_at"]
 
         if response.data and len(response.data) > 0:
-            return WeatherRecord(**response.data[0])
+            return WeatherRecord(**expand_record(response.data[0], city))
 
-        raise Exception("Failed to insert weather record")
+        return None
 
     async def get_latest_weather(self, city_id: int) -> Optional[WeatherRecord]:
         """
@@ -55,18 +118,58 @@ class DatabaseService:
         Returns:
             Latest WeatherRecord or None
         """
-        response = self.client.table("weather_records")\
+        query = self.client.table("weather_records_expanded")\
             .select("*")\
             .eq("city_id", city_id)\
             .order("recorded_at", desc=True)\
-            .limit(1)\
-            .execute()
+            .limit(1)
+        response = await self._execute(query)
 
         if response.data and len(response.data) > 0:
             return WeatherRecord(**response.data[0])
 
         return None
 
+    async def get_history_marker(
+        self,
+        city_id: int,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        limit: Optional[int] = None
+    ) -> Optional[HistoryMarker]:
+        """
+        Get the count, observation range and last write time of the newest
+        `limit` weather records of a city in a range, i.e. the rows a
+        historical or analytics response is built from. Only an aggregate row
+        is returned and the lookup is bounded like the response query, so
+        this is cheap enough to run before deciding whether a response needs
+        to be rebuilt. It changes when rows in that set are backfilled or
+        retired as well as when a new observation arrives.
+
+        Args:
+            city_id: City ID
+            start_date: Start of the range, open if None
+            end_date: End of the range, open if None
+            limit: Only the newest this many records, all if None
+
+        Returns:
+            HistoryMarker or None if the city has no records in the range
+        """
+        params = {"p_city_id": city_id}
+        if start_date:
+            params["p_start_date"] = start_date.isoformat()
+        if end_date:
+            params["p_end_date"] = end_date.isoformat()
+        if limit is not None:
+            params["p_limit"] = limit
+
+        response = await self._execute(self.client.rpc("get_weather_history_marker", params))
+
+        if response.data and response.data[0]["row_count"]:
+            return HistoryMarker(**response.data[0])
+
+        return None
+
     async def get_historical_weather(
         self,
         query: HistoricalWeatherQuery
@@ -80,7 +183,7 @@ class DatabaseService:
         Returns:
             List of WeatherRecord objects
         """
-        db_query = self.client.table("weather_records")\
+        db_query = self.client.table("weather_records_expanded")\
             .select("*")\
             .eq("city_id", query.city_id)\
             .order("recorded_at", desc=True)\
@@ -92,13 +195,43 @@ class DatabaseService:
         if query.end_date:
             db_query = db_query.lte("recorded_at", query.end_date.isoformat())
 
-        response = db_query.execute()
+        response = await self._execute(db_query)
 
         if response.data:
             return [WeatherRecord(**record) for record in response.data]
 
         return []
 
+    async def get_historical_batch(
+        self,
+        query: HistoricalWeatherQuery
+    ) -> RecordBatch:
+        """
+        Get historical weather records for a city as a columnar batch,
+        skipping per-row model construction
+
+        Args:
+            query: HistoricalWeatherQuery with filters
+
+        Returns:
+            RecordBatch of records, newest first
+        """
+        db_query = self.client.table("weather_records_expanded")\
+            .select("*")\
+            .eq("city_id", query.city_id)\
+            .order("recorded_at", desc=True)\
+            .limit(query.limit)
+
+        if query.start_date:
+            db_query = db_query.gte("recorded_at", query.start_date.isoformat())
+
+        if query.end_date:
+            db_query = db_query.lte("recorded_at", query.end_date.isoformat())
+
+        response = await self._execute(db_query)
+
+        return RecordBatch.from_rows(response.data or [])
+
     async def get_weather_analytics(
         self,
         city_id: int,
@@ -123,7 +256,7 @@ class DatabaseService:
         if end_date:
             params["p_end_date"] = end_date.isoformat()
 
-        response = self.client.rpc("get_weather_analytics", params).execute()
+        response = await self._execute(self.client.rpc("get_weather_analytics", params))
 
         if response.data and len(response.data) > 0:
             data = response.data[0]
@@ -141,17 +274,96 @@ class DatabaseService:
         Returns:
             Upserted CityModel
         """
-        city_dict = city.model_dump(exclude={"id", "created_at"})
+        return await self.upsert_city_row(city.model_dump(exclude={"id", "created_at"}))
 
-        response = self.client.table("cities")\
-            .upsert(city_dict, on_conflict="city_id")\
-            .execute()
+    async def upsert_city_row(self, row: dict) -> CityModel:
+        """
+        Insert or update a database-ready cities row
+
+        Args:
+            row: Row as produced by weather_common.decode_current_weather
+
+        Returns:
+            Upserted CityModel
+        """
+        query = self.client.table("cities")\
+            .upsert(row, on_conflict="city_id")
+        response = await self._execute(query)
 
         if response.data and len(response.data) > 0:
-            return CityModel(**response.data[0])
+            city = CityModel(**response.data[0])
+            if self.city_index.loaded_at is not None:
+                self.city_index.add(city)
+            return city
 
         raise Exception("Failed to upsert city")
 
+    async def get_city_index(self) -> CityGridIndex:
+        """
+        Spatial index of all cities, reloaded when older than
+        city_index_refresh_seconds so cities added by the data pipeline appear.
+
+        Only the first call waits for the table to be read. After that a
+        stale index is still served while a single background task reloads
+        it, so no request pays for paging through the cities table.
+
+        Returns:
+            Loaded CityGridIndex
+        """
+        loaded_at = self.city_index.loaded_at
+        stale = loaded_at is None or time.monotonic() - loaded_at > settings.city_index_refresh_seconds
+        if stale and (self._city_index_reload is None or self._city_index_reload.done()):
+            self._city_index_reload = asyncio.create_task(self._reload_city_index())
+
+        if loaded_at is None:
+            # Nothing to serve yet; wait for the load shared by all callers
+            await asyncio.shield(self._city_index_reload)
+
+        return self.city_index
+
+    async def _reload_city_index(self) -> None:
+        """Read the whole cities table and replace the index contents"""
+        cities = []
+        page_size = 1000
+        try:
+            while True:
+                # PostgREST caps rows per request, so page through the table
+                query = self.client.table("cities")\
+                    .select("*")\
+                    .order("city_id")\
+                    .range(len(cities), len(cities) + page_size - 1)
+                response = await self._execute(query)
+                cities.extend(CityModel(**city) for city in response.data or [])
+                if len(response.data or []) < page_size:
+                    break
+        except Exception as e:
+            if self.city_index.loaded_at is None:
+                raise
+            print(f"City index reload failed, keeping the previous index: {e}")
+            return
+
+        self.city_index.load(cities)
+
+    async def get_latest_weather_for_cities(self, city_ids: List[int]) -> Dict[int, WeatherRecord]:
+        """
+        Most recent weather record for each of several cities in one query
+
+        Args:
+            city_ids: City IDs
+
+        Returns:
+            Dictionary of city_id -> latest WeatherRecord (cities without records are absent)
+        """
+        if not city_ids:
+            return {}
+
+        query = self.client.table("latest_weather")\
+            .select("*")\
+            .in_("city_id", city_ids)
+        response = await self._execute(query)
+
+        return {record["city_id"]: WeatherRecord(**record) for record in response.data or []}
+
     async def get_all_cities(self) -> List[CityModel]:
         """
         Get all cities from the database
@@ -159,16 +371,37 @@ class DatabaseService:
         Returns:
             List of CityModel objects
         """
-        response = self.client.table("cities")\
+        query = self.client.table("cities")\
             .select("*")\
-            .order("name")\
-            .execute()
+            .order("name")
+        response = await self._execute(query)
 
         if response.data:
             return [CityModel(**city) for city in response.data]
 
         return []
 
+    async def get_city(self, city_id: int) -> Optional[CityModel]:
+        """
+        Get a stored city by its OpenWeatherMap id
+
+        Args:
+            city_id: OpenWeatherMap city ID
+
+        Returns:
+            CityModel or None
+        """
+        query = self.client.table("cities")\
+            .select("*")\
+            .eq("city_id", city_id)\
+            .limit(1)
+        response = await self._execute(query)
+
+        if response.data:
+            return CityModel(**response.data[0])
+
+        return None
+
     async def search_cities(self, search_term: str) -> List[CityModel]:
         """
         Search for cities by name
@@ -179,14 +412,26 @@ class DatabaseService:
         Returns:
             List of matching CityModel objects
         """
-        response = self.client.table("cities")\
+        query = self.client.table("cities")\
             .select("*")\
             .ilike("name", f"%{search_term}%")\
             .order("name")\
-            .limit(10)\
-            .execute()
+            .limit(10)
+        response = await self._execute(query)
 
         if response.data:
             return [CityModel(**city) for city in response.data]
 
         return []
+
+    async def record_city_demand(self, counts: Dict[int, int]) -> None:
+        """
+        Add served-request counts to the current hour's city_demand bucket
+
+        Args:
+            counts: Number of requests served per city ID
+        """
+        await self._execute(self.client.rpc(
+            "record_city_demand",
+            {"p_counts": {str(city_id): count for city_id, count in counts.items()}}
+        ))
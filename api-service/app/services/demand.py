@@ -0,0 +1,59 @@
+import asyncio
+from collections import Counter
+from typing import Optional
+from app.config import settings
+from app.services.database import DatabaseService
+
+
+class DemandTracker:
+    """
+    Counts how often each city is served and periodically flushes the
+    counts to the city_demand table, where the data pipeline uses them to
+    decide how often to collect each city.
+    """
+
+    def __init__(self, db_service: DatabaseService):
+        self.db_service = db_service
+        self._counts: Counter = Counter()
+        self._task: Optional[asyncio.Task] = None
+
+    def record(self, city_id: int) -> None:
+        """Count one request served for a city"""
+        self._counts[city_id] += 1
+
+    async def flush(self) -> int:
+        """
+        Write accumulated counts to the database
+
+        Returns:
+            Number of cities flushed
+        """
+        if not self._counts:
+            return 0
+
+        counts, self._counts = self._counts, Counter()
+        try:
+            await self.db_service.record_city_demand(dict(counts))
+        except Exception as e:
+            # Keep the counts for the next attempt
+            self._counts.update(counts)
+            print(f"Failed to flush city demand: {e}")
+            return 0
+
+        return len(counts)
+
+    async def _flush_loop(self) -> None:
+        while True:
+            await asyncio.sleep(settings.demand_flush_seconds)
+            await self.flush()
+
+    async def start(self) -> None:
+        """Start flushing in the background"""
+        self._task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self) -> None:
+        """Stop the background flush and write out remaining counts"""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await self.flush()
@@ -0,0 +1,129 @@
+import asyncio
+import json
+from typing import Dict, Iterable, Set
+from app.config import settings
+from app.models.weather import WeatherRecord
+
+NOTIFY_CHANNEL = "weather_records"
+
+
+class Subscription:
+    """A connected client's interest in a set of cities"""
+
+    def __init__(self, city_ids: Iterable[int], max_queue: int):
+        self.city_ids = frozenset(city_ids)
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self.dropped = 0
+
+    def deliver(self, message: str) -> None:
+        """
+        Queue a message without ever blocking the publisher
+
+        Args:
+            message: Serialized weather record
+        """
+        if self.queue.full():
+            # Slow consumer: drop its oldest update instead of stalling fan-out
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(message)
+
+
+class LiveUpdateBroker:
+    """
+    In-process fan-out of new weather records to subscribed clients.
+
+    Subscribers are indexed by city id so publishing a record only touches
+    the clients interested in that city, and each record is serialized once
+    regardless of how many clients receive it. When DATABASE_URL is set the
+    broker also LISTENs on the weather_records channel, so rows loaded by
+    the data pipeline reach every API worker.
+    """
+
+    def __init__(self):
+        self._subscribers: Dict[int, Set[Subscription]] = {}
+        self._connection = None
+
+    @property
+    def listening(self) -> bool:
+        """Whether records are arriving through Postgres LISTEN/NOTIFY"""
+        return self._connection is not None
+
+    @property
+    def subscriber_count(self) -> int:
+        """Number of distinct connected subscriptions"""
+        return len({sub for subs in self._subscribers.values() for sub in subs})
+
+    async def start(self) -> None:
+        """Start listening for database notifications if a database URL is configured"""
+        if not settings.database_url:
+            return
+
+        import asyncpg
+
+        self._connection = await asyncpg.connect(settings.database_url)
+        await self._connection.add_listener(NOTIFY_CHANNEL, self._on_notify)
+        print(f"Listening for {NOTIFY_CHANNEL} notifications")
+
+    async def stop(self) -> None:
+        """Stop listening and release the database connection"""
+        if self._connection is not None:
+            await self._connection.close()
+            self._connection = None
+
+    def subscribe(self, city_ids: Iterable[int]) -> Subscription:
+        """
+        Register a client for updates on a set of cities
+
+        Args:
+            city_ids: City IDs to receive records for
+
+        Returns:
+            Subscription whose queue receives serialized records
+        """
+        subscription = Subscription(city_ids, settings.live_queue_size)
+        for city_id in subscription.city_ids:
+            self._subscribers.setdefault(city_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        """Remove a client from every city it was subscribed to"""
+        for city_id in subscription.city_ids:
+            subscribers = self._subscribers.get(city_id)
+            if subscribers is None:
+                continue
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self._subscribers[city_id]
+
+    def publish(self, record: WeatherRecord) -> int:
+        """
+        Fan a record stored by this process out to its subscribers.
+        Skipped while listening, since the insert trigger delivers it to
+        every worker (including this one) through NOTIFY.
+
+        Args:
+            record: Newly stored WeatherRecord
+
+        Returns:
+            Number of subscriptions the record was delivered to
+        """
+        if self.listening:
+            return 0
+        return self._fan_out(record.city_id, record.model_dump_json())
+
+    def _on_notify(self, connection, pid: int, channel: str, payload: str) -> None:
+        """asyncpg listener callback; payload is the inserted row as JSON"""
+        try:
+            city_id = int(json.loads(payload)["city_id"])
+        except (ValueError, KeyError, TypeError):
+            return
+        self._fan_out(city_id, payload)
+
+    def _fan_out(self, city_id: int, message: str) -> int:
+        subscribers = self._subscribers.get(city_id)
+        if not subscribers:
+            return 0
+        for subscription in subscribers:
+            subscription.deliver(message)
+        return len(subscribers)
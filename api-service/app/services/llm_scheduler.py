@@ -0,0 +1,174 @@
+import asyncio
+import time
+from collections import defaultdict, deque
+from typing import Any, Awaitable, Callable, Dict
+from app.slots import SlotQueue
+
+# Lower value runs first
+PRIORITY_INTERACTIVE = 0
+PRIORITY_NORMAL = 1
+PRIORITY_BACKGROUND = 2
+
+
+class LLMOverloadedError(Exception):
+    """Raised when the LLM queue is full; the request was not admitted"""
+
+    def __init__(self, retry_after: float):
+        super().__init__("Too many insight requests in progress, try again shortly")
+        self.retry_after = retry_after
+
+
+class LLMDeadlineError(Exception):
+    """Raised when a request could not complete within its deadline"""
+
+
+class RouteUsage:
+    """Token, latency and outcome counters for one insight route"""
+
+    def __init__(self, window: int = 200):
+        self.requests = 0
+        self.errors = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.latencies = deque(maxlen=window)
+        self.queue_waits = deque(maxlen=window)
+
+    def summary(self, prompt_price: float, completion_price: float) -> dict:
+        """
+        Aggregate view of the counters
+
+        Args:
+            prompt_price: USD per million prompt tokens
+            completion_price: USD per million completion tokens
+
+        Returns:
+            Dictionary of counts, per-request averages, p95 latency and cost
+        """
+        completed = max(self.requests - self.errors - self.timeouts, 0)
+        cost = (self.prompt_tokens * prompt_price + self.completion_tokens * completion_price) / 1_000_000
+        latencies = sorted(self.latencies)
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "rejected": self.rejected,
+            "timeouts": self.timeouts,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "avg_prompt_tokens": round(self.prompt_tokens / completed, 1) if completed else None,
+            "avg_completion_tokens": round(self.completion_tokens / completed, 1) if completed else None,
+            "avg_latency_ms": round(sum(latencies) / len(latencies) * 1000, 1) if latencies else None,
+            "p95_latency_ms": round(latencies[int(0.95 * (len(latencies) - 1))] * 1000, 1) if latencies else None,
+            "avg_queue_wait_ms": (
+                round(sum(self.queue_waits) / len(self.queue_waits) * 1000, 1) if self.queue_waits else None
+            ),
+            "cost_usd": round(cost, 6),
+            "cost_per_insight_usd": round(cost / completed, 6) if completed else None
+        }
+
+
+class LLMScheduler:
+    """
+    Bounded admission for LLM calls.
+
+    At most max_concurrency calls run at once. Further requests wait in a
+    priority queue (interactive before background, FIFO within a priority) up
+    to max_queue_depth; beyond that they are rejected immediately. Every request
+    has a deadline covering both queueing and the call itself, so a burst turns
+    into fast rejections instead of ever-growing latency.
+    """
+
+    def __init__(self, max_concurrency: int, max_queue_depth: int):
+        self.max_concurrency = max_concurrency
+        self.max_queue_depth = max_queue_depth
+        self.slots = SlotQueue(max_concurrency)
+        self.usage: Dict[str, RouteUsage] = defaultdict(RouteUsage)
+
+    @property
+    def running(self) -> int:
+        """Calls holding a slot"""
+        return self.slots.running
+
+    @property
+    def queue_depth(self) -> int:
+        """Requests waiting for a slot"""
+        return self.slots.queue_depth
+
+    async def submit(
+        self,
+        call: Callable[[], Awaitable[Any]],
+        route: str,
+        priority: int = PRIORITY_NORMAL,
+        deadline_seconds: float = 30.0
+    ) -> Any:
+        """
+        Run an LLM call under admission control
+
+        Args:
+            call: Zero-argument coroutine factory performing the request; its
+                result must have a `usage` attribute (OpenAI response) or None
+            route: Name used for accounting, e.g. "ai" or "summary"
+            priority: PRIORITY_INTERACTIVE, PRIORITY_NORMAL or PRIORITY_BACKGROUND
+            deadline_seconds: Total time allowed, including queueing
+
+        Returns:
+            Result of call()
+
+        Raises:
+            LLMOverloadedError: When the queue is full
+            LLMDeadlineError: When the deadline passes while queued or running
+        """
+        usage = self.usage[route]
+        if self.slots.must_wait and self.queue_depth >= self.max_queue_depth:
+            usage.rejected += 1
+            raise LLMOverloadedError(retry_after=max(1.0, deadline_seconds / 4))
+
+        usage.requests += 1
+        started = time.perf_counter()
+        if not await self.slots.acquire(deadline_seconds, priority):
+            usage.timeouts += 1
+            raise LLMDeadlineError("Insight request timed out waiting for capacity")
+
+        admitted = time.perf_counter()
+        usage.queue_waits.append(admitted - started)
+        try:
+            remaining = deadline_seconds - (admitted - started)
+            result = await asyncio.wait_for(call(), max(remaining, 0.001))
+        except asyncio.TimeoutError:
+            usage.timeouts += 1
+            raise LLMDeadlineError("Insight request timed out")
+        except Exception:
+            usage.errors += 1
+            raise
+        finally:
+            self.slots.release()
+
+        usage.latencies.append(time.perf_counter() - admitted)
+        tokens = getattr(result, "usage", None)
+        if tokens is not None:
+            usage.prompt_tokens += tokens.prompt_tokens or 0
+            usage.completion_tokens += tokens.completion_tokens or 0
+        return result
+
+    def report(self, prompt_price: float, completion_price: float) -> dict:
+        """
+        Scheduler state and per-route accounting
+
+        Args:
+            prompt_price: USD per million prompt tokens
+            completion_price: USD per million completion tokens
+
+        Returns:
+            Dictionary with running/queued counts and a summary per route
+        """
+        return {
+            "running": self.running,
+            "queued": self.queue_depth,
+            "max_concurrency": self.max_concurrency,
+            "max_queue_depth": self.max_queue_depth,
+            "routes": {
+                route: usage.summary(prompt_price, completion_price)
+                for route, usage in self.usage.items()
+            }
+        }
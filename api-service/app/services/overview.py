@@ -0,0 +1,108 @@
+import asyncio
+import time
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, List, Optional
+from app.config import settings
+from app.models.weather import CityOverview, OverviewSection
+from app.services.database import DatabaseService
+from app.services.weather_api import WeatherAPIService
+from app.services.ai_insights import AIInsightsService
+
+# Analytics windows included in an overview, in days
+ANALYTICS_WINDOWS = {"24h": 1, "7d": 7, "30d": 30}
+
+
+class CityOverviewService:
+    """Gathers everything a city page needs in one round trip"""
+
+    def __init__(
+        self,
+        db_service: DatabaseService,
+        weather_api: WeatherAPIService,
+        ai_insights: AIInsightsService
+    ):
+        self.db_service = db_service
+        self.weather_api = weather_api
+        self.ai_insights = ai_insights
+
+    async def _section(self, fetch: Awaitable[Any]) -> OverviewSection:
+        """
+        Await one section with a timeout, capturing failures instead of raising
+
+        Args:
+            fetch: Awaitable producing the section's data
+
+        Returns:
+            OverviewSection with status ok, empty or error
+        """
+        started = time.perf_counter()
+        try:
+            data = await asyncio.wait_for(fetch, timeout=settings.overview_section_timeout_seconds)
+            status = "ok" if data is not None else "empty"
+            error = None
+        except asyncio.TimeoutError:
+            data, status, error = None, "error", "Timed out"
+        except Exception as e:
+            data, status, error = None, "error", str(e)
+
+        return OverviewSection(
+            status=status,
+            data=data,
+            error=error,
+            elapsed_ms=round((time.perf_counter() - started) * 1000, 2)
+        )
+
+    async def get_overview(
+        self,
+        city_id: int,
+        forecast_fields: Optional[List[str]] = None
+    ) -> Optional[CityOverview]:
+        """
+        Build the overview for a stored city
+
+        Args:
+            city_id: OpenWeatherMap city ID
+            forecast_fields: Return the forecast as series of these fields instead of full items
+
+        Returns:
+            CityOverview, or None if the city is unknown
+        """
+        city = await self.db_service.get_city(city_id)
+        if not city:
+            return None
+
+        end_date = datetime.now()
+        location = {"lat": city.latitude, "lon": city.longitude}
+
+        if forecast_fields:
+            forecast = self.weather_api.get_forecast_series(forecast_fields, **location)
+        else:
+            forecast = self.weather_api.get_forecast(**location)
+
+        fetches = {
+            "current": self.weather_api.get_current_weather(**location),
+            "forecast": forecast,
+            # DatabaseService runs each query in a worker thread, so these overlap
+            "latest": self.db_service.get_latest_weather(city_id),
+            **{
+                f"analytics_{window}": self.db_service.get_weather_analytics(
+                    city_id=city_id,
+                    start_date=end_date - timedelta(days=days),
+                    end_date=end_date
+                )
+                for window, days in ANALYTICS_WINDOWS.items()
+            },
+            "insight": self._cached_insight(city_id)
+        }
+
+        sections = await asyncio.gather(*(self._section(fetch) for fetch in fetches.values()))
+
+        return CityOverview(
+            city=city,
+            generated_at=end_date,
+            sections=dict(zip(fetches.keys(), sections))
+        )
+
+    async def _cached_insight(self, city_id: int) -> Optional[str]:
+        """Daily summary if one was generated recently; never calls the model"""
+        return self.ai_insights.get_cached_summary(city_id)
@@ -0,0 +1,156 @@
+import asyncio
+import math
+import time
+from collections import deque
+from typing import Awaitable, Callable, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class UpstreamUnavailableError(Exception):
+    """Raised instead of calling an upstream whose circuit breaker is open"""
+
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"{name} is unavailable, retry in {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker.
+
+    Closed: calls pass through. After failure_threshold consecutive failures
+    the breaker opens and calls fail fast for reset_seconds. It then lets a
+    single trial call through (half-open); success closes it, failure opens
+    it again. A trial that ends with neither (cancelled, or refused before
+    reaching the upstream) must be handed back with release_trial.
+    """
+
+    def __init__(self, name: str, failure_threshold: int, reset_seconds: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_in_flight = False
+
+    @property
+    def state(self) -> str:
+        """closed, open or half-open"""
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_seconds:
+            return "half-open"
+        return "open"
+
+    def before_call(self) -> bool:
+        """
+        Check whether a call may proceed
+
+        Returns:
+            True if the call is the half-open trial
+
+        Raises:
+            UpstreamUnavailableError: While open, or while a half-open trial is running
+        """
+        state = self.state
+        if state == "closed":
+            return False
+        if state == "half-open" and not self._trial_in_flight:
+            self._trial_in_flight = True
+            return True
+        retry_after = max(0.0, self.reset_seconds - (time.monotonic() - self.opened_at))
+        raise UpstreamUnavailableError(self.name, retry_after or 1.0)
+
+    def release_trial(self) -> None:
+        """Let another call be the half-open trial; a no-op once an outcome was recorded"""
+        self._trial_in_flight = False
+
+    def record_success(self) -> None:
+        """Close the breaker and reset the failure count"""
+        if self.opened_at is not None:
+            print(f"Circuit breaker for {self.name} closed")
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        """Count a failure, opening the breaker at the threshold"""
+        self.failures += 1
+        self._trial_in_flight = False
+        if self.opened_at is not None or self.failures >= self.failure_threshold:
+            if self.opened_at is None:
+                print(f"Circuit breaker for {self.name} opened after {self.failures} failures")
+            self.opened_at = time.monotonic()
+
+
+class LatencyTracker:
+    """Rolling window of call latencies for percentile estimates"""
+
+    def __init__(self, window: int = 200):
+        self.samples = deque(maxlen=window)
+
+    def record(self, seconds: float) -> None:
+        """Add one latency sample"""
+        self.samples.append(seconds)
+
+    def percentile(self, fraction: float) -> Optional[float]:
+        """
+        Latency at the given fraction of the window
+
+        Args:
+            fraction: e.g. 0.95 for p95
+
+        Returns:
+            Latency in seconds, or None with no samples
+        """
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        index = min(len(ordered) - 1, math.ceil(fraction * len(ordered)) - 1)
+        return ordered[max(index, 0)]
+
+
+async def hedged(
+    call: Callable[[], Awaitable[T]],
+    delay: Optional[float],
+    before_hedge: Optional[Callable[[], Awaitable[bool]]] = None
+) -> T:
+    """
+    Run call(); if it has not finished after delay seconds, start a second
+    identical call and return whichever succeeds first. The loser is cancelled.
+    Only use for idempotent calls.
+
+    Args:
+        call: Zero-argument coroutine factory
+        delay: Seconds to wait before hedging, or None to never hedge
+        before_hedge: Awaited just before the second call starts, e.g. to
+            charge it to a budget; returning False skips the hedge
+
+    Returns:
+        Result of the first successful call
+    """
+    primary = asyncio.ensure_future(call())
+    if delay is None:
+        return await primary
+
+    done, _ = await asyncio.wait({primary}, timeout=delay)
+    if done:
+        return primary.result()
+
+    if before_hedge is not None and not await before_hedge():
+        return await primary
+
+    pending = {primary, asyncio.ensure_future(call())}
+    error: Optional[BaseException] = None
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+                error = task.exception()
+        raise error
+    finally:
+        for task in pending:
+            task.cancel()
@@ -0,0 +1,262 @@
+import fcntl
+import json
+import mmap
+import os
+import struct
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional, Tuple
+
+# File header: magic, layout version, slot count, slot size
+_FILE_HEADER = struct.Struct("<8sIII")
+_MAGIC = b"WXSNAP01"
+_VERSION = 1
+
+# Slot header: sequence, stored_at, refresh_until, key length, data length.
+# The sequence is odd while a write is in progress (seqlock).
+_SLOT_HEADER = struct.Struct("<QddHI")
+_SEQ = struct.Struct("<Q")
+_MAX_KEY_BYTES = 128
+_PROBES = 8
+
+
+class LocalSnapshotCache:
+    """
+    In-process payload cache, used when the shared cache is disabled or
+    unavailable. Same interface as SharedSnapshotCache.
+    """
+
+    def __init__(self, max_entries: int = 1000):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, dict]]" = OrderedDict()
+        self._refresh_until: Dict[str, float] = {}
+
+    def get(self, key: str) -> Optional[Tuple[float, dict]]:
+        """
+        Look up a payload
+
+        Args:
+            key: Cache key
+
+        Returns:
+            (stored at, payload), or None
+        """
+        return self._entries.get(key)
+
+    def put(self, key: str, data: dict, stored_at: Optional[float] = None) -> None:
+        """
+        Store a payload, evicting the least recently stored entry when full
+
+        Args:
+            key: Cache key
+            data: JSON-serialisable payload
+            stored_at: Unix time the payload is considered fetched at (default now)
+        """
+        self._entries.pop(key, None)
+        self._entries[key] = (time.time() if stored_at is None else stored_at, data)
+        self._refresh_until.pop(key, None)
+        if len(self._entries) > self.max_entries:
+            evicted, _ = self._entries.popitem(last=False)
+            self._refresh_until.pop(evicted, None)
+
+    def claim_refresh(self, key: str, seconds: float) -> bool:
+        """
+        Claim the right to refresh key for the next `seconds`
+
+        Returns:
+            True if no one else holds an unexpired claim
+        """
+        now = time.time()
+        if self._refresh_until.get(key, 0) > now:
+            return False
+        self._refresh_until[key] = now + seconds
+        return True
+
+    def close(self) -> None:
+        """Nothing to release"""
+
+
+class SharedSnapshotCache:
+    """
+    Payload cache in a memory-mapped file (under /dev/shm by default) shared by
+    every uvicorn worker on the host, so a city's current weather or forecast is
+    fetched once per host rather than once per worker.
+
+    The file is a fixed table of slots addressed by key hash with linear
+    probing. Reads take no lock: each slot carries a sequence number that the
+    writer makes odd while it writes and even again afterwards, and readers
+    retry (or treat the slot as a miss) if the number changed under them.
+    Writers are serialised with flock, so there is exactly one writer at a
+    time. claim_refresh lets the workers agree on which one refreshes a stale
+    entry.
+    """
+
+    def __init__(self, path: str, slots: int, slot_bytes: int):
+        # The layout is part of the file name, so workers from a deploy with a
+        # different layout use their own file instead of resizing one that
+        # running workers have mapped (which would crash them with SIGBUS)
+        self.path = f"{path}.v{_VERSION}.{slots}x{slot_bytes}"
+        self.slots = slots
+        self.slot_bytes = slot_bytes
+        self.max_data_bytes = slot_bytes - _SLOT_HEADER.size - _MAX_KEY_BYTES
+        size = _FILE_HEADER.size + slots * slot_bytes
+
+        self._lock_fd = os.open(f"{self.path}.lock", os.O_RDWR | os.O_CREAT, 0o600)
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            with self._write_lock():
+                expected = _FILE_HEADER.pack(_MAGIC, _VERSION, slots, slot_bytes)
+                if os.fstat(self._fd).st_size == 0:
+                    # New file: size it and write the header; never shrink an existing one
+                    os.ftruncate(self._fd, size)
+                    os.pwrite(self._fd, expected, 0)
+                elif os.fstat(self._fd).st_size != size or os.pread(self._fd, _FILE_HEADER.size, 0) != expected:
+                    raise OSError(f"{self.path} does not have the expected snapshot layout")
+            self._map = mmap.mmap(self._fd, size)
+        except BaseException:
+            os.close(self._fd)
+            os.close(self._lock_fd)
+            raise
+
+    @contextmanager
+    def _write_lock(self) -> Iterator[None]:
+        """Hold the exclusive writer lock shared by all workers"""
+        fcntl.flock(self._lock_fd, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+
+    def _offsets(self, key_bytes: bytes) -> Iterator[int]:
+        """Slot offsets to probe for a key"""
+        start = _stable_hash(key_bytes) % self.slots
+        for probe in range(_PROBES):
+            yield _FILE_HEADER.size + ((start + probe) % self.slots) * self.slot_bytes
+
+    def _read_slot(self, offset: int) -> Optional[Tuple[bytes, float, float, bytes]]:
+        """Consistent (key, stored_at, refresh_until, data) of a slot, or None"""
+        for _ in range(3):
+            seq, stored_at, refresh_until, key_len, data_len = _SLOT_HEADER.unpack_from(self._map, offset)
+            if seq & 1:
+                continue
+            if seq == 0:
+                return None
+            body = offset + _SLOT_HEADER.size
+            key = self._map[body:body + key_len]
+            data = self._map[body + _MAX_KEY_BYTES:body + _MAX_KEY_BYTES + data_len]
+            if _SEQ.unpack_from(self._map, offset)[0] == seq:
+                return key, stored_at, refresh_until, data
+        return None
+
+    def get(self, key: str) -> Optional[Tuple[float, dict]]:
+        """
+        Look up a payload without locking
+
+        Args:
+            key: Cache key
+
+        Returns:
+            (stored at, payload), or None
+        """
+        key_bytes = key.encode()[:_MAX_KEY_BYTES]
+        for offset in self._offsets(key_bytes):
+            slot = self._read_slot(offset)
+            if slot is None:
+                return None
+            if slot[0] == key_bytes:
+                try:
+                    return slot[1], json.loads(slot[3])
+                except ValueError:
+                    return None
+        return None
+
+    def _find_slot_for_write(self, key_bytes: bytes) -> int:
+        """Slot holding key, else an empty one, else the oldest along the probe path"""
+        oldest_offset, oldest_at = None, float("inf")
+        for offset in self._offsets(key_bytes):
+            seq, stored_at, _, key_len, _ = _SLOT_HEADER.unpack_from(self._map, offset)
+            body = offset + _SLOT_HEADER.size
+            if seq == 0 or self._map[body:body + key_len] == key_bytes:
+                return offset
+            if stored_at < oldest_at:
+                oldest_offset, oldest_at = offset, stored_at
+        return oldest_offset
+
+    def _write_slot(
+        self,
+        offset: int,
+        key_bytes: bytes,
+        stored_at: float,
+        refresh_until: float,
+        data: bytes
+    ) -> None:
+        """Write a slot with the seqlock protocol; caller holds the writer lock"""
+        seq = _SEQ.unpack_from(self._map, offset)[0]
+        _SEQ.pack_into(self._map, offset, seq + 1)
+        body = offset + _SLOT_HEADER.size
+        self._map[body:body + len(key_bytes)] = key_bytes
+        self._map[body + _MAX_KEY_BYTES:body + _MAX_KEY_BYTES + len(data)] = data
+        _SLOT_HEADER.pack_into(
+            self._map, offset, seq + 1, stored_at, refresh_until, len(key_bytes), len(data)
+        )
+        _SEQ.pack_into(self._map, offset, seq + 2)
+
+    def put(self, key: str, data: dict, stored_at: Optional[float] = None) -> None:
+        """
+        Store a payload for all workers. Payloads larger than a slot are skipped.
+
+        Args:
+            key: Cache key
+            data: JSON-serialisable payload
+            stored_at: Unix time the payload is considered fetched at (default now)
+        """
+        encoded = json.dumps(data, separators=(",", ":")).encode()
+        if len(encoded) > self.max_data_bytes:
+            print(f"Snapshot for {key} is {len(encoded)} bytes, larger than a slot; not shared")
+            return
+
+        key_bytes = key.encode()[:_MAX_KEY_BYTES]
+        with self._write_lock():
+            offset = self._find_slot_for_write(key_bytes)
+            self._write_slot(
+                offset, key_bytes, time.time() if stored_at is None else stored_at, 0.0, encoded
+            )
+
+    def claim_refresh(self, key: str, seconds: float) -> bool:
+        """
+        Claim the right to refresh key for the next `seconds`, across workers
+
+        Returns:
+            True if this worker should refresh; False if another worker holds
+            the claim or the key is not cached
+        """
+        key_bytes = key.encode()[:_MAX_KEY_BYTES]
+        now = time.time()
+        with self._write_lock():
+            for offset in self._offsets(key_bytes):
+                slot = self._read_slot(offset)
+                if slot is None:
+                    return False
+                slot_key, stored_at, refresh_until, data = slot
+                if slot_key != key_bytes:
+                    continue
+                if refresh_until > now:
+                    return False
+                self._write_slot(offset, key_bytes, stored_at, now + seconds, data)
+                return True
+        return False
+
+    def close(self) -> None:
+        """Unmap the file and release descriptors; the file stays for other workers"""
+        self._map.close()
+        os.close(self._fd)
+        os.close(self._lock_fd)
+
+
+def _stable_hash(value: bytes) -> int:
+    """Hash that is the same in every worker (str hashes are salted per process)"""
+    result = 0xCBF29CE484222325
+    for byte in value:
+        result = ((result ^ byte) * 0x100000001B3) & 0xFFFFFFFFFFFFFFFF
+    return result
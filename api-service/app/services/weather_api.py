@@ -1,20 +1,255 @@
+import asyncio
+import time
 import httpx
-from datetime import datetime
-from typing import Optional
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, TYPE_CHECKING
 from app.config import settings
 from app.models.weather import (
     CurrentWeatherResponse,
     ForecastResponse,
+    ForecastSeries,
+    City,
+    CityModel,
     WeatherRecord
 )
+from app.services.resilience import CircuitBreaker, LatencyTracker, hedged
+from app.services.snapshot_cache import LocalSnapshotCache
+from weather_common import INTERACTIVE, QuotaExhaustedError, UpstreamQuota, decode_current_weather
+
+if TYPE_CHECKING:
+    from app.services.database import DatabaseService
+    from app.services.live_updates import LiveUpdateBroker
+
+# Forecast series clients can request, read straight from the raw forecast items
+FORECAST_SERIES_FIELDS: Dict[str, Callable[[dict], Any]] = {
+    "temp": lambda item: item["main"]["temp"],
+    "feels_like": lambda item: item["main"]["feels_like"],
+    "temp_min": lambda item: item["main"]["temp_min"],
+    "temp_max": lambda item: item["main"]["temp_max"],
+    "pressure": lambda item: item["main"]["pressure"],
+    "humidity": lambda item: item["main"]["humidity"],
+    "pop": lambda item: item.get("pop", 0),
+    "rain": lambda item: item.get("rain", {}).get("3h", 0),
+    "snow": lambda item: item.get("snow", {}).get("3h", 0),
+    "wind_speed": lambda item: item["wind"]["speed"],
+    "wind_direction": lambda item: item["wind"].get("deg", 0),
+    "wind_gust": lambda item: item["wind"].get("gust"),
+    "cloudiness": lambda item: item["clouds"]["all"],
+    "visibility": lambda item: item.get("visibility"),
+    "weather_main": lambda item: item["weather"][0]["main"],
+    "weather_description": lambda item: item["weather"][0]["description"],
+    "weather_icon": lambda item: item["weather"][0]["icon"],
+    "dt_txt": lambda item: item["dt_txt"]
+}
+
+DEFAULT_FORECAST_SERIES = ["temp", "pop"]
+
+
+class UpstreamResult(NamedTuple):
+    """Current weather payload and where it came from"""
+    data: dict
+    # upstream, cache (fetched within upstream_fresh_seconds), stale (served
+    # while refreshing in the background) or database (stored observation)
+    source: str
+    age_seconds: float
+
+
+def payload_from_record(record: WeatherRecord, city: CityModel) -> dict:
+    """
+    Rebuild a current weather payload from a stored observation
+
+    Args:
+        record: Stored weather record
+        city: City the record belongs to
+
+    Returns:
+        Dict shaped like the upstream /weather response
+    """
+    return {
+        "coord": {"lon": record.longitude, "lat": record.latitude},
+        "weather": [{
+            "id": 0,
+            "main": record.weather_main,
+            "description": record.weather_description,
+            "icon": record.weather_icon
+        }],
+        "base": "stations",
+        "main": {
+            "temp": record.temperature,
+            "feels_like": record.feels_like,
+            "temp_min": record.temp_min,
+            "temp_max": record.temp_max,
+            "pressure": record.pressure,
+            "humidity": record.humidity
+        },
+        "visibility": record.visibility,
+        "wind": {"speed": record.wind_speed, "deg": record.wind_direction},
+        "clouds": {"all": record.cloudiness},
+        "dt": int(record.recorded_at.timestamp()),
+        "sys": {"country": record.country, "sunrise": 0, "sunset": 0},
+        "timezone": city.timezone,
+        "id": record.city_id,
+        "name": record.city_name,
+        "cod": 200
+    }
 
 
 class WeatherAPIService:
-    """Service for fetching weather data from OpenWeatherMap API"""
+    """
+    Service for fetching weather data from OpenWeatherMap API.
 
-    def __init__(self):
+    Upstream calls go through a circuit breaker and, when enabled, are hedged
+    with a second request after the recent p95 latency. Current weather is
+    served from recent observations (in memory, or stored in weather_records)
+    while a background refresh runs, so a slow upstream does not hold up
+    requests. Every new upstream observation, whether fetched for a request
+    or by a background refresh, is stored in weather_records and published
+    to live subscribers.
+    """
+
+    def __init__(
+        self,
+        db_service: Optional["DatabaseService"] = None,
+        cache: Optional[Any] = None,
+        live_broker: Optional["LiveUpdateBroker"] = None
+    ):
         self.base_url = settings.weather_api_base_url
         self.api_key = settings.weather_api_key
+        self.db_service = db_service
+        self.live_broker = live_broker
+        self._http: Optional[httpx.AsyncClient] = None
+        self._quota: Optional[UpstreamQuota] = None
+        self.breaker = CircuitBreaker(
+            "OpenWeatherMap",
+            failure_threshold=settings.breaker_failure_threshold,
+            reset_seconds=settings.breaker_reset_seconds
+        )
+        self.latency = LatencyTracker()
+        # Current weather and forecast payloads; a SharedSnapshotCache when
+        # several workers run on one host
+        self.cache = cache or LocalSnapshotCache(settings.upstream_cache_size)
+        self._refreshing: Dict[str, asyncio.Task] = {}
+
+    @property
+    def http(self) -> httpx.AsyncClient:
+        """Shared HTTP client, created on first use"""
+        if self._http is None:
+            self._http = httpx.AsyncClient(timeout=settings.upstream_timeout_seconds)
+        return self._http
+
+    @property
+    def quota(self) -> Optional[UpstreamQuota]:
+        """Interactive-priority share of the upstream budget, created on first use"""
+        if self._quota is None and settings.quota_enabled and self.db_service:
+            self._quota = UpstreamQuota(
+                self.db_service.client,
+                INTERACTIVE,
+                bucket=settings.quota_bucket,
+                chunk_size=settings.quota_chunk_size
+            )
+        return self._quota
+
+    async def aclose(self) -> None:
+        """Cancel background refreshes and close the HTTP client"""
+        for task in list(self._refreshing.values()):
+            task.cancel()
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+
+    def _params(
+        self,
+        city: Optional[str],
+        lat: Optional[float],
+        lon: Optional[float]
+    ) -> dict:
+        """Query parameters for a city name or coordinates lookup"""
+        params = {
+            "appid": self.api_key,
+            "units": "metric"  # Use Celsius
+        }
+
+        if city:
+            params["q"] = city
+        elif lat is not None and lon is not None:
+            params["lat"] = lat
+            params["lon"] = lon
+        else:
+            raise ValueError("Must provide either city name or coordinates")
+
+        return params
+
+    async def _request(self, path: str, params: dict) -> dict:
+        """Single upstream GET, recording its latency"""
+        started = time.perf_counter()
+        response = await self.http.get(f"{self.base_url}/{path}", params=params)
+        self.latency.record(time.perf_counter() - started)
+        response.raise_for_status()
+        return response.json()
+
+    def _hedge_delay(self) -> Optional[float]:
+        """Delay before a hedged request, or None when hedging is off or unwarmed"""
+        if not settings.upstream_hedge_enabled:
+            return None
+        if len(self.latency.samples) < settings.upstream_hedge_min_samples:
+            return None
+        p = self.latency.percentile(settings.upstream_hedge_percentile)
+        return max(p, settings.upstream_hedge_min_delay_ms / 1000)
+
+    async def _charge_hedge(self) -> bool:
+        """Take a token for a hedged duplicate request; False skips the hedge"""
+        return not await asyncio.to_thread(self.quota.try_acquire)
+
+    async def _get_json(self, path: str, params: dict) -> dict:
+        """
+        GET an upstream endpoint through the circuit breaker
+
+        Args:
+            path: Path below the API base URL
+            params: Query parameters
+
+        Returns:
+            Parsed JSON
+
+        Raises:
+            UpstreamUnavailableError: When the breaker is open
+            QuotaExhaustedError: When the shared budget is spent
+        """
+        trial = self.breaker.before_call()
+        try:
+            before_hedge = None
+            if self.quota:
+                # One token per upstream request; taking a chunk may be a
+                # database round trip, so keep it off the loop
+                await asyncio.to_thread(self.quota.acquire)
+                before_hedge = self._charge_hedge
+            data = await hedged(
+                lambda: self._request(path, params),
+                self._hedge_delay(),
+                before_hedge
+            )
+        except QuotaExhaustedError:
+            # Not an upstream failure
+            raise
+        except httpx.HTTPStatusError as e:
+            # Client errors (unknown city, bad key) mean the upstream is healthy
+            status = e.response.status_code
+            if status >= 500 or status == 429:
+                self.breaker.record_failure()
+            else:
+                self.breaker.record_success()
+            raise
+        except Exception:
+            self.breaker.record_failure()
+            raise
+        finally:
+            # A trial cancelled by a caller's timeout (or refused by the quota)
+            # recorded no outcome; without this the breaker stays half-open
+            # and rejects every later call
+            if trial:
+                self.breaker.release_trial()
+
+        self.breaker.record_success()
+        return data
 
     async def get_current_weather(
         self,
@@ -33,29 +268,155 @@ class WeatherAPIService:
         Returns:
             CurrentWeatherResponse with weather data
         """
-        params = {
-            "appid": self.api_key,
-            "units": "metric"  # Use Celsius
-        }
+        data = await self.fetch_current_weather_data(city=city, lat=lat, lon=lon)
+        return CurrentWeatherResponse(**data)
+
+    async def fetch_current_weather_data(
+        self,
+        city: Optional[str] = None,
+        lat: Optional[float] = None,
+        lon: Optional[float] = None
+    ) -> dict:
+        """
+        Fetch the parsed current weather payload by city name or coordinates
+
+        Args:
+            city: City name (e.g., "London" or "London,UK")
+            lat: Latitude
+            lon: Longitude
+
+        Returns:
+            Upstream JSON as a dict
+        """
+        result = await self.get_current_observation(city=city, lat=lat, lon=lon)
+        return result.data
+
+    async def get_current_observation(
+        self,
+        city: Optional[str] = None,
+        lat: Optional[float] = None,
+        lon: Optional[float] = None
+    ) -> UpstreamResult:
+        """
+        Current weather, served from a recent observation when one is within
+        upstream_stale_seconds (refreshing in the background), otherwise
+        fetched from the upstream
+
+        Args:
+            city: City name (e.g., "London" or "London,UK")
+            lat: Latitude
+            lon: Longitude
 
+        Returns:
+            UpstreamResult with the payload, its source and observation age
+        """
+        params = self._params(city, lat, lon)
+        key = "current:" + self._location_key(city, lat, lon)
+
+        now = time.time()
+        cached = self.cache.get(key)
+        if cached:
+            fetched_at, data = cached
+            age = now - data["dt"]
+            if now - fetched_at < settings.upstream_fresh_seconds:
+                return UpstreamResult(data, "cache", age)
+            if age < settings.upstream_stale_seconds:
+                self._refresh_in_background(key, params)
+                return UpstreamResult(data, "stale", age)
+        elif city and self.db_service:
+            stored = await self._stored_observation(city)
+            if stored and now - stored["dt"] < settings.upstream_stale_seconds:
+                self.cache.put(key, stored, stored_at=0.0)
+                self._refresh_in_background(key, params)
+                return UpstreamResult(stored, "database", now - stored["dt"])
+
+        data = await self._fetch_current(key, params)
+        return UpstreamResult(data, "upstream", time.time() - data["dt"])
+
+    @staticmethod
+    def _location_key(
+        city: Optional[str],
+        lat: Optional[float],
+        lon: Optional[float]
+    ) -> str:
+        """Cache key part for a city name or coordinates lookup"""
         if city:
-            params["q"] = city
-        elif lat is not None and lon is not None:
-            params["lat"] = lat
-            params["lon"] = lon
-        else:
-            raise ValueError("Must provide either city name or coordinates")
+            return f"q:{city.strip().lower()}"
+        return f"coord:{round(lat, 2)}:{round(lon, 2)}"
 
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{self.base_url}/weather",
-                params=params,
-                timeout=10.0
-            )
-            response.raise_for_status()
-            data = response.json()
+    async def _fetch_current(self, key: str, params: dict) -> dict:
+        """Fetch current weather from the upstream, cache it and store it if new"""
+        previous = self.cache.get(key)
+        data = await self._get_json("weather", params)
+        self.cache.put(key, data)
+        if not previous or previous[1].get("dt") != data.get("dt"):
+            await self._store_observation(data)
+        return data
 
-        return CurrentWeatherResponse(**data)
+    async def _store_observation(self, data: dict) -> None:
+        """
+        Store an upstream observation for historical tracking and notify live
+        subscribers. A storage failure is logged; the payload is still served.
+
+        Args:
+            data: Upstream current weather payload
+        """
+        if not self.db_service:
+            return
+        try:
+            # Decode the payload straight into database rows
+            observation = decode_current_weather(data)
+            await self.db_service.upsert_city_row(observation.city)
+            # None when this observation was already stored
+            stored = await self.db_service.insert_weather_row(observation.record, observation.city)
+        except Exception as e:
+            print(f"Could not store observation for city {data.get('id')}: {e}")
+            return
+        if stored and self.live_broker:
+            self.live_broker.publish(stored)
+
+    def _refresh_in_background(self, key: str, params: dict) -> None:
+        """
+        Start a refresh for key unless this worker is already refreshing it or
+        another worker has claimed it
+        """
+        if key in self._refreshing:
+            return
+        if not self.cache.claim_refresh(key, settings.upstream_timeout_seconds * 2):
+            return
+        self._refreshing[key] = asyncio.create_task(self._refresh(key, params))
+
+    async def _refresh(self, key: str, params: dict) -> None:
+        """Background refresh of one cached observation"""
+        try:
+            await self._fetch_current(key, params)
+        except Exception as e:
+            print(f"Background refresh failed for {key}: {e}")
+        finally:
+            self._refreshing.pop(key, None)
+
+    async def _stored_observation(self, city: str) -> Optional[dict]:
+        """
+        Latest stored observation for a city name, as an upstream-shaped payload
+
+        Args:
+            city: City name, optionally with ",country"
+
+        Returns:
+            Payload dict, or None when the city or its records are unknown
+        """
+        name = city.split(",")[0].strip().lower()
+        try:
+            matches = await self.db_service.search_cities(name)
+            match = next((c for c in matches if c.name.lower() == name), None)
+            if not match:
+                return None
+            record = await self.db_service.get_latest_weather(match.city_id)
+        except Exception as e:
+            print(f"Stored observation lookup failed for {city}: {e}")
+            return None
+
+        return payload_from_record(record, match) if record else None
 
     async def get_forecast(
         self,
@@ -74,61 +435,66 @@ class WeatherAPIService:
         Returns:
             ForecastResponse with forecast data
         """
-        params = {
-            "appid": self.api_key,
-            "units": "metric"
-        }
+        data = await self.fetch_forecast_data(city=city, lat=lat, lon=lon)
+        return ForecastResponse(**data)
 
-        if city:
-            params["q"] = city
-        elif lat is not None and lon is not None:
-            params["lat"] = lat
-            params["lon"] = lon
-        else:
-            raise ValueError("Must provide either city name or coordinates")
+    async def get_forecast_series(
+        self,
+        fields: List[str],
+        city: Optional[str] = None,
+        lat: Optional[float] = None,
+        lon: Optional[float] = None
+    ) -> ForecastSeries:
+        """
+        Fetch the forecast as one array per requested field, without
+        validating the nested forecast items
 
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{self.base_url}/forecast",
-                params=params,
-                timeout=10.0
-            )
-            response.raise_for_status()
-            data = response.json()
+        Args:
+            fields: Names from FORECAST_SERIES_FIELDS
+            city: City name
+            lat: Latitude
+            lon: Longitude
 
-        return ForecastResponse(**data)
+        Returns:
+            ForecastSeries with a timestamp array and the requested series
+        """
+        data = await self.fetch_forecast_data(city=city, lat=lat, lon=lon)
+        items = data["list"]
 
-    @staticmethod
-    def transform_to_weather_record(
-        weather_response: CurrentWeatherResponse
-    ) -> WeatherRecord:
+        return ForecastSeries(
+            city=City(**data["city"]),
+            cnt=len(items),
+            dt=[item["dt"] for item in items],
+            series={
+                field: [FORECAST_SERIES_FIELDS[field](item) for item in items]
+                for field in fields
+            }
+        )
+
+    async def fetch_forecast_data(
+        self,
+        city: Optional[str] = None,
+        lat: Optional[float] = None,
+        lon: Optional[float] = None
+    ) -> dict:
         """
-        Transform API response to database record format
+        Fetch the parsed 5-day forecast payload by city name or coordinates
 
         Args:
-            weather_response: CurrentWeatherResponse from API
+            city: City name
+            lat: Latitude
+            lon: Longitude
 
         Returns:
-            WeatherRecord ready for database insertion
-        """
-        return WeatherRecord(
-            city_id=weather_response.id,
-            city_name=weather_response.name,
-            country=weather_response.sys.country,
-            latitude=weather_response.coord.lat,
-            longitude=weather_response.coord.lon,
-            temperature=weather_response.main.temp,
-            feels_like=weather_response.main.feels_like,
-            temp_min=weather_response.main.temp_min,
-            temp_max=weather_response.main.temp_max,
-            pressure=weather_response.main.pressure,
-            humidity=weather_response.main.humidity,
-            wind_speed=weather_response.wind.speed,
-            wind_direction=weather_response.wind.deg,
-            cloudiness=weather_response.clouds.all,
-            visibility=weather_response.visibility,
-            weather_main=weather_response.weather[0].main,
-            weather_description=weather_response.weather[0].description,
-            weather_icon=weather_response.weather[0].icon,
-            recorded_at=datetime.fromtimestamp(weather_response.dt)
-        )
+            Upstream JSON as a dict
+        """
+        params = self._params(city, lat, lon)
+        key = "forecast:" + self._location_key(city, lat, lon)
+
+        cached = self.cache.get(key)
+        if cached and time.time() - cached[0] < settings.forecast_cache_seconds:
+            return cached[1]
+
+        data = await self._get_json("forecast", params)
+        self.cache.put(key, data)
+        return data
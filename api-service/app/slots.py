@@ -0,0 +1,71 @@
+import asyncio
+import heapq
+import itertools
+from typing import List, Tuple
+
+
+class SlotQueue:
+    """
+    At most max_concurrency holders at once; everyone else waits in a
+    priority queue (lower value first, FIFO within a priority).
+
+    A released slot is handed straight to the next live waiter, so a
+    request arriving between a release and the waiter waking up cannot
+    jump the queue. Shared by the admission gates and the LLM scheduler,
+    which add their own queue bounds and accounting on top.
+    """
+
+    def __init__(self, max_concurrency: int):
+        self.max_concurrency = max_concurrency
+        self.running = 0
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._sequence = itertools.count()
+
+    @property
+    def queue_depth(self) -> int:
+        """Requests waiting for a slot"""
+        return sum(1 for _, _, waiter in self._waiters if not waiter.done())
+
+    @property
+    def must_wait(self) -> bool:
+        """Whether a new request would have to queue"""
+        return self.running >= self.max_concurrency or self.queue_depth > 0
+
+    async def acquire(self, timeout: float, priority: int = 0) -> bool:
+        """
+        Wait for a slot
+
+        Args:
+            timeout: Seconds to wait in the queue
+            priority: Lower values are served first
+
+        Returns:
+            True once a slot is held, False if the timeout passed first
+        """
+        if not self.must_wait:
+            self.running += 1
+            return True
+
+        waiter = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._sequence), waiter))
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just as we gave up; pass it on
+                self.release()
+            else:
+                waiter.cancel()
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            return False
+        return True
+
+    def release(self) -> None:
+        """Hand the slot to the next live waiter, or free it"""
+        while self._waiters:
+            _, _, waiter = heapq.heappop(self._waiters)
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.running -= 1
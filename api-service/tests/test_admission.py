@@ -0,0 +1,82 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import httpx
+from fastapi import FastAPI
+from app.admission import AdmissionControlMiddleware, AdmissionGate
+from app.services.database import DatabaseService
+
+HEAVY_REQUESTS = 4
+
+
+class BlockingQuery:
+    """Query builder stand-in whose execute() holds its thread until released"""
+
+    def __init__(self, release: threading.Event, started: threading.Semaphore):
+        self.release = release
+        self.started = started
+
+    def execute(self):
+        self.started.release()
+        self.release.wait(5)
+        return "heavy"
+
+
+class InstantQuery:
+    def execute(self):
+        return "light"
+
+
+def test_light_route_is_served_while_heavy_gate_is_full():
+    db = DatabaseService()
+    release = threading.Event()
+    started = threading.Semaphore(0)
+
+    app = FastAPI()
+
+    @app.get("/weather/historical/{city_id}")
+    async def heavy(city_id: int):
+        # Fans out to more queries than the default executor has threads
+        results = await asyncio.gather(*(
+            db._execute(BlockingQuery(release, started)) for _ in range(3)
+        ))
+        return {"results": results}
+
+    @app.get("/weather/latest/{city_id}")
+    async def light(city_id: int):
+        return {"result": await db._execute(InstantQuery())}
+
+    gate = AdmissionGate("heavy", HEAVY_REQUESTS, 0, 0.1)
+    app.add_middleware(AdmissionControlMiddleware, gates={"heavy": gate})
+
+    async def scenario():
+        # A default executor smaller than the heavy fan-out, as on a small host
+        asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=2))
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            heavy_requests = [
+                asyncio.create_task(client.get(f"/weather/historical/{n}"))
+                for n in range(HEAVY_REQUESTS)
+            ]
+            # Wait until the heavy pool is busy and the gate is full
+            for _ in range(db._heavy_executor._max_workers):
+                await asyncio.to_thread(started.acquire, True, 5)
+            assert gate.running == HEAVY_REQUESTS
+
+            shed = await client.get("/weather/historical/99")
+            light = await asyncio.wait_for(client.get("/weather/latest/1"), 2)
+
+            release.set()
+            heavy_responses = await asyncio.gather(*heavy_requests)
+        return shed, light, heavy_responses
+
+    try:
+        shed, light, heavy_responses = asyncio.run(scenario())
+    finally:
+        release.set()
+        db.close()
+
+    assert shed.status_code == 503
+    assert light.status_code == 200
+    assert light.json() == {"result": "light"}
+    assert all(response.status_code == 200 for response in heavy_responses)
@@ -0,0 +1,39 @@
+import asyncio
+import pytest
+from app.services.ai_insights import AIInsightsService
+from app.services.llm_scheduler import LLMScheduler, LLMOverloadedError
+
+
+class CountingDatabase:
+    def __init__(self):
+        self.calls = 0
+
+    async def get_latest_weather(self, city_id):
+        self.calls += 1
+        return None
+
+    async def get_weather_analytics(self, city_id, start_date, end_date):
+        self.calls += 1
+        return None
+
+
+def test_rejected_insight_does_no_database_work():
+    db = CountingDatabase()
+    service = AIInsightsService(db)
+    service.scheduler = LLMScheduler(max_concurrency=1, max_queue_depth=0)
+
+    async def scenario():
+        hold = asyncio.Event()
+
+        async def occupy():
+            await hold.wait()
+
+        running = asyncio.create_task(service.scheduler.submit(occupy, route="ai"))
+        await asyncio.sleep(0)
+        with pytest.raises(LLMOverloadedError):
+            await service.get_insight(1, "Oslo", "Umbrella?")
+        hold.set()
+        await running
+
+    asyncio.run(scenario())
+    assert db.calls == 0
@@ -0,0 +1,25 @@
+import pytest
+from app.config import settings
+from app.routers.live import parse_subscription
+
+
+def test_subscription_is_parsed_and_capped():
+    assert parse_subscription('{"subscribe": [1, 2]}') == [1, 2]
+    assert parse_subscription("{}") == []
+
+    too_many = list(range(settings.live_max_cities + 5))
+    assert parse_subscription(f'{{"subscribe": {too_many}}}') == too_many[:settings.live_max_cities]
+
+
+@pytest.mark.parametrize("text", [
+    "not json",
+    "[1, 2]",
+    '{"subscribe": 5}',
+    '{"subscribe": "1,2"}',
+    '{"subscribe": [1, "2"]}',
+    '{"subscribe": [1.5]}',
+    '{"subscribe": [true]}',
+])
+def test_malformed_subscription_is_rejected(text):
+    with pytest.raises(ValueError):
+        parse_subscription(text)
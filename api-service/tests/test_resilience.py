@@ -0,0 +1,83 @@
+import asyncio
+import pytest
+from app.services.resilience import CircuitBreaker, UpstreamUnavailableError, hedged
+from app.services.weather_api import WeatherAPIService
+from weather_common import QuotaExhaustedError
+
+
+def open_breaker(breaker: CircuitBreaker) -> None:
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure()
+
+
+def test_half_open_allows_a_single_trial():
+    breaker = CircuitBreaker("test", failure_threshold=2, reset_seconds=0)
+    open_breaker(breaker)
+    assert breaker.state == "half-open"
+
+    assert breaker.before_call() is True
+    with pytest.raises(UpstreamUnavailableError):
+        breaker.before_call()
+
+    breaker.record_success()
+    assert breaker.state == "closed"
+    assert breaker.before_call() is False
+
+
+def test_cancelled_trial_is_released():
+    service = WeatherAPIService()
+    service.breaker = CircuitBreaker("test", failure_threshold=1, reset_seconds=0)
+    open_breaker(service.breaker)
+
+    async def hang(path, params):
+        await asyncio.sleep(60)
+
+    service._request = hang
+
+    async def run():
+        # The caller's timeout cancels the half-open trial mid-flight
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(service._get_json("weather", {}), 0.01)
+
+    asyncio.run(run())
+    assert service.breaker.state == "half-open"
+    assert service.breaker.before_call() is True
+
+
+def test_quota_refusal_releases_trial():
+    service = WeatherAPIService()
+    service.breaker = CircuitBreaker("test", failure_threshold=1, reset_seconds=0)
+    open_breaker(service.breaker)
+
+    class Exhausted:
+        def acquire(self):
+            raise QuotaExhaustedError(5.0)
+
+    service._quota = Exhausted()
+
+    with pytest.raises(QuotaExhaustedError):
+        asyncio.run(service._get_json("weather", {}))
+    assert service.breaker.before_call() is True
+
+
+def test_hedge_is_charged_and_skipped_when_refused():
+    async def run(allow: bool):
+        calls = []
+        charges = []
+
+        async def call():
+            calls.append(len(calls))
+            await asyncio.sleep(0.05 if len(calls) == 1 else 0)
+            return len(calls)
+
+        async def before_hedge():
+            charges.append(True)
+            return allow
+
+        return await hedged(call, 0.01, before_hedge), calls, charges
+
+    result, calls, charges = asyncio.run(run(True))
+    assert len(calls) == 2 and len(charges) == 1
+
+    result, calls, charges = asyncio.run(run(False))
+    assert len(calls) == 1 and len(charges) == 1
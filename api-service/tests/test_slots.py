@@ -0,0 +1,47 @@
+import asyncio
+from app.slots import SlotQueue
+
+
+def test_waiters_are_served_by_priority_then_arrival():
+    async def scenario():
+        slots = SlotQueue(1)
+        assert await slots.acquire(1.0)
+        order = []
+
+        async def waiter(name, priority):
+            assert await slots.acquire(1.0, priority)
+            order.append(name)
+            slots.release()
+
+        tasks = [
+            asyncio.create_task(waiter("background", 2)),
+            asyncio.create_task(waiter("first", 0)),
+            asyncio.create_task(waiter("second", 0)),
+        ]
+        await asyncio.sleep(0)
+        assert slots.queue_depth == 3
+        slots.release()
+        await asyncio.gather(*tasks)
+        return order, slots.running
+
+    order, running = asyncio.run(scenario())
+    assert order == ["first", "second", "background"]
+    assert running == 0
+
+
+def test_timed_out_and_cancelled_waiters_give_up_their_place():
+    async def scenario():
+        slots = SlotQueue(1)
+        assert await slots.acquire(1.0)
+        assert not await slots.acquire(0.01)
+
+        cancelled = asyncio.create_task(slots.acquire(1.0))
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        await asyncio.gather(cancelled, return_exceptions=True)
+
+        assert slots.queue_depth == 0
+        slots.release()
+        return slots.running, slots.must_wait
+
+    assert asyncio.run(scenario()) == (0, False)
@@ -0,0 +1,67 @@
+import argparse
+import asyncio
+import os
+from config import settings
+from etl.backfill import WeatherBackfill
+
+
+async def main():
+    """Main entry point for the history backfill"""
+    parser = argparse.ArgumentParser(
+        description="Detect gaps in weather_records and fill them from the OpenWeatherMap history API"
+    )
+    parser.add_argument(
+        "--city-id",
+        type=int,
+        action="append",
+        dest="city_ids",
+        help="City to backfill (repeatable); defaults to cities_to_track"
+    )
+    parser.add_argument(
+        "--days",
+        type=int,
+        default=7,
+        help="How many days back to look for gaps"
+    )
+    parser.add_argument(
+        "--max-rate",
+        type=float,
+        default=settings.backfill_max_rate,
+        help="Maximum history API requests per second"
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=settings.backfill_concurrency,
+        help="Maximum history API requests in flight"
+    )
+    parser.add_argument(
+        "--checkpoint",
+        default="backfill_checkpoint.json",
+        help="Checkpoint file used to resume an interrupted backfill"
+    )
+    parser.add_argument(
+        "--fresh",
+        action="store_true",
+        help="Ignore an existing checkpoint and plan again"
+    )
+    args = parser.parse_args()
+    if args.max_rate <= 0:
+        parser.error("--max-rate must be positive")
+    if args.concurrency < 1:
+        parser.error("--concurrency must be at least 1")
+
+    backfill = WeatherBackfill(args.checkpoint)
+    if args.fresh and os.path.exists(args.checkpoint):
+        os.remove(args.checkpoint)
+
+    await backfill.run(
+        city_ids=args.city_ids or settings.cities_to_track,
+        days=args.days,
+        max_rate=args.max_rate,
+        concurrency=args.concurrency
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,147 @@
+"""
+End-to-end throughput of the collector against a local stub OpenWeatherMap
+and a local Supabase (`supabase start`; point SUPABASE_URL/SUPABASE_KEY at it).
+
+Run from the data-pipeline directory:
+    python -m benchmarks.bench_collector --cities 10000 --runs 3
+    python -m benchmarks.bench_collector --load database --upstream-latency-ms 50
+
+Each run advances the stub's clock so every city has a new observation.
+Quota and sharding are disabled; per-run statistics are still written to
+collection_runs like a scheduled run.
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+from config import settings
+from etl.spool import SpoolLoader
+from weather_common.synthetic import SyntheticWeather, synthetic_cities
+
+
+class StubWeatherServer(ThreadingHTTPServer):
+    """Serves /weather?id= for synthetic cities at an adjustable timestamp"""
+
+    daemon_threads = True
+
+    def __init__(self, cities, seed: int, latency_ms: float):
+        super().__init__(("127.0.0.1", 0), StubWeatherHandler)
+        self.cities = {city.city_id: city for city in cities}
+        self.generator = SyntheticWeather(seed)
+        self.latency_seconds = latency_ms / 1000
+        self.ts = time.time()
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+class StubWeatherHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        server: StubWeatherServer = self.server
+        url = urlparse(self.path)
+        city_ids = parse_qs(url.query).get("id", [])
+        city = server.cities.get(int(city_ids[0])) if city_ids and city_ids[0].isdigit() else None
+        if url.path != "/weather" or city is None:
+            self._reply(404, {"cod": "404", "message": "city not found"})
+            return
+        if server.latency_seconds:
+            time.sleep(server.latency_seconds)
+        self._reply(200, server.generator.current_payload(city, server.ts))
+
+    def _reply(self, status: int, body: dict) -> None:
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def configure(args) -> None:
+    """Apply benchmark overrides before the collector reads its settings"""
+    settings.quota_enabled = False
+    settings.sharding_enabled = False
+    settings.spool_enabled = args.load == "spool"
+    if args.load == "spool":
+        settings.spool_dir = tempfile.mkdtemp(prefix="bench-spool-")
+    if args.extract_concurrency:
+        settings.extract_concurrency = args.extract_concurrency
+    if args.load_concurrency:
+        settings.load_concurrency = args.load_concurrency
+    settings.run_telemetry_enabled = not args.no_telemetry
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark end-to-end collector throughput")
+    parser.add_argument("--cities", type=int, default=10000)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--load", choices=("spool", "database"), default="spool")
+    parser.add_argument("--upstream-latency-ms", type=float, default=0.0)
+    parser.add_argument("--extract-concurrency", type=int)
+    parser.add_argument("--load-concurrency", type=int)
+    parser.add_argument("--no-telemetry", action="store_true", help="Do not write collection_runs rows")
+    parser.add_argument("--verbose", action="store_true", help="Show the collector's per-city output")
+    args = parser.parse_args()
+
+    configure(args)
+    # Imported after configure() so the collector picks up the overrides
+    from etl.weather_collector import WeatherDataCollector
+
+    cities = synthetic_cities(args.cities, args.seed)
+    city_ids = [city.city_id for city in cities]
+    server = StubWeatherServer(cities, args.seed, args.upstream_latency_ms)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    collector = WeatherDataCollector()
+    collector.base_url = server.base_url
+    collector.supabase.rpc(
+        "ensure_weather_partitions",
+        {"p_months_ahead": settings.partition_months_ahead}
+    ).execute()
+    loader = SpoolLoader(settings.spool_dir, collector.supabase) if collector.spool else None
+
+    print(
+        f"{args.cities} cities, {args.runs} runs, load={args.load}, "
+        f"extract={settings.extract_concurrency}, load={settings.load_concurrency}, "
+        f"upstream latency {args.upstream_latency_ms:.0f}ms"
+    )
+    try:
+        for number in range(1, args.runs + 1):
+            # Ten minutes later upstream, so nothing is skipped as unchanged
+            server.ts += 600
+            output = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+            with output:
+                run = asyncio.run(collector.collect_all_cities(city_ids))
+
+            line = (
+                f"run {number}: {run['cities_succeeded']}/{run['cities_attempted']} cities "
+                f"in {run['duration_seconds']:.2f}s ({run['cities_per_second']} cities/s), "
+                f"fetch p50/p95/p99 {run['fetch_p50_ms']}/{run['fetch_p95_ms']}/{run['fetch_p99_ms']}ms, "
+                f"load p95 {run['load_p95_ms']}ms, {run['retries']} retries, {run['cities_failed']} failed"
+            )
+            if loader is not None:
+                started = time.perf_counter()
+                loaded = loader.drain()
+                elapsed = time.perf_counter() - started
+                line += f", spool drain {loaded} rows in {elapsed:.2f}s ({loaded / elapsed:.0f} rows/s)"
+            print(line)
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+Compare the model-based transform path with the single-pass decoder.
+
+Run from the data-pipeline directory:
+    python -m benchmarks.bench_decode --payloads 100000
+"""
+import argparse
+import json
+import random
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from weather_common import decode_current_weather, expand_record
+from models.weather import WeatherAPIResponse, WeatherRecord
+
+
+def make_payloads(count: int, seed: int = 42) -> list[bytes]:
+    """Generate realistic current-weather response bodies"""
+    rng = random.Random(seed)
+    conditions = [
+        (800, "Clear", "clear sky", "01d"),
+        (801, "Clouds", "few clouds", "02d"),
+        (500, "Rain", "light rain", "10d"),
+        (600, "Snow", "light snow", "13d")
+    ]
+    payloads = []
+    for i in range(count):
+        condition = rng.choice(conditions)
+        temp = round(rng.uniform(-20, 40), 2)
+        payloads.append(json.dumps({
+            "coord": {"lon": round(rng.uniform(-180, 180), 4), "lat": round(rng.uniform(-90, 90), 4)},
+            "weather": [{"id": condition[0], "main": condition[1], "description": condition[2], "icon": condition[3]}],
+            "base": "stations",
+            "main": {
+                "temp": temp,
+                "feels_like": temp - 1.5,
+                "temp_min": temp - 2,
+                "temp_max": temp + 2,
+                "pressure": rng.randint(980, 1040),
+                "humidity": rng.randint(10, 100)
+            },
+            "visibility": 10000,
+            "wind": {"speed": round(rng.uniform(0, 20), 2), "deg": rng.randint(0, 359)},
+            "clouds": {"all": rng.randint(0, 100)},
+            "dt": 1700000000 + i * 60,
+            "sys": {"country": "GB", "sunrise": 1699999000, "sunset": 1700030000},
+            "timezone": 0,
+            "id": 1000 + i % 10000,
+            "name": f"City {i % 10000}",
+            "cod": 200
+        }).encode())
+    return payloads
+
+
+def model_path(payload: bytes) -> dict:
+    """Previous collector path: JSON -> WeatherAPIResponse -> WeatherRecord -> dict"""
+    api_response = WeatherAPIResponse(**json.loads(payload))
+    record = WeatherRecord(
+        city_id=api_response.id,
+        city_name=api_response.name,
+        country=api_response.sys["country"],
+        latitude=api_response.coord["lat"],
+        longitude=api_response.coord["lon"],
+        temperature=api_response.main["temp"],
+        feels_like=api_response.main["feels_like"],
+        temp_min=api_response.main["temp_min"],
+        temp_max=api_response.main["temp_max"],
+        pressure=api_response.main["pressure"],
+        humidity=api_response.main["humidity"],
+        wind_speed=api_response.wind["speed"],
+        wind_direction=api_response.wind["deg"],
+        cloudiness=api_response.clouds["all"],
+        visibility=api_response.visibility,
+        weather_main=api_response.weather[0]["main"],
+        weather_description=api_response.weather[0]["description"],
+        weather_icon=api_response.weather[0]["icon"],
+        recorded_at=datetime.fromtimestamp(api_response.dt, timezone.utc)
+    )
+    row = record.model_dump(exclude={"id", "created_at"})
+    row["recorded_at"] = row["recorded_at"].isoformat()
+    return row
+
+
+def decoder_path(payload: bytes) -> dict:
+    """Single-pass decoder"""
+    return decode_current_weather(payload).record
+
+
+def measure(name: str, fn, payloads: list[bytes]) -> dict:
+    """Time a path over every payload, then measure its allocations separately"""
+    started_cpu = time.process_time()
+    started_wall = time.perf_counter()
+    for payload in payloads:
+        fn(payload)
+    cpu = time.process_time() - started_cpu
+    wall = time.perf_counter() - started_wall
+
+    # Allocation tracing slows execution, so it runs on its own pass
+    sample = payloads[:min(len(payloads), 10000)]
+    tracemalloc.start()
+    for payload in sample:
+        fn(payload)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "name": name,
+        "cpu_s": cpu,
+        "wall_s": wall,
+        "per_payload_us": wall / len(payloads) * 1e6,
+        "peak_kib": peak / 1024
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark payload decoding")
+    parser.add_argument("--payloads", type=int, default=100000)
+    args = parser.parse_args()
+
+    payloads = make_payloads(args.payloads)
+    # The decoder's row is normalized; joined with its city it carries every model field
+    observation = decode_current_weather(payloads[0])
+    expanded = expand_record(observation.record, observation.city)
+    assert all(expanded[field] == value for field, value in model_path(payloads[0]).items())
+
+    results = [
+        measure("models", model_path, payloads),
+        measure("decoder", decoder_path, payloads)
+    ]
+
+    print(f"{args.payloads} payloads")
+    for r in results:
+        print(
+            f"  {r['name']:<8} cpu {r['cpu_s']:.2f}s  wall {r['wall_s']:.2f}s  "
+            f"{r['per_payload_us']:.1f}us/payload  peak {r['peak_kib']:.0f}KiB"
+        )
+    speedup = results[0]["cpu_s"] / results[1]["cpu_s"]
+    print(f"  decoder uses {speedup:.1f}x less CPU")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+import argparse
+from supabase import create_client, Client
+from config import settings
+
+
+class DuplicateCompactor:
+    """One-off cleanup of duplicate weather observations"""
+
+    def __init__(self):
+        self.supabase: Client = create_client(
+            settings.supabase_url,
+            settings.supabase_key
+        )
+
+    def get_city_ids(self) -> list[int]:
+        """Get the ids of all known cities"""
+        response = self.supabase.table("cities").select("city_id").execute()
+        return [row["city_id"] for row in response.data or []]
+
+    def compact_city(self, city_id: int) -> int:
+        """
+        Delete duplicate (city_id, recorded_at) rows for one city
+
+        Args:
+            city_id: OpenWeatherMap city ID
+
+        Returns:
+            Number of rows deleted
+        """
+        response = self.supabase.rpc(
+            "compact_weather_records",
+            {"p_city_id": city_id}
+        ).execute()
+        return int(response.data or 0)
+
+    def run(self, city_ids: list[int]) -> int:
+        """
+        Compact the given cities one at a time, keeping each transaction small
+
+        Args:
+            city_ids: City IDs to compact
+
+        Returns:
+            Total number of rows deleted
+        """
+        total = 0
+        for city_id in city_ids:
+            deleted = self.compact_city(city_id)
+            total += deleted
+            if deleted:
+                print(f"✓ Removed {deleted} duplicate records for city {city_id}")
+
+        print(f"Compaction completed: {total} duplicate records removed")
+        return total
+
+
+def main():
+    """Main entry point for the duplicate compactor"""
+    parser = argparse.ArgumentParser(
+        description="Remove duplicate weather_records rows sharing (city_id, recorded_at)"
+    )
+    parser.add_argument(
+        "--city-id",
+        type=int,
+        action="append",
+        dest="city_ids",
+        help="City to compact (repeatable); defaults to every city in the cities table"
+    )
+    args = parser.parse_args()
+
+    compactor = DuplicateCompactor()
+    compactor.run(args.city_ids or compactor.get_city_ids())
+
+
+if __name__ == "__main__":
+    main()
@@ -7,6 +7,7 @@ class Settings(BaseSettings):
     # Weather API
     weather_api_key: str = ""
     weather_api_base_url: str = "https://api.openweathermap.org/data/2.5"
+    weather_history_api_base_url: str = "https://history.openweathermap.org/data/2.5"
 
     # Supabase Configuration
     supabase_url: str = ""
@@ -16,6 +17,71 @@ class Settings(BaseSettings):
     collection_interval_minutes: int = 60
     cities_to_track: list[int] = [5128581, 2643743, 1850144, 5368361, 2988507]
 
+    # Collector stage concurrency and queue bounds
+    extract_concurrency: int = 10
+    transform_concurrency: int = 2
+    load_concurrency: int = 4
+    stage_queue_size: int = 100
+
+    # Retries for transient upstream failures (timeouts, 429, 5xx). A 429 is
+    # retried after its Retry-After, unless that is longer than the maximum
+    # wait or the shared upstream budget is nearly spent
+    fetch_retries: int = 2
+    fetch_retry_backoff_seconds: float = 0.5
+    fetch_retry_max_wait_seconds: float = 30.0
+
+    # Per-run statistics in the collection_runs table
+    run_telemetry_enabled: bool = True
+
+    # Local spool between fetch and load; each collector process writes to
+    # its own worker_id subdirectory, the loader drains all of them
+    spool_enabled: bool = True
+    spool_dir: str = "spool"
+    spool_segment_max_bytes: int = 4 * 1024 * 1024
+    spool_fsync_every: int = 50
+    spool_load_batch_size: int = 500
+    spool_drain_seconds: int = 30
+
+    # Shared upstream request budget (upstream_quota table); collection and
+    # backfill draw at background priority and wait when it is spent
+    quota_enabled: bool = True
+    quota_bucket: str = "openweathermap"
+    quota_chunk_size: int = 10
+    quota_max_wait_seconds: float = 300.0
+
+    # Sharding across collector processes (needs the lease functions in
+    # supabase-schema.sql); a single collector does not need it
+    sharding_enabled: bool = False
+    worker_id: str = ""  # defaults to host-pid
+    heartbeat_interval_seconds: int = 30  # also how often cities are rebalanced
+    worker_ttl_seconds: int = 90
+    lease_ttl_seconds: int = 7200
+
+    # Adaptive per-city collection frequency
+    adaptive_scheduling_enabled: bool = True
+    request_budget_per_hour: int = 60
+    min_interval_minutes: int = 10
+    max_interval_minutes: int = 180
+    adaptive_tick_minutes: int = 1
+    replan_interval_minutes: int = 15
+    change_weight: float = 1.0
+    demand_weight: float = 2.0
+    change_score_smoothing: float = 0.3
+    demand_window_hours: int = 24
+
+    # Backfill settings
+    backfill_min_gap_minutes: int = 120
+    backfill_max_span_hours: int = 168  # history API limit per request
+    backfill_batch_size: int = 500
+    backfill_max_rate: float = 5.0
+    backfill_concurrency: int = 8
+
+    # Retention settings
+    raw_retention_days: int = 90
+    collection_runs_retention_days: int = 30
+    partition_months_ahead: int = 3
+    retention_interval_hours: int = 24
+
     model_config = SettingsConfigDict(
         env_file=".env",
         env_file_encoding="utf-8",
@@ -0,0 +1,218 @@
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+from supabase import Client
+from config import settings
+from weather_common import condition_for
+
+
+class CityCadence:
+    """Collection state for one tracked city"""
+
+    def __init__(self, city_id: int, now: datetime):
+        self.city_id = city_id
+        self.interval_minutes = float(settings.collection_interval_minutes)
+        self.next_due = now
+        self.last_collected: Optional[datetime] = None
+        self.change_score = 0.0
+        self.demand = 0
+        self.last_record: Optional[dict] = None
+
+
+def change_per_hour(previous: dict, current: dict) -> float:
+    """
+    How much a city's weather moved between two observations, per hour.
+    Each term is scaled so that roughly one "unit" is a noticeable change.
+
+    Args:
+        previous: Earlier weather_records row
+        current: Later weather_records row
+
+    Returns:
+        Change magnitude per hour
+    """
+    condition_changed = (
+        condition_for(current["condition_id"]).main != condition_for(previous["condition_id"]).main
+    )
+    magnitude = (
+        abs(current["temperature"] - previous["temperature"])
+        + abs(current["pressure"] - previous["pressure"]) / 2
+        + abs(current["humidity"] - previous["humidity"]) / 10
+        + abs(current["wind_speed"] - previous["wind_speed"]) / 2
+        + (1.0 if condition_changed else 0.0)
+    )
+    elapsed = (
+        datetime.fromisoformat(current["recorded_at"])
+        - datetime.fromisoformat(previous["recorded_at"])
+    )
+    hours = elapsed.total_seconds() / 3600
+    return magnitude / max(hours, 1 / 6)
+
+
+class AdaptiveCollectionPlanner:
+    """
+    Gives each city its own collection interval within a global budget.
+
+    Every city gets a weight of 1, plus a share for how fast its observations
+    have been changing and a share for how often the API service serves it.
+    The hourly request budget is split in proportion to those weights, with
+    each city clamped between the minimum and maximum interval. When the
+    budget cannot cover every city at the maximum interval, all cities are
+    stretched evenly beyond it instead of overspending.
+    """
+
+    def __init__(self, supabase: Client):
+        self.supabase = supabase
+        self.cities: Dict[int, CityCadence] = {}
+        self.budget_per_hour = float(settings.request_budget_per_hour)
+        self.last_replan: Optional[datetime] = None
+
+    def sync_cities(self, city_ids: List[int], now: datetime) -> None:
+        """Track newly assigned cities (due immediately) and forget removed ones"""
+        for city_id in city_ids:
+            if city_id not in self.cities:
+                self.cities[city_id] = CityCadence(city_id, now)
+        for city_id in set(self.cities) - set(city_ids):
+            del self.cities[city_id]
+
+    def due(self, now: datetime) -> List[int]:
+        """City IDs whose next collection time has passed, most overdue first"""
+        due = [cadence for cadence in self.cities.values() if cadence.next_due <= now]
+        return [cadence.city_id for cadence in sorted(due, key=lambda c: c.next_due)]
+
+    def observe(
+        self,
+        city_ids: List[int],
+        loaded_records: Dict[int, dict],
+        now: datetime
+    ) -> None:
+        """
+        Update change scores after a collection and schedule the next one
+
+        Args:
+            city_ids: Cities that were collected
+            loaded_records: New record rows loaded during the collection, by city
+            now: Time of the collection
+        """
+        alpha = settings.change_score_smoothing
+        for city_id in city_ids:
+            cadence = self.cities.get(city_id)
+            if cadence is None:
+                continue
+
+            record = loaded_records.get(city_id)
+            change = 0.0
+            if record is not None and cadence.last_record is not None:
+                change = change_per_hour(cadence.last_record, record)
+            if record is not None:
+                cadence.last_record = record
+
+            # A fetch with no new observation counts as no change
+            cadence.change_score = alpha * change + (1 - alpha) * cadence.change_score
+            cadence.last_collected = now
+            cadence.next_due = now + timedelta(minutes=cadence.interval_minutes)
+
+    def fetch_demand(self) -> None:
+        """Load recent per-city request counts recorded by the API service"""
+        response = self.supabase.rpc(
+            "get_city_demand",
+            {"p_hours": settings.demand_window_hours}
+        ).execute()
+        demand = {row["city_id"]: row["served_count"] for row in response.data or []}
+        for city_id, cadence in self.cities.items():
+            cadence.demand = demand.get(city_id, 0)
+
+    def replan(self, budget_per_hour: float) -> None:
+        """
+        Recompute every city's interval from its weight and the budget
+
+        Args:
+            budget_per_hour: Upstream requests per hour available to these cities
+        """
+        if not self.cities:
+            return
+
+        self.budget_per_hour = budget_per_hour
+        cadences = list(self.cities.values())
+        mean_change = sum(c.change_score for c in cadences) / len(cadences)
+        mean_demand = sum(c.demand for c in cadences) / len(cadences)
+
+        weights = {}
+        for c in cadences:
+            weight = 1.0
+            if mean_change > 0:
+                weight += settings.change_weight * c.change_score / mean_change
+            if mean_demand > 0:
+                weight += settings.demand_weight * c.demand / mean_demand
+            weights[c.city_id] = weight
+
+        min_rate = 60 / settings.max_interval_minutes
+        max_rate = 60 / settings.min_interval_minutes
+        if budget_per_hour <= 0:
+            print("✗ No collection budget for these cities; keeping their current intervals")
+            return
+        if min_rate * len(cadences) > budget_per_hour:
+            # Even the longest interval for every city would overspend; stretch
+            # all cities evenly past max_interval_minutes to fit the budget
+            min_rate = budget_per_hour / len(cadences)
+            print(
+                f"✗ {len(cadences)} cities every {settings.max_interval_minutes} min need "
+                f"{60 * len(cadences) / settings.max_interval_minutes:.1f} requests/hour, over the "
+                f"{budget_per_hour:.1f} budget; collecting each every {60 / min_rate:.0f} min instead"
+            )
+
+        # Water-filling: cities that hit a bound are fixed there and the
+        # remaining budget is shared among the rest
+        rates: Dict[int, float] = {}
+        free = set(weights)
+        remaining = budget_per_hour
+        while free:
+            total_weight = sum(weights[city_id] for city_id in free)
+            clamped = False
+            for city_id in list(free):
+                rate = remaining * weights[city_id] / total_weight
+                if rate < min_rate or rate > max_rate:
+                    rates[city_id] = min(max(rate, min_rate), max_rate)
+                    free.discard(city_id)
+                    clamped = True
+            remaining = budget_per_hour - sum(rates.values())
+            if not clamped:
+                for city_id in free:
+                    rates[city_id] = max(remaining, 0) * weights[city_id] / total_weight
+                break
+
+        for city_id, rate in rates.items():
+            cadence = self.cities[city_id]
+            cadence.interval_minutes = 60 / max(rate, min_rate)
+            # Bring the next collection forward if the interval shrank
+            if cadence.last_collected is not None:
+                cadence.next_due = min(
+                    cadence.next_due,
+                    cadence.last_collected + timedelta(minutes=cadence.interval_minutes)
+                )
+
+    def allocation_report(self) -> List[dict]:
+        """Per-city interval, requests per hour and the inputs that produced them"""
+        return [
+            {
+                "city_id": c.city_id,
+                "interval_minutes": round(c.interval_minutes, 1),
+                "requests_per_hour": round(60 / c.interval_minutes, 2),
+                "change_score": round(c.change_score, 3),
+                "demand": c.demand
+            }
+            for c in sorted(self.cities.values(), key=lambda c: c.interval_minutes)
+        ]
+
+    def print_report(self, limit: int = 10) -> None:
+        """Print the budget allocation, busiest cities first"""
+        report = self.allocation_report()
+        used = sum(row["requests_per_hour"] for row in report)
+        print(
+            f"Collection budget: {used:.1f}/{self.budget_per_hour:.1f} requests/hour "
+            f"across {len(report)} cities"
+        )
+        for row in report[:limit]:
+            print(
+                f"  city {row['city_id']}: every {row['interval_minutes']} min "
+                f"(change {row['change_score']}, demand {row['demand']})"
+            )
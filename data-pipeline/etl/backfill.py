@@ -0,0 +1,299 @@
+import asyncio
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+import httpx
+from supabase import create_client, Client
+from config import settings
+from weather_common import BACKGROUND, UpstreamQuota, decode_history_item
+from models.weather import CityModel
+from models.backfill import BackfillJob, BackfillCheckpoint
+
+
+class RateLimiter:
+    """Spaces request starts so they never exceed a fixed rate"""
+
+    def __init__(self, max_per_second: float):
+        if max_per_second <= 0:
+            raise ValueError(f"max_per_second must be positive, got {max_per_second}")
+        self.interval = 1 / max_per_second
+        self._next_slot = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def wait(self) -> None:
+        """Wait until the next request may start"""
+        async with self._lock:
+            now = time.monotonic()
+            delay = self._next_slot - now
+            self._next_slot = max(now, self._next_slot) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+class WeatherBackfill:
+    """Detects holes in weather_records and fills them from the history API"""
+
+    def __init__(self, checkpoint_path: str):
+        self.api_key = settings.weather_api_key
+        self.history_url = settings.weather_history_api_base_url
+        self.checkpoint_path = checkpoint_path
+        self.supabase: Client = create_client(
+            settings.supabase_url,
+            settings.supabase_key
+        )
+        self.quota: Optional[UpstreamQuota] = (
+            UpstreamQuota(
+                self.supabase,
+                BACKGROUND,
+                bucket=settings.quota_bucket,
+                chunk_size=settings.quota_chunk_size
+            )
+            if settings.quota_enabled else None
+        )
+
+    def find_gaps(
+        self,
+        city_id: int,
+        start: datetime,
+        end: datetime
+    ) -> List[tuple[datetime, datetime]]:
+        """
+        Find periods with no records longer than the allowed gap
+
+        Args:
+            city_id: OpenWeatherMap city ID
+            start: Start of the period to check
+            end: End of the period to check
+
+        Returns:
+            List of (gap_start, gap_end) pairs
+        """
+        response = self.supabase.rpc(
+            "find_weather_gaps",
+            {
+                "p_city_id": city_id,
+                "p_start": start.isoformat(),
+                "p_end": end.isoformat(),
+                "p_min_gap_minutes": settings.backfill_min_gap_minutes
+            }
+        ).execute()
+        return [
+            (datetime.fromisoformat(row["gap_start"]), datetime.fromisoformat(row["gap_end"]))
+            for row in response.data or []
+        ]
+
+    def plan(self, city_ids: List[int], days: int) -> BackfillCheckpoint:
+        """
+        Build fetch jobs for every gap, split to the history API's maximum span
+
+        Args:
+            city_ids: Cities to check
+            days: How far back to look
+
+        Returns:
+            New checkpoint holding the planned jobs
+        """
+        end = datetime.now(timezone.utc)
+        start = end - timedelta(days=days)
+        max_span = timedelta(hours=settings.backfill_max_span_hours)
+
+        jobs: List[BackfillJob] = []
+        for city_id in city_ids:
+            for gap_start, gap_end in self.find_gaps(city_id, start, end):
+                chunk_start = gap_start
+                while chunk_start < gap_end:
+                    chunk_end = min(chunk_start + max_span, gap_end)
+                    jobs.append(BackfillJob(city_id=city_id, start=chunk_start, end=chunk_end))
+                    chunk_start = chunk_end
+
+        print(f"Planned {len(jobs)} backfill jobs for {len(city_ids)} cities over {days} days")
+        return BackfillCheckpoint(created_at=end, jobs=jobs)
+
+    def load_checkpoint(self) -> Optional[BackfillCheckpoint]:
+        """Read a previously saved checkpoint, if any"""
+        if not os.path.exists(self.checkpoint_path):
+            return None
+        with open(self.checkpoint_path, "r", encoding="utf-8") as f:
+            return BackfillCheckpoint.model_validate_json(f.read())
+
+    @staticmethod
+    def is_finished(checkpoint: BackfillCheckpoint) -> bool:
+        """Whether every planned job of a checkpoint has been loaded"""
+        completed = set(checkpoint.completed)
+        return all(job.key in completed for job in checkpoint.jobs)
+
+    def save_checkpoint(self, checkpoint: BackfillCheckpoint) -> None:
+        """Write the checkpoint atomically so an interrupt never leaves it half-written"""
+        tmp_path = f"{self.checkpoint_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(checkpoint.model_dump_json())
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def get_cities(self, city_ids: List[int]) -> Dict[int, CityModel]:
+        """Look up name, country and coordinates for the cities being filled"""
+        response = self.supabase.table("cities")\
+            .select("*")\
+            .in_("city_id", city_ids)\
+            .execute()
+        return {row["city_id"]: CityModel(**row) for row in response.data or []}
+
+    async def fetch_history(self, client: httpx.AsyncClient, job: BackfillJob) -> List[dict]:
+        """
+        Fetch hourly observations for one job from the history API
+
+        Args:
+            client: Shared HTTP client
+            job: Job to fetch
+
+        Returns:
+            Raw observation items
+        """
+        params = {
+            "id": job.city_id,
+            "type": "hour",
+            "start": int(job.start.timestamp()),
+            "end": int(job.end.timestamp()),
+            "appid": self.api_key,
+            "units": "metric"
+        }
+        if self.quota:
+            await self.quota.wait(settings.quota_max_wait_seconds)
+
+        response = await client.get(
+            f"{self.history_url}/history/city",
+            params=params,
+            timeout=30.0
+        )
+        response.raise_for_status()
+        return response.json().get("list", [])
+
+    @staticmethod
+    def transform_history_item(item: dict, city: CityModel) -> dict:
+        """
+        Transform a history API item to a database row.
+        History items carry no city details; the row only references the city.
+
+        Args:
+            item: Raw history observation
+            city: City the observation belongs to
+
+        Returns:
+            weather_records row ready for database
+        """
+        return decode_history_item(item, city.city_id)
+
+    def load_batch(self, rows: List[dict]) -> None:
+        """
+        Bulk insert rows, ignoring observations already stored
+
+        Args:
+            rows: weather_records rows to insert
+        """
+        self.supabase.table("weather_records")\
+            .upsert(rows, on_conflict="city_id,recorded_at", ignore_duplicates=True)\
+            .execute()
+
+    async def run(
+        self,
+        city_ids: List[int],
+        days: int,
+        max_rate: float,
+        concurrency: int
+    ) -> None:
+        """
+        Plan (or resume) and execute a backfill
+
+        Args:
+            city_ids: Cities to backfill
+            days: How far back to look for gaps
+            max_rate: Maximum history API requests per second
+            concurrency: Maximum requests in flight
+        """
+        checkpoint = self.load_checkpoint()
+        if checkpoint is not None and self.is_finished(checkpoint):
+            # Left behind by a run that finished before checkpoints were removed
+            print("Previous backfill finished, planning a new one")
+            checkpoint = None
+        if checkpoint is None:
+            checkpoint = self.plan(city_ids, days)
+            self.save_checkpoint(checkpoint)
+        else:
+            print(
+                f"Resuming backfill: {len(checkpoint.completed)}/{len(checkpoint.jobs)} "
+                f"jobs already done"
+            )
+
+        completed = set(checkpoint.completed)
+        pending = [job for job in checkpoint.jobs if job.key not in completed]
+        cities = self.get_cities(list({job.city_id for job in pending}))
+
+        limiter = RateLimiter(max_rate)
+        buffer: List[dict] = []
+        buffered_keys: List[str] = []
+        flush_lock = asyncio.Lock()
+        started = time.perf_counter()
+
+        async def flush() -> None:
+            # Jobs are only marked complete once their records are stored
+            nonlocal buffer, buffered_keys
+            if not buffered_keys:
+                return
+            records, keys = buffer, buffered_keys
+            buffer, buffered_keys = [], []
+            if records:
+                await asyncio.to_thread(self.load_batch, records)
+            checkpoint.completed.extend(keys)
+            checkpoint.records_loaded += len(records)
+            await asyncio.to_thread(self.save_checkpoint, checkpoint)
+
+        async def run_job(client: httpx.AsyncClient, job: BackfillJob) -> None:
+            city = cities.get(job.city_id)
+            if city is None:
+                print(f"✗ City {job.city_id} is not in the cities table, skipping")
+                return
+            await limiter.wait()
+            try:
+                items = await self.fetch_history(client, job)
+            except Exception as e:
+                print(f"✗ Error fetching history for city {job.city_id}: {str(e)}")
+                return
+            # A malformed item is skipped on its own; failing the job would
+            # abort the run and hit the same item again on resume
+            rows = []
+            for item in items:
+                try:
+                    rows.append(self.transform_history_item(item, city))
+                except ValueError as e:
+                    print(f"✗ Skipping history item for city {job.city_id}: {str(e)}")
+            async with flush_lock:
+                buffer.extend(rows)
+                buffered_keys.append(job.key)
+                if len(buffer) >= settings.backfill_batch_size:
+                    await flush()
+
+        # A fixed pool of workers shares one iterator, so only `concurrency`
+        # jobs exist at a time no matter how large the plan is
+        jobs = iter(pending)
+
+        async def worker(client: httpx.AsyncClient) -> None:
+            for job in jobs:
+                await run_job(client, job)
+
+        async with httpx.AsyncClient() as client:
+            await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        async with flush_lock:
+            await flush()
+
+        elapsed = time.perf_counter() - started
+        print(
+            f"Backfill completed: {len(checkpoint.completed)}/{len(checkpoint.jobs)} jobs, "
+            f"{checkpoint.records_loaded} records loaded in {elapsed:.1f}s"
+        )
+        if self.is_finished(checkpoint):
+            # Nothing left to resume; the next run plans from the current gaps
+            os.remove(self.checkpoint_path)
+        else:
+            print(f"Failed jobs are kept in {self.checkpoint_path}; run again to retry them")
@@ -0,0 +1,105 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from supabase import create_client, Client
+from config import settings
+
+
+class WeatherRetentionJob:
+    """Partition maintenance, downsampling and retention for weather_records"""
+
+    def __init__(self):
+        self.supabase: Client = create_client(
+            settings.supabase_url,
+            settings.supabase_key
+        )
+
+    def ensure_partitions(self) -> int:
+        """
+        Create upcoming monthly partitions of weather_records
+
+        Returns:
+            Number of partitions created
+        """
+        response = self.supabase.rpc(
+            "ensure_weather_partitions",
+            {"p_months_ahead": settings.partition_months_ahead}
+        ).execute()
+        return int(response.data or 0)
+
+    def downsample(self, older_than: datetime) -> int:
+        """
+        Roll raw records older than the cutoff into hourly aggregates
+
+        Args:
+            older_than: Raw rows before this time are aggregated
+
+        Returns:
+            Number of hourly aggregates written
+        """
+        response = self.supabase.rpc(
+            "downsample_weather_records",
+            {"p_older_than": older_than.isoformat()}
+        ).execute()
+        return int(response.data or 0)
+
+    def drop_expired_partitions(self, older_than: datetime) -> list[str]:
+        """
+        Drop monthly partitions that lie entirely before the cutoff, after
+        re-aggregating each of them, and delete expired rows from the
+        default partition
+
+        Args:
+            older_than: Partitions ending on or before this time are dropped
+
+        Returns:
+            Names of the dropped partitions
+        """
+        response = self.supabase.rpc(
+            "drop_weather_partitions",
+            {"p_older_than": older_than.isoformat()}
+        ).execute()
+        return list(response.data or [])
+
+    def prune_collection_runs(self, older_than: datetime) -> int:
+        """
+        Delete collection_runs rows started before the cutoff
+
+        Args:
+            older_than: Runs started before this time are deleted
+
+        Returns:
+            Number of rows deleted
+        """
+        response = self.supabase.table("collection_runs").delete().lt(
+            "started_at", older_than.isoformat()
+        ).execute()
+        return len(response.data or [])
+
+    async def run(self) -> None:
+        """Run partition creation, downsampling, partition drops and run-log pruning in order"""
+        cutoff = datetime.now(timezone.utc) - timedelta(days=settings.raw_retention_days)
+
+        created = self.ensure_partitions()
+        print(f"✓ Created {created} weather_records partitions")
+
+        # Aggregate before dropping so expired raw rows survive as hourly data
+        aggregated = self.downsample(cutoff)
+        print(f"✓ Wrote {aggregated} hourly aggregates for records before {cutoff.date()}")
+
+        dropped = self.drop_expired_partitions(cutoff)
+        for partition in dropped:
+            print(f"✓ Dropped partition {partition}")
+
+        runs_cutoff = datetime.now(timezone.utc) - timedelta(days=settings.collection_runs_retention_days)
+        pruned = self.prune_collection_runs(runs_cutoff)
+        print(f"✓ Deleted {pruned} collection runs before {runs_cutoff.date()}")
+
+
+async def main():
+    """Main entry point for the retention job"""
+    job = WeatherRetentionJob()
+    await job.run()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
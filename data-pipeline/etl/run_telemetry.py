@@ -0,0 +1,58 @@
+import uuid
+from datetime import datetime
+from typing import Dict
+from etl.stage_stats import StageStats
+
+
+def collection_run_row(
+    worker_id: str,
+    started_at: datetime,
+    finished_at: datetime,
+    cities_attempted: int,
+    cities_unchanged: int,
+    stage_stats: Dict[str, StageStats],
+    load_mode: str
+) -> dict:
+    """
+    Build a collection_runs row summarising one collect_all_cities run
+
+    Args:
+        worker_id: Collector process that ran it
+        started_at: Run start (aware)
+        finished_at: Run end (aware)
+        cities_attempted: Cities queued for the run
+        cities_unchanged: Cities whose upstream observation was already loaded
+        stage_stats: Extract, transform and load counters of the run
+        load_mode: "spool" or "database"
+
+    Returns:
+        Row dict ready to insert. cities_succeeded counts cities whose record
+        passed the load stage: rows written to weather_records in "database"
+        mode, but records appended to the spool in "spool" mode, which reach
+        the database only when SpoolLoader drains them.
+    """
+    extract = stage_stats["extract"]
+    transform = stage_stats["transform"]
+    load = stage_stats["load"]
+    duration = (finished_at - started_at).total_seconds()
+    return {
+        "run_id": str(uuid.uuid4()),
+        "worker_id": worker_id,
+        "started_at": started_at.isoformat(),
+        "finished_at": finished_at.isoformat(),
+        "duration_seconds": round(duration, 3),
+        "load_mode": load_mode,
+        "cities_attempted": cities_attempted,
+        "cities_succeeded": load.processed,
+        "cities_unchanged": cities_unchanged,
+        "cities_failed": extract.failed + transform.failed + load.failed,
+        "retries": extract.retries,
+        "fetch_p50_ms": extract.percentile_ms(0.5),
+        "fetch_p95_ms": extract.percentile_ms(0.95),
+        "fetch_p99_ms": extract.percentile_ms(0.99),
+        "load_p50_ms": load.percentile_ms(0.5),
+        "load_p95_ms": load.percentile_ms(0.95),
+        "load_p99_ms": load.percentile_ms(0.99),
+        "cities_per_second": round(cities_attempted / duration, 2) if duration > 0 else None,
+        "stages": [stats.summary() for stats in stage_stats.values()]
+    }
@@ -0,0 +1,127 @@
+import bisect
+import hashlib
+import os
+import socket
+from typing import Iterable, List, Optional
+from supabase import Client
+from config import settings
+
+
+def _hash(key: str) -> int:
+    """Stable 64-bit hash; Python's hash() is salted per process"""
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "big")
+
+
+def default_worker_id() -> str:
+    """Identify this collector process as host-pid"""
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+class HashRing:
+    """Consistent hash ring mapping city ids onto collector workers"""
+
+    def __init__(self, worker_ids: Iterable[str], replicas: int = 64):
+        self._ring: List[tuple[int, str]] = sorted(
+            (_hash(f"{worker_id}#{replica}"), worker_id)
+            for worker_id in set(worker_ids)
+            for replica in range(replicas)
+        )
+        self._keys = [key for key, _ in self._ring]
+
+    def owner(self, city_id: int) -> str:
+        """
+        Find the worker responsible for a city
+
+        Args:
+            city_id: OpenWeatherMap city ID
+
+        Returns:
+            Worker id owning the city
+        """
+        if not self._ring:
+            raise ValueError("Hash ring has no workers")
+        index = bisect.bisect(self._keys, _hash(str(city_id))) % len(self._ring)
+        return self._ring[index][1]
+
+
+class ShardCoordinator:
+    """
+    Splits tracked cities between collector processes.
+
+    Workers heartbeat into collector_workers; each one builds the same hash
+    ring from the live set and keeps the cities that land on it. City leases
+    guard against two workers collecting a city while their views of the
+    live set briefly disagree. A worker whose heartbeat goes stale drops out
+    of everyone's ring and its leases can be taken over immediately.
+    """
+
+    def __init__(self, supabase: Client, worker_id: str = ""):
+        self.supabase = supabase
+        self.worker_id = worker_id or settings.worker_id or default_worker_id()
+        # Cities leased by the last successful assign(), None before the first
+        self.assigned: Optional[List[int]] = None
+
+    def heartbeat(self) -> List[str]:
+        """
+        Record that this worker is alive
+
+        Returns:
+            Ids of all live workers, including this one
+        """
+        response = self.supabase.rpc(
+            "collector_heartbeat",
+            {
+                "p_worker_id": self.worker_id,
+                "p_worker_ttl_seconds": settings.worker_ttl_seconds
+            }
+        ).execute()
+        return list(response.data or [])
+
+    def assign(self, city_ids: List[int]) -> List[int]:
+        """
+        Determine and lease the cities this worker should collect
+
+        Args:
+            city_ids: All tracked city IDs
+
+        Returns:
+            City IDs this worker holds a lease on
+        """
+        workers = self.heartbeat()
+        if self.worker_id not in workers:
+            workers.append(self.worker_id)
+
+        ring = HashRing(workers)
+        mine = [city_id for city_id in city_ids if ring.owner(city_id) == self.worker_id]
+
+        response = self.supabase.rpc(
+            "claim_city_leases",
+            {
+                "p_worker_id": self.worker_id,
+                "p_city_ids": mine,
+                "p_ttl_seconds": settings.lease_ttl_seconds,
+                "p_worker_ttl_seconds": settings.worker_ttl_seconds
+            }
+        ).execute()
+        claimed = set(response.data or [])
+
+        assigned = [city_id for city_id in mine if city_id in claimed]
+        if assigned != self.assigned:
+            print(
+                f"Worker {self.worker_id}: {len(workers)} live workers, "
+                f"{len(mine)} cities assigned, {len(claimed)} leased"
+            )
+        self.assigned = assigned
+        return assigned
+
+    def is_leader(self) -> bool:
+        """Whether this worker should run once-per-cluster jobs (lowest live id)"""
+        workers = self.heartbeat()
+        return not workers or min(workers) == self.worker_id
+
+    def release(self) -> None:
+        """Give up this worker's heartbeat and leases so others take over at once"""
+        self.supabase.rpc(
+            "release_collector",
+            {"p_worker_id": self.worker_id}
+        ).execute()
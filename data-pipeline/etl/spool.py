@@ -0,0 +1,219 @@
+import fcntl
+import json
+import os
+from typing import IO, List, Optional
+from supabase import Client
+from config import settings
+from etl.sharding import default_worker_id
+
+OPEN_SUFFIX = ".open"
+SEALED_SUFFIX = ".jsonl"
+WRITER_LOCK = ".writer.lock"
+
+
+class RecordSpool:
+    """
+    Append-only local spool of collected records, split into segments.
+
+    The collector appends one JSON line per observation to the open segment
+    and fsyncs every `spool_fsync_every` entries. Segments are sealed (renamed
+    from .open to .jsonl) when they reach `spool_segment_max_bytes` or when
+    rotate() is called; only sealed segments are handed to the loader.
+
+    Each collector process writes to its own `<spool_dir>/<worker_id>`
+    directory and holds an exclusive lock on it while alive, so processes on
+    one host never seal each other's open segments or reuse each other's
+    sequence numbers. On startup, open segments in directories whose lock is
+    free (their process is gone) are sealed for loading.
+    """
+
+    def __init__(self, directory: str, worker_id: str = ""):
+        self.root = directory
+        self.worker_id = worker_id or settings.worker_id or default_worker_id()
+        self.directory = os.path.join(directory, self.worker_id)
+        os.makedirs(self.directory, exist_ok=True)
+        self._lock_file = open(os.path.join(self.directory, WRITER_LOCK), "w")
+        try:
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            self._lock_file.close()
+            raise RuntimeError(
+                f"Spool {self.directory} is in use by another process; give each collector its own worker_id"
+            )
+        self._file: Optional[IO[str]] = None
+        self._path: Optional[str] = None
+        self._unsynced = 0
+        self._sequence = self._last_sequence()
+        self._recover_abandoned()
+
+    def _recover_abandoned(self) -> None:
+        """Seal segments left open by this worker's previous run or by dead processes"""
+        self._seal_open_segments(self.directory)
+        for name in os.listdir(self.root):
+            directory = os.path.join(self.root, name)
+            if directory == self.directory or not os.path.isdir(directory):
+                continue
+            lock_path = os.path.join(directory, WRITER_LOCK)
+            if not os.path.exists(lock_path):
+                continue
+            with open(lock_path, "a") as lock_file:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    # Its collector is still running
+                    continue
+                self._seal_open_segments(directory)
+                if os.listdir(directory) == [WRITER_LOCK]:
+                    # Nothing left to load; remove the dead worker's directory
+                    os.remove(lock_path)
+                    os.rmdir(directory)
+
+    def _seal_open_segments(self, directory: str) -> None:
+        """Seal open segments; each is complete up to any torn last line"""
+        for name in os.listdir(directory):
+            if name.endswith(OPEN_SUFFIX):
+                self._seal(os.path.join(directory, name))
+
+    def _last_sequence(self) -> int:
+        numbers = [
+            int(name.split(".")[0].split("-")[1])
+            for name in os.listdir(self.directory)
+            if name.startswith("segment-")
+        ]
+        return max(numbers, default=0)
+
+    def _seal(self, path: str) -> None:
+        os.replace(path, path[:-len(OPEN_SUFFIX)] + SEALED_SUFFIX)
+
+    def append(self, city: dict, record: dict) -> None:
+        """
+        Durably queue one observation for loading
+
+        Args:
+            city: cities row to upsert
+            record: weather_records row to insert
+        """
+        if self._file is None:
+            self._sequence += 1
+            self._path = os.path.join(
+                self.directory, f"segment-{self._sequence:010d}{OPEN_SUFFIX}"
+            )
+            self._file = open(self._path, "a", encoding="utf-8")
+
+        entry = {"city": city, "record": record}
+        self._file.write(json.dumps(entry, separators=(",", ":")) + "\n")
+        self._unsynced += 1
+
+        if self._unsynced >= settings.spool_fsync_every:
+            self.sync()
+        if self._file.tell() >= settings.spool_segment_max_bytes:
+            self.rotate()
+
+    def sync(self) -> None:
+        """Flush and fsync the open segment"""
+        if self._file is not None and self._unsynced:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._unsynced = 0
+
+    def rotate(self) -> None:
+        """Seal the open segment so the loader can pick it up"""
+        if self._file is None:
+            return
+        self.sync()
+        self._file.close()
+        self._seal(self._path)
+        self._file = None
+        self._path = None
+
+
+class SpoolLoader:
+    """Drains sealed spool segments of every collector on the host into Supabase with bulk upserts"""
+
+    def __init__(self, directory: str, supabase: Client):
+        self.directory = directory
+        self.supabase = supabase
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def read_segment(path: str) -> List[dict]:
+        """Read a segment's entries, skipping a torn final line from a crash"""
+        entries = []
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entries.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+        return entries
+
+    def load_entries(self, entries: List[dict]) -> None:
+        """
+        Bulk upsert the cities and records from spool entries
+
+        Args:
+            entries: Spool entries with "city" and "record" dicts
+        """
+        cities = {entry["city"]["city_id"]: entry["city"] for entry in entries}
+        if cities:
+            self.supabase.table("cities")\
+                .upsert(list(cities.values()), on_conflict="city_id")\
+                .execute()
+
+        records = [entry["record"] for entry in entries]
+        batch_size = settings.spool_load_batch_size
+        for start in range(0, len(records), batch_size):
+            self.supabase.table("weather_records")\
+                .upsert(
+                    records[start:start + batch_size],
+                    on_conflict="city_id,recorded_at",
+                    ignore_duplicates=True
+                )\
+                .execute()
+
+    def sealed_segments(self) -> List[str]:
+        """Paths of sealed segments in the per-worker spool directories (and the root, from older versions)"""
+        directories = [self.directory] + [
+            os.path.join(self.directory, name)
+            for name in os.listdir(self.directory)
+            if os.path.isdir(os.path.join(self.directory, name))
+        ]
+        return [
+            os.path.join(directory, name)
+            for directory in directories
+            for name in os.listdir(directory)
+            if name.endswith(SEALED_SUFFIX)
+        ]
+
+    def drain(self) -> int:
+        """
+        Load every sealed segment and delete it once stored.
+        A segment that fails stays on disk and is retried on the next drain;
+        loads are idempotent, so a retry after a partial load is safe.
+
+        Returns:
+            Number of records loaded
+        """
+        lock_path = os.path.join(self.directory, ".loader.lock")
+        with open(lock_path, "w") as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                # Another loader is draining this spool
+                return 0
+
+            loaded = 0
+            segments = sorted(self.sealed_segments())
+            for path in segments:
+                entries = self.read_segment(path)
+                try:
+                    self.load_entries(entries)
+                except Exception as e:
+                    print(f"✗ Error loading spool segment {os.path.basename(path)}: {str(e)}")
+                    break
+                os.remove(path)
+                loaded += len(entries)
+
+            if loaded:
+                print(f"✓ Loaded {loaded} spooled records")
+            return loaded
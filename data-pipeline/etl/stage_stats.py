@@ -0,0 +1,65 @@
+import time
+from collections import deque
+from typing import Optional
+
+
+class StageStats:
+    """Throughput and latency counters for one collector pipeline stage"""
+
+    def __init__(self, name: str, window: int = 10000):
+        self.name = name
+        self.processed = 0
+        self.failed = 0
+        self.retries = 0
+        self.busy_seconds = 0.0
+        self.max_seconds = 0.0
+        self.latencies = deque(maxlen=window)
+        self.started = time.perf_counter()
+
+    def record(self, seconds: float, ok: bool = True) -> None:
+        """
+        Record one item handled by the stage
+
+        Args:
+            seconds: Time spent on the item
+            ok: Whether the item succeeded
+        """
+        if ok:
+            self.processed += 1
+        else:
+            self.failed += 1
+        self.busy_seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+        self.latencies.append(seconds)
+
+    def percentile_ms(self, fraction: float) -> Optional[float]:
+        """Latency percentile over the most recent items, in milliseconds"""
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return round(ordered[int(fraction * (len(ordered) - 1))] * 1000, 2)
+
+    def summary(self) -> dict:
+        """Counters plus derived throughput and latency"""
+        handled = self.processed + self.failed
+        elapsed = time.perf_counter() - self.started
+        return {
+            "stage": self.name,
+            "processed": self.processed,
+            "failed": self.failed,
+            "retries": self.retries,
+            "items_per_second": round(handled / elapsed, 2) if elapsed > 0 else 0.0,
+            "avg_ms": round(self.busy_seconds / handled * 1000, 2) if handled else 0.0,
+            "p50_ms": self.percentile_ms(0.5),
+            "p95_ms": self.percentile_ms(0.95),
+            "p99_ms": self.percentile_ms(0.99),
+            "max_ms": round(self.max_seconds * 1000, 2)
+        }
+
+    def __str__(self) -> str:
+        s = self.summary()
+        return (
+            f"{s['stage']:<9} {s['processed']} ok, {s['failed']} failed, "
+            f"{s['items_per_second']}/s, avg {s['avg_ms']}ms, p95 {s['p95_ms']}ms, max {s['max_ms']}ms"
+            + (f", {s['retries']} retries" if s["retries"] else "")
+        )
@@ -1,10 +1,42 @@
 import httpx
 import asyncio
-from datetime import datetime
-from typing import List
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Dict, List, Optional
 from supabase import create_client, Client
 from config import settings
-from models.weather import WeatherRecord, CityModel, WeatherAPIResponse
+from weather_common import BACKGROUND, DecodedObservation, UpstreamQuota, decode_current_weather
+from etl.stage_stats import StageStats
+from etl.run_telemetry import collection_run_row
+from etl.sharding import ShardCoordinator, default_worker_id
+from etl.spool import RecordSpool
+
+
+def retry_after_seconds(response: httpx.Response) -> Optional[float]:
+    """
+    Parse a Retry-After header given as seconds or as an HTTP date
+
+    Args:
+        response: Upstream response
+
+    Returns:
+        Seconds to wait, or None if the header is missing or invalid
+    """
+    value = response.headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
 
 
 class WeatherDataCollector:
@@ -17,16 +49,50 @@ class WeatherDataCollector:
             settings.supabase_url,
             settings.supabase_key
         )
+        # Upstream `dt` of the last observation loaded per city, so unchanged
+        # observations are dropped before reaching the database
+        self.last_seen_dt: Dict[int, int] = {}
+        # Per-stage counters from the most recent collect_all_cities run
+        self.stage_stats: Dict[str, StageStats] = {}
+        # Record rows loaded by the most recent collect_all_cities run, by city
+        self.loaded_records: Dict[int, dict] = {}
+        # Cities skipped in the most recent run because nothing new was observed
+        self.unchanged_count = 0
+        # collection_runs row of the most recent run
+        self.last_run: Optional[dict] = None
+        # Local durable buffer between fetch and load (drained by SpoolLoader)
+        self.spool: Optional[RecordSpool] = (
+            RecordSpool(settings.spool_dir) if settings.spool_enabled else None
+        )
+        # Background-priority share of the upstream budget used with the API service
+        self.quota: Optional[UpstreamQuota] = (
+            UpstreamQuota(
+                self.supabase,
+                BACKGROUND,
+                bucket=settings.quota_bucket,
+                chunk_size=settings.quota_chunk_size
+            )
+            if settings.quota_enabled else None
+        )
+        # Splits cities_to_track between collector processes
+        self.coordinator: Optional[ShardCoordinator] = (
+            ShardCoordinator(self.supabase) if settings.sharding_enabled else None
+        )
 
-    async def fetch_weather_by_city_id(self, city_id: int) -> WeatherAPIResponse:
+    async def fetch_weather_payload(
+        self,
+        city_id: int,
+        client: Optional[httpx.AsyncClient] = None
+    ) -> bytes:
         """
-        Fetch weather data from OpenWeatherMap API by city ID
+        Fetch the raw current-weather response body for a city
 
         Args:
             city_id: OpenWeatherMap city ID
+            client: Shared HTTP client; a temporary one is used if omitted
 
         Returns:
-            WeatherAPIResponse with raw API data
+            Response body bytes
         """
         params = {
             "id": city_id,
@@ -34,127 +100,313 @@ class WeatherDataCollector:
             "units": "metric"
         }
 
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{self.base_url}/weather",
-                params=params,
-                timeout=10.0
-            )
-            response.raise_for_status()
-            data = response.json()
+        if client is None:
+            async with httpx.AsyncClient() as own_client:
+                return await self.fetch_weather_payload(city_id, own_client)
 
-        return WeatherAPIResponse(**data)
+        if self.quota:
+            await self.quota.wait(settings.quota_max_wait_seconds)
 
-    def transform_weather_data(self, api_response: WeatherAPIResponse) -> WeatherRecord:
+        response = await client.get(
+            f"{self.base_url}/weather",
+            params=params,
+            timeout=10.0
+        )
+        response.raise_for_status()
+        return response.content
+
+    def retry_delay(self, error: Exception, attempt: int) -> Optional[float]:
         """
-        Transform API response to database record
+        Decide whether a failed fetch is retried and after how long
+
+        Timeouts, connection errors and 5xx back off exponentially. A 429
+        waits for the response's Retry-After (or the backoff if absent) and
+        is not retried at all when that is longer than
+        fetch_retry_max_wait_seconds or the shared upstream budget is
+        nearly spent, since each retry costs another token.
 
         Args:
-            api_response: WeatherAPIResponse from API
+            error: Exception raised by fetch_weather_payload
+            attempt: Number of the retry about to be made, from 1
 
         Returns:
-            WeatherRecord ready for database
+            Seconds to wait before retrying, or None to give up
         """
-        return WeatherRecord(
-            city_id=api_response.id,
-            city_name=api_response.name,
-            country=api_response.sys["country"],
-            latitude=api_response.coord["lat"],
-            longitude=api_response.coord["lon"],
-            temperature=api_response.main["temp"],
-            feels_like=api_response.main["feels_like"],
-            temp_min=api_response.main["temp_min"],
-            temp_max=api_response.main["temp_max"],
-            pressure=api_response.main["pressure"],
-            humidity=api_response.main["humidity"],
-            wind_speed=api_response.wind["speed"],
-            wind_direction=api_response.wind["deg"],
-            cloudiness=api_response.clouds["all"],
-            visibility=api_response.visibility,
-            weather_main=api_response.weather[0]["main"],
-            weather_description=api_response.weather[0]["description"],
-            weather_icon=api_response.weather[0]["icon"],
-            recorded_at=datetime.fromtimestamp(api_response.dt)
-        )
-
-    def load_weather_record(self, weather_record: WeatherRecord) -> None:
+        backoff = settings.fetch_retry_backoff_seconds * 2 ** (attempt - 1)
+        if isinstance(error, httpx.TransportError):
+            return backoff
+        if not isinstance(error, httpx.HTTPStatusError):
+            return None
+
+        status = error.response.status_code
+        if status >= 500:
+            return backoff
+        if status != 429:
+            return None
+
+        if self.quota and self.quota.remaining is not None and self.quota.remaining < self.quota.chunk_size:
+            return None
+        delay = retry_after_seconds(error.response)
+        if delay is None:
+            delay = backoff
+        if delay > settings.fetch_retry_max_wait_seconds:
+            return None
+        return delay
+
+    async def fetch_with_retries(
+        self,
+        city_id: int,
+        client: httpx.AsyncClient,
+        stats: StageStats
+    ) -> bytes:
         """
-        Load weather record into Supabase
+        Fetch a payload, retrying transient failures as decided by retry_delay
 
         Args:
-            weather_record: WeatherRecord to insert
-        """
-        record_dict = weather_record.model_dump(exclude={"id", "created_at"})
-
-        # Convert datetime to ISO format
-        if isinstance(record_dict.get("recorded_at"), datetime):
-            record_dict["recorded_at"] = record_dict["recorded_at"].isoformat()
-
-        self.supabase.table("weather_records").insert(record_dict).execute()
-        print(f"✓ Stored weather data for {weather_record.city_name}")
+            city_id: OpenWeatherMap city ID
+            client: Shared HTTP client
+            stats: Extract stage counters; retries are added to it
 
-    def upsert_city(self, api_response: WeatherAPIResponse) -> None:
+        Returns:
+            Response body bytes
         """
-        Insert or update city information
+        attempt = 0
+        while True:
+            try:
+                return await self.fetch_weather_payload(city_id, client)
+            except (httpx.TransportError, httpx.HTTPStatusError) as e:
+                if attempt >= settings.fetch_retries:
+                    raise
+                delay = self.retry_delay(e, attempt + 1)
+                if delay is None:
+                    raise
+            attempt += 1
+            stats.retries += 1
+            await asyncio.sleep(delay)
+
+    def load_observations(self, observations: List[DecodedObservation]) -> None:
+        """
+        Bulk upsert decoded cities and records into Supabase.
+        Records already stored for the same (city_id, recorded_at) are ignored.
 
         Args:
-            api_response: WeatherAPIResponse containing city data
+            observations: Decoded observations to store
         """
-        city = CityModel(
-            city_id=api_response.id,
-            name=api_response.name,
-            country=api_response.sys["country"],
-            latitude=api_response.coord["lat"],
-            longitude=api_response.coord["lon"],
-            timezone=api_response.timezone
-        )
-
-        city_dict = city.model_dump(exclude={"id", "created_at"})
-
+        cities = {observation.city["city_id"]: observation.city for observation in observations}
         self.supabase.table("cities")\
-            .upsert(city_dict, on_conflict="city_id")\
+            .upsert(list(cities.values()), on_conflict="city_id")\
+            .execute()
+
+        self.supabase.table("weather_records")\
+            .upsert(
+                [observation.record for observation in observations],
+                on_conflict="city_id,recorded_at",
+                ignore_duplicates=True
+            )\
             .execute()
 
-    async def collect_weather_for_city(self, city_id: int) -> None:
+        for observation in observations:
+            print(f"✓ Stored weather data for {observation.city['name']}")
+
+    async def _extract_worker(
+        self,
+        client: httpx.AsyncClient,
+        city_queue: asyncio.Queue,
+        transform_queue: asyncio.Queue,
+        stats: StageStats
+    ) -> None:
+        """Fetch raw payloads for queued city ids until a None sentinel arrives"""
+        while (city_id := await city_queue.get()) is not None:
+            started = time.perf_counter()
+            try:
+                payload = await self.fetch_with_retries(city_id, client, stats)
+            except Exception as e:
+                stats.record(time.perf_counter() - started, ok=False)
+                print(f"✗ Error fetching data for city {city_id}: {str(e)}")
+                continue
+            stats.record(time.perf_counter() - started)
+
+            # Blocks while the downstream stages are behind
+            await transform_queue.put((city_id, payload))
+
+    async def _transform_worker(
+        self,
+        transform_queue: asyncio.Queue,
+        load_queue: asyncio.Queue,
+        stats: StageStats
+    ) -> None:
+        """Decode payloads into database rows until a None sentinel arrives"""
+        while (item := await transform_queue.get()) is not None:
+            city_id, payload = item
+            started = time.perf_counter()
+            try:
+                observation = decode_current_weather(payload)
+            except Exception as e:
+                stats.record(time.perf_counter() - started, ok=False)
+                print(f"✗ Error transforming data for city {city_id}: {str(e)}")
+                continue
+            stats.record(time.perf_counter() - started)
+
+            # Skip observations that were already loaded
+            if self.last_seen_dt.get(city_id) == observation.dt:
+                self.unchanged_count += 1
+                print(f"- No new observation for {observation.city['name']}")
+                continue
+
+            await load_queue.put(observation)
+
+    async def _load_worker(self, load_queue: asyncio.Queue, stats: StageStats) -> None:
+        """Store city info and records until a None sentinel arrives"""
+        while (observation := await load_queue.get()) is not None:
+            city_id = observation.record["city_id"]
+            started = time.perf_counter()
+            try:
+                if self.spool is not None:
+                    # Local append; the database load happens in SpoolLoader
+                    self.spool.append(observation.city, observation.record)
+                else:
+                    # The supabase client is synchronous; keep it off the event loop
+                    await asyncio.to_thread(self.load_observations, [observation])
+            except Exception as e:
+                stats.record(time.perf_counter() - started, ok=False)
+                print(f"✗ Error loading data for city {city_id}: {str(e)}")
+                continue
+            stats.record(time.perf_counter() - started)
+            self.last_seen_dt[city_id] = observation.dt
+            self.loaded_records[city_id] = observation.record
+
+    def record_run(self, row: dict) -> None:
         """
-        Complete ETL process for a single city
+        Store a run's statistics; a failure is reported but never fails the run
 
         Args:
-            city_id: OpenWeatherMap city ID
+            row: collection_runs row
         """
         try:
-            # Extract
-            api_response = await self.fetch_weather_by_city_id(city_id)
-
-            # Transform
-            weather_record = self.transform_weather_data(api_response)
-
-            # Load city info
-            self.upsert_city(api_response)
-
-            # Load weather record
-            self.load_weather_record(weather_record)
-
+            self.supabase.table("collection_runs").insert(row).execute()
         except Exception as e:
-            print(f"✗ Error collecting data for city {city_id}: {str(e)}")
+            print(f"✗ Could not record collection run: {str(e)}")
 
-    async def collect_all_cities(self, city_ids: List[int]) -> None:
+    async def collect_all_cities(self, city_ids: List[int]) -> dict:
         """
-        Collect weather data for multiple cities concurrently
+        Collect weather data for multiple cities through bounded
+        extract -> transform -> load stages.
+
+        Each stage runs a fixed number of workers and hands items on through
+        a bounded queue, so a slow load stage backs up into transform and
+        extract instead of piling up in-flight requests.
 
         Args:
             city_ids: List of OpenWeatherMap city IDs
+
+        Returns:
+            The run's collection_runs row
         """
         print(f"Starting weather data collection for {len(city_ids)} cities...")
+        started_at = datetime.now(timezone.utc)
 
-        tasks = [self.collect_weather_for_city(city_id) for city_id in city_ids]
-        await asyncio.gather(*tasks)
+        city_queue: asyncio.Queue = asyncio.Queue(maxsize=settings.stage_queue_size)
+        transform_queue: asyncio.Queue = asyncio.Queue(maxsize=settings.stage_queue_size)
+        load_queue: asyncio.Queue = asyncio.Queue(maxsize=settings.stage_queue_size)
+
+        self.stage_stats = {
+            name: StageStats(name) for name in ("extract", "transform", "load")
+        }
+        self.loaded_records = {}
+        self.unchanged_count = 0
 
-        print("Weather data collection completed!")
+        async with httpx.AsyncClient() as client:
+            extractors = [
+                asyncio.create_task(self._extract_worker(
+                    client, city_queue, transform_queue, self.stage_stats["extract"]
+                ))
+                for _ in range(settings.extract_concurrency)
+            ]
+            transformers = [
+                asyncio.create_task(self._transform_worker(
+                    transform_queue, load_queue, self.stage_stats["transform"]
+                ))
+                for _ in range(settings.transform_concurrency)
+            ]
+            loaders = [
+                asyncio.create_task(self._load_worker(
+                    load_queue, self.stage_stats["load"]
+                ))
+                for _ in range(settings.load_concurrency)
+            ]
+
+            for city_id in city_ids:
+                await city_queue.put(city_id)
+
+            # Drain each stage in order, stopping its workers with sentinels
+            for workers, queue in (
+                (extractors, city_queue),
+                (transformers, transform_queue),
+                (loaders, load_queue)
+            ):
+                for _ in workers:
+                    await queue.put(None)
+                await asyncio.gather(*workers)
+
+        if self.spool is not None:
+            # Hand this run's records to the loader
+            self.spool.rotate()
+
+        self.last_run = collection_run_row(
+            worker_id=self.coordinator.worker_id if self.coordinator else (settings.worker_id or default_worker_id()),
+            started_at=started_at,
+            finished_at=datetime.now(timezone.utc),
+            cities_attempted=len(city_ids),
+            cities_unchanged=self.unchanged_count,
+            stage_stats=self.stage_stats,
+            load_mode="spool" if self.spool is not None else "database"
+        )
+        if settings.run_telemetry_enabled:
+            await asyncio.to_thread(self.record_run, self.last_run)
+
+        run = self.last_run
+        # In spool mode cities_succeeded counts records appended to the spool;
+        # they reach the database when the SpoolLoader drains it
+        loaded = "spooled" if run["load_mode"] == "spool" else "stored"
+        print(
+            f"Weather data collection completed in {run['duration_seconds']}s: "
+            f"{run['cities_succeeded']} {loaded}, {run['cities_unchanged']} unchanged, "
+            f"{run['cities_failed']} failed, {run['cities_per_second']} cities/s"
+        )
+        for stats in self.stage_stats.values():
+            print(f"  {stats}")
+        if self.quota and self.quota.remaining is not None:
+            print(f"  Upstream budget remaining: {self.quota.remaining:.0f} requests")
+        return run
+
+    async def assigned_cities(self, refresh: bool = True) -> List[int]:
+        """
+        This worker's share of the configured cities
+
+        Args:
+            refresh: Heartbeat and renew leases first; otherwise reuse the last
+                assignment when there is one
+
+        Returns:
+            City IDs to collect: all of them when not sharded, or when no
+            assignment has succeeded yet
+        """
+        city_ids = settings.cities_to_track
+        if self.coordinator is None:
+            return city_ids
+        if refresh or self.coordinator.assigned is None:
+            try:
+                await asyncio.to_thread(self.coordinator.assign, city_ids)
+            except Exception as e:
+                print(f"✗ Shard assignment failed: {str(e)}")
+        if self.coordinator.assigned is None:
+            print("  Collecting all configured cities until an assignment succeeds")
+            return city_ids
+        return self.coordinator.assigned
 
     async def run_collection(self) -> None:
-        """Run the data collection for all configured cities"""
-        await self.collect_all_cities(settings.cities_to_track)
+        """Run the data collection for this worker's share of the configured cities"""
+        await self.collect_all_cities(await self.assigned_cities())
 
 
 async def main():
@@ -0,0 +1,22 @@
+from datetime import datetime
+from pydantic import BaseModel
+
+
+class BackfillJob(BaseModel):
+    """One upstream history request covering part of a gap"""
+    city_id: int
+    start: datetime
+    end: datetime
+
+    @property
+    def key(self) -> str:
+        """Stable identifier used in the checkpoint"""
+        return f"{self.city_id}:{int(self.start.timestamp())}:{int(self.end.timestamp())}"
+
+
+class BackfillCheckpoint(BaseModel):
+    """Persisted backfill plan and progress, so a run can be resumed"""
+    created_at: datetime
+    jobs: list[BackfillJob] = []
+    completed: list[str] = []
+    records_loaded: int = 0
@@ -1,31 +1,10 @@
 from datetime import datetime
 from typing import Optional
-from pydantic import BaseModel, Field
+from pydantic import BaseModel
+from weather_common.models import WeatherRecord
 
-
-class WeatherRecord(BaseModel):
-    """Database model for storing weather records"""
-    id: Optional[int] = None
-    city_id: int
-    city_name: str
-    country: str
-    latitude: float
-    longitude: float
-    temperature: float
-    feels_like: float
-    temp_min: float
-    temp_max: float
-    pressure: int
-    humidity: int
-    wind_speed: float
-    wind_direction: int
-    cloudiness: int
-    visibility: int
-    weather_main: str
-    weather_description: str
-    weather_icon: str
-    recorded_at: datetime
-    created_at: Optional[datetime] = None
+# WeatherRecord lives in weather_common; re-exported for existing imports
+__all__ = ["CityModel", "WeatherAPIResponse", "WeatherRecord"]
 
 
 class CityModel(BaseModel):
@@ -3,6 +3,9 @@ from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.interval import IntervalTrigger
 from datetime import datetime
 from etl.weather_collector import WeatherDataCollector
+from etl.retention import WeatherRetentionJob
+from etl.adaptive_schedule import AdaptiveCollectionPlanner
+from etl.spool import SpoolLoader
 from config import settings
 
 
@@ -12,6 +15,9 @@ class WeatherDataScheduler:
     def __init__(self):
         self.scheduler = AsyncIOScheduler()
         self.collector = WeatherDataCollector()
+        self.retention = WeatherRetentionJob()
+        self.planner = AdaptiveCollectionPlanner(self.collector.supabase)
+        self.spool_loader = SpoolLoader(settings.spool_dir, self.collector.supabase)
 
     async def collect_weather_job(self):
         """Job to collect weather data"""
@@ -21,27 +27,139 @@ class WeatherDataScheduler:
         except Exception as e:
             print(f"Error in scheduled job: {str(e)}")
 
+    async def adaptive_collection_job(self):
+        """Job to collect the cities whose own interval has elapsed"""
+        try:
+            now = datetime.now()
+            # The heartbeat job heartbeats and rebalances; ticks reuse its assignment
+            city_ids = await self.collector.assigned_cities(refresh=False)
+            self.planner.sync_cities(city_ids, now)
+
+            replan_due = self.planner.last_replan is None or (
+                now - self.planner.last_replan
+            ).total_seconds() >= settings.replan_interval_minutes * 60
+            if replan_due:
+                await asyncio.to_thread(self.planner.fetch_demand)
+                # Each worker spends the share of the budget matching its share of cities
+                share = len(city_ids) / max(len(settings.cities_to_track), 1)
+                self.planner.replan(settings.request_budget_per_hour * share)
+                self.planner.last_replan = now
+                self.planner.print_report()
+
+            due = self.planner.due(now)
+            if not due:
+                return
+
+            print(f"\n[{now.strftime('%Y-%m-%d %H:%M:%S')}] Collecting {len(due)} due cities...")
+            await self.collector.collect_all_cities(due)
+            self.planner.observe(due, self.collector.loaded_records, datetime.now())
+        except Exception as e:
+            print(f"Error in adaptive collection job: {str(e)}")
+
+    async def spool_drain_job(self):
+        """Job to load spooled records into the database"""
+        try:
+            await asyncio.to_thread(self.spool_loader.drain)
+        except Exception as e:
+            print(f"Error in spool drain job: {str(e)}")
+
+    async def heartbeat_job(self):
+        """
+        Job to keep this worker in the collector hash ring and rebalance:
+        cities that moved to another worker are released here, so a joining
+        worker can lease them on its next heartbeat instead of waiting for
+        this worker's next collection
+        """
+        try:
+            await self.collector.assigned_cities()
+        except Exception as e:
+            print(f"Error in heartbeat job: {str(e)}")
+
+    async def retention_job(self):
+        """Job to maintain partitions and retire old raw records"""
+        coordinator = self.collector.coordinator
+        try:
+            # Only one collector worker runs retention
+            if coordinator is not None and not await asyncio.to_thread(coordinator.is_leader):
+                return
+            print(f"\n[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Running weather data retention...")
+            await self.retention.run()
+        except Exception as e:
+            print(f"Error in retention job: {str(e)}")
+
     def start(self):
         """Start the scheduler"""
-        # Schedule weather collection at configured interval
+        if settings.adaptive_scheduling_enabled:
+            # Check every tick which cities are due under their own interval
+            self.scheduler.add_job(
+                self.adaptive_collection_job,
+                trigger=IntervalTrigger(minutes=settings.adaptive_tick_minutes),
+                id="weather_collection",
+                name="Adaptive Weather Data Collection",
+                replace_existing=True
+            )
+        else:
+            # Schedule weather collection at configured interval
+            self.scheduler.add_job(
+                self.collect_weather_job,
+                trigger=IntervalTrigger(minutes=settings.collection_interval_minutes),
+                id="weather_collection",
+                name="Weather Data Collection",
+                replace_existing=True
+            )
+
+        # Keep partitions ahead of incoming data and downsample old records
         self.scheduler.add_job(
-            self.collect_weather_job,
-            trigger=IntervalTrigger(minutes=settings.collection_interval_minutes),
-            id="weather_collection",
-            name="Weather Data Collection",
+            self.retention_job,
+            trigger=IntervalTrigger(hours=settings.retention_interval_hours),
+            id="weather_retention",
+            name="Weather Data Retention",
             replace_existing=True
         )
 
+        if settings.spool_enabled:
+            self.scheduler.add_job(
+                self.spool_drain_job,
+                trigger=IntervalTrigger(seconds=settings.spool_drain_seconds),
+                id="spool_drain",
+                name="Spool Drain",
+                replace_existing=True
+            )
+
+        if self.collector.coordinator is not None:
+            self.scheduler.add_job(
+                self.heartbeat_job,
+                trigger=IntervalTrigger(seconds=settings.heartbeat_interval_seconds),
+                id="collector_heartbeat",
+                name="Collector Heartbeat",
+                replace_existing=True
+            )
+
         print(f"Weather data scheduler started!")
-        print(f"Collection interval: {settings.collection_interval_minutes} minutes")
+        if settings.adaptive_scheduling_enabled:
+            print(
+                f"Adaptive collection: {settings.request_budget_per_hour} requests/hour, "
+                f"intervals {settings.min_interval_minutes}-{settings.max_interval_minutes} minutes"
+            )
+        else:
+            print(f"Collection interval: {settings.collection_interval_minutes} minutes")
+            print(f"Next run will start in {settings.collection_interval_minutes} minutes")
         print(f"Tracking {len(settings.cities_to_track)} cities")
-        print(f"Next run will start in {settings.collection_interval_minutes} minutes\n")
+        if self.collector.coordinator is not None:
+            print(f"Sharded collection as worker {self.collector.coordinator.worker_id}")
+        print(f"Raw records kept for {settings.raw_retention_days} days, then downsampled hourly")
+        print()
 
         self.scheduler.start()
 
     def stop(self):
         """Stop the scheduler"""
         self.scheduler.shutdown()
+        if self.collector.spool is not None:
+            self.collector.spool.rotate()
+        if self.collector.coordinator is not None:
+            # Hand this worker's cities to the others right away
+            self.collector.coordinator.release()
         print("Scheduler stopped")
 
 
@@ -51,7 +169,10 @@ async def main():
 
     # Run initial collection immediately
     print("Running initial data collection...")
-    await scheduler.collector.run_collection()
+    if settings.adaptive_scheduling_enabled:
+        await scheduler.adaptive_collection_job()
+    else:
+        await scheduler.collect_weather_job()
 
     # Start scheduled collections
     scheduler.start()
@@ -0,0 +1,156 @@
+import argparse
+import csv
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from itertools import islice
+from typing import Iterator, List, Optional
+from supabase import create_client, Client
+from config import settings
+from weather_common import RECORD_FIELDS
+from weather_common.synthetic import SyntheticCity, SyntheticWeather, synthetic_cities
+
+
+class SyntheticSeeder:
+    """Fills the database with reproducible synthetic cities and observations for benchmarking"""
+
+    def __init__(self, city_count: int, seed: int):
+        self.cities: List[SyntheticCity] = synthetic_cities(city_count, seed)
+        self.generator = SyntheticWeather(seed)
+        self._supabase: Optional[Client] = None
+
+    @property
+    def supabase(self) -> Client:
+        """Supabase client, only created when seeding the database"""
+        if self._supabase is None:
+            self._supabase = create_client(settings.supabase_url, settings.supabase_key)
+        return self._supabase
+
+    def rows(self, start: datetime, end: datetime, step: timedelta) -> Iterator[dict]:
+        """weather_records rows for every city over [start, end)"""
+        return self.generator.records(self.cities, start, end, step, jitter_seconds=60)
+
+    def seed_database(
+        self,
+        start: datetime,
+        end: datetime,
+        step: timedelta,
+        batch_size: int
+    ) -> int:
+        """
+        Upsert the synthetic cities and their observations through PostgREST
+
+        Args:
+            start: First observation time
+            end: End of the range (exclusive)
+            step: Time between observations per city
+            batch_size: Rows per insert request
+
+        Returns:
+            Number of rows sent
+        """
+        # Monthly partitions for the whole range, so rows skip the default partition
+        self.supabase.rpc(
+            "ensure_weather_partitions",
+            {"p_months_ahead": settings.partition_months_ahead, "p_from": start.isoformat()}
+        ).execute()
+
+        for offset in range(0, len(self.cities), batch_size):
+            batch = [city.row() for city in self.cities[offset:offset + batch_size]]
+            self.supabase.table("cities").upsert(batch, on_conflict="city_id").execute()
+
+        sent = 0
+        started = time.perf_counter()
+        rows = self.rows(start, end, step)
+        while True:
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                break
+            self.supabase.table("weather_records")\
+                .upsert(batch, on_conflict="city_id,recorded_at", ignore_duplicates=True)\
+                .execute()
+            sent += len(batch)
+            if sent % (batch_size * 100) == 0:
+                rate = sent / (time.perf_counter() - started)
+                print(f"  {sent} rows ({rate:.0f} rows/s)")
+
+        return sent
+
+    def write_csv(
+        self,
+        directory: str,
+        start: datetime,
+        end: datetime,
+        step: timedelta
+    ) -> int:
+        """
+        Write cities.csv and weather_records.csv for loading with COPY, which is
+        much faster than PostgREST for millions of rows:
+
+            \\copy cities (city_id, name, country, latitude, longitude, timezone) FROM 'cities.csv' CSV HEADER
+            \\copy weather_records (<columns in the header>) FROM 'weather_records.csv' CSV HEADER
+
+        Args:
+            directory: Output directory
+            start: First observation time
+            end: End of the range (exclusive)
+            step: Time between observations per city
+
+        Returns:
+            Number of weather rows written
+        """
+        os.makedirs(directory, exist_ok=True)
+
+        with open(os.path.join(directory, "cities.csv"), "w", newline="") as handle:
+            writer = csv.writer(handle)
+            writer.writerow(SyntheticCity._fields)
+            writer.writerows(self.cities)
+
+        written = 0
+        with open(os.path.join(directory, "weather_records.csv"), "w", newline="") as handle:
+            writer = csv.writer(handle)
+            writer.writerow(RECORD_FIELDS)
+            for row in self.rows(start, end, step):
+                writer.writerow([row[field] for field in RECORD_FIELDS])
+                written += 1
+
+        return written
+
+
+def main():
+    """Main entry point for seeding synthetic weather data"""
+    parser = argparse.ArgumentParser(
+        description="Seed reproducible synthetic weather data for benchmarks"
+    )
+    parser.add_argument("--cities", type=int, default=1000, help="Number of synthetic cities")
+    parser.add_argument("--days", type=int, default=30, help="Days of history ending now")
+    parser.add_argument("--step-minutes", type=int, default=30, help="Minutes between observations")
+    parser.add_argument("--seed", type=int, default=0, help="Generator seed")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Rows per database request")
+    parser.add_argument(
+        "--csv",
+        metavar="DIR",
+        help="Write CSV files for COPY into DIR instead of inserting through Supabase"
+    )
+    args = parser.parse_args()
+
+    end = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
+    start = end - timedelta(days=args.days)
+    step = timedelta(minutes=args.step_minutes)
+    expected = args.cities * int((end - start) / step)
+
+    seeder = SyntheticSeeder(args.cities, args.seed)
+    print(f"Generating ~{expected} rows for {args.cities} cities from {start:%Y-%m-%d} to {end:%Y-%m-%d}")
+
+    started = time.perf_counter()
+    if args.csv:
+        count = seeder.write_csv(args.csv, start, end, step)
+    else:
+        count = seeder.seed_database(start, end, step, args.batch_size)
+    elapsed = time.perf_counter() - started
+
+    print(f"Seeded {count} rows in {elapsed:.1f}s ({count / elapsed:.0f} rows/s)")
+
+
+if __name__ == "__main__":
+    main()
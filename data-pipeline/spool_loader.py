@@ -0,0 +1,33 @@
+import argparse
+import asyncio
+from supabase import create_client
+from config import settings
+from etl.spool import SpoolLoader
+
+
+async def main():
+    """Main entry point for draining the collector spool into the database"""
+    parser = argparse.ArgumentParser(
+        description="Load spooled weather records into Supabase"
+    )
+    parser.add_argument(
+        "--once",
+        action="store_true",
+        help="Drain the spool once and exit"
+    )
+    args = parser.parse_args()
+
+    loader = SpoolLoader(
+        settings.spool_dir,
+        create_client(settings.supabase_url, settings.supabase_key)
+    )
+
+    while True:
+        await asyncio.to_thread(loader.drain)
+        if args.once:
+            break
+        await asyncio.sleep(settings.spool_drain_seconds)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
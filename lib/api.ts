@@ -1,7 +1,11 @@
 import type {
   CurrentWeather,
   ForecastResponse,
+  ForecastSeries,
+  CityOverview,
+  NearbyWeatherResponse,
   WeatherRecord,
+  CompactRecords,
   WeatherAnalytics,
   City,
   InsightResponse
@@ -9,6 +13,41 @@ import type {
 
 const API_BASE_URL = process.env.NEXT_PUBLIC_API_URL || 'http://localhost:8000';
 
+const COMPACT_MEDIA_TYPE = 'application/vnd.weather.compact+json';
+
+/**
+ * Expand a compact historical response into WeatherRecord rows.
+ */
+export function decodeCompactRecords(compact: CompactRecords): WeatherRecord[] {
+  const fields = [
+    ...Object.keys(compact.constants),
+    ...Object.keys(compact.columns),
+  ] as (keyof WeatherRecord)[];
+
+  const records: WeatherRecord[] = [];
+  for (let i = 0; i < compact.count; i++) {
+    const record: Record<string, string | number | null> = {};
+    for (const field of fields) {
+      let value: string | number | null;
+      if (field in compact.constants) {
+        value = compact.constants[field] ?? null;
+      } else {
+        value = compact.columns[field]![i];
+        const dictionary = compact.dictionaries[field];
+        if (dictionary && value !== null) {
+          value = dictionary[value];
+        }
+      }
+      if (field === 'recorded_at') {
+        value = new Date((value as number) * 1000).toISOString();
+      }
+      record[field] = value;
+    }
+    records.push(record as unknown as WeatherRecord);
+  }
+  return records;
+}
+
 export class WeatherAPI {
   static async getCurrentWeather(city: string): Promise<CurrentWeather> {
     // Try real API first, fall back to demo if it fails
@@ -48,18 +87,67 @@ export class WeatherAPI {
     return response.json();
   }
 
+  static async getForecastSeries(
+    city: string,
+    fields: string[] = ['temp', 'pop']
+  ): Promise<ForecastSeries> {
+    const response = await fetch(
+      `${API_BASE_URL}/weather/forecast?city=${encodeURIComponent(city)}&fields=${fields.join(',')}`
+    );
+
+    if (!response.ok) {
+      throw new Error('Failed to fetch forecast');
+    }
+
+    return response.json();
+  }
+
+  static async getCityOverview(
+    cityId: number,
+    forecastFields?: string[]
+  ): Promise<CityOverview> {
+    const query = forecastFields ? `?forecast_fields=${forecastFields.join(',')}` : '';
+    const response = await fetch(`${API_BASE_URL}/overview/${cityId}${query}`);
+
+    if (!response.ok) {
+      throw new Error('Failed to fetch city overview');
+    }
+
+    return response.json();
+  }
+
+  static async getNearbyWeather(
+    lat: number,
+    lon: number,
+    radiusKm: number = 50
+  ): Promise<NearbyWeatherResponse> {
+    const response = await fetch(
+      `${API_BASE_URL}/weather/nearby?lat=${lat}&lon=${lon}&radius_km=${radiusKm}`
+    );
+
+    if (!response.ok) {
+      throw new Error('Failed to fetch nearby weather');
+    }
+
+    return response.json();
+  }
+
   static async getHistoricalWeather(
     cityId: number,
     limit: number = 100
   ): Promise<WeatherRecord[]> {
     const response = await fetch(
-      `${API_BASE_URL}/weather/historical/${cityId}?limit=${limit}`
+      `${API_BASE_URL}/weather/historical/${cityId}?limit=${limit}`,
+      { headers: { Accept: `${COMPACT_MEDIA_TYPE}, application/json;q=0.9` } }
     );
 
     if (!response.ok) {
       throw new Error('Failed to fetch historical weather');
     }
 
+    if (response.headers.get('content-type')?.startsWith(COMPACT_MEDIA_TYPE)) {
+      return decodeCompactRecords(await response.json());
+    }
     return response.json();
   }
 
@@ -165,4 +253,22 @@ export class WeatherAPI {
 
     return response.json();
   }
+
+  /**
+   * Subscribe to new weather records for a set of cities over Server-Sent Events.
+   * Returns a function that closes the stream.
+   */
+  static subscribeToLiveWeather(
+    cityIds: number[],
+    onRecord: (record: WeatherRecord) => void
+  ): () => void {
+    const params = cityIds.map((id) => `city_ids=${id}`).join('&');
+    const source = new EventSource(`${API_BASE_URL}/live/weather?${params}`);
+
+    source.addEventListener('weather', (event) => {
+      onRecord(JSON.parse((event as MessageEvent).data));
+    });
+
+    return () => source.close();
+  }
 }
@@ -0,0 +1,106 @@
+-- Convert an existing, unpartitioned weather_records table to the monthly
+-- partitioned layout defined in supabase-schema.sql.
+--
+-- Run once, after the functions in supabase-schema.sql have been created
+-- (ensure_weather_partitions, compact_weather_records, notify_weather_record).
+-- Rows are copied in a single transaction, so schedule it with the data
+-- pipeline stopped. Duplicate (city_id, recorded_at) rows are dropped on copy.
+
+BEGIN;
+
+DROP VIEW IF EXISTS latest_weather;
+
+ALTER TABLE weather_records RENAME TO weather_records_unpartitioned;
+ALTER TABLE weather_records_unpartitioned DROP CONSTRAINT IF EXISTS unique_weather_observation;
+DROP INDEX IF EXISTS idx_weather_records_city_id;
+DROP INDEX IF EXISTS idx_weather_records_recorded_at;
+DROP INDEX IF EXISTS idx_weather_records_city_recorded;
+DROP TRIGGER IF EXISTS weather_records_notify ON weather_records_unpartitioned;
+
+-- Keep issuing ids from the existing sequence
+ALTER SEQUENCE weather_records_id_seq OWNED BY NONE;
+
+CREATE TABLE weather_records (
+    id BIGINT NOT NULL DEFAULT nextval('weather_records_id_seq'),
+    city_id INTEGER NOT NULL REFERENCES cities(city_id) ON DELETE CASCADE,
+    city_name VARCHAR(255) NOT NULL,
+    country VARCHAR(10) NOT NULL,
+    latitude DECIMAL(10, 7) NOT NULL,
+    longitude DECIMAL(10, 7) NOT NULL,
+    temperature DECIMAL(5, 2) NOT NULL,
+    feels_like DECIMAL(5, 2) NOT NULL,
+    temp_min DECIMAL(5, 2) NOT NULL,
+    temp_max DECIMAL(5, 2) NOT NULL,
+    pressure INTEGER NOT NULL,
+    humidity INTEGER NOT NULL,
+    wind_speed DECIMAL(5, 2) NOT NULL,
+    wind_direction INTEGER NOT NULL,
+    cloudiness INTEGER NOT NULL,
+    visibility INTEGER NOT NULL,
+    weather_main VARCHAR(50) NOT NULL,
+    weather_description VARCHAR(255) NOT NULL,
+    weather_icon VARCHAR(10) NOT NULL,
+    recorded_at TIMESTAMP WITH TIME ZONE NOT NULL,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id, recorded_at),
+    CONSTRAINT unique_weather_observation UNIQUE (city_id, recorded_at)
+) PARTITION BY RANGE (recorded_at);
+
+ALTER SEQUENCE weather_records_id_seq OWNED BY weather_records.id;
+
+CREATE TABLE weather_records_default PARTITION OF weather_records DEFAULT;
+
+SELECT ensure_weather_partitions(
+    3,
+    COALESCE((SELECT MIN(recorded_at) FROM weather_records_unpartitioned), NOW())
+);
+
+CREATE INDEX idx_weather_records_city_id ON weather_records(city_id);
+CREATE INDEX idx_weather_records_recorded_at ON weather_records(recorded_at DESC);
+CREATE INDEX idx_weather_records_city_recorded ON weather_records(city_id, recorded_at DESC);
+
+INSERT INTO weather_records
+SELECT DISTINCT ON (city_id, recorded_at) *
+FROM weather_records_unpartitioned
+ORDER BY city_id, recorded_at, id;
+
+DROP TABLE weather_records_unpartitioned;
+
+CREATE TRIGGER weather_records_notify
+    AFTER INSERT ON weather_records
+    FOR EACH ROW
+    EXECUTE FUNCTION notify_weather_record();
+
+ALTER TABLE weather_records ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Weather records are viewable by everyone"
+    ON weather_records FOR SELECT
+    USING (true);
+
+CREATE OR REPLACE VIEW latest_weather AS
+SELECT DISTINCT ON (city_id)
+    id,
+    city_id,
+    city_name,
+    country,
+    latitude,
+    longitude,
+    temperature,
+    feels_like,
+    temp_min,
+    temp_max,
+    pressure,
+    humidity,
+    wind_speed,
+    wind_direction,
+    cloudiness,
+    visibility,
+    weather_main,
+    weather_description,
+    weather_icon,
+    recorded_at,
+    created_at
+FROM weather_records
+ORDER BY city_id, recorded_at DESC;
+
+COMMIT;
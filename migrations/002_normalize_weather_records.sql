@@ -0,0 +1,381 @@
+-- Normalize weather_records: condition text moves to the weather_conditions
+-- lookup table (rows keep a SMALLINT OpenWeatherMap condition id and a
+-- day/night flag) and city name, country and coordinates are read from
+-- cities instead of being repeated on every row. The weather_records_expanded
+-- view serves the original wide layout.
+--
+-- Run once, after 001_partition_weather_records.sql. Rows are copied into a
+-- new partitioned table in a single transaction, so schedule it with the
+-- data pipeline and API service stopped, and drain any collector spool
+-- first (spooled rows use the old layout). Deploy the matching API service
+-- and pipeline code with it.
+--
+-- Stored text that does not match a known condition is added to
+-- weather_conditions with an id below 200, which OpenWeatherMap does not use.
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS weather_conditions (
+    id SMALLINT PRIMARY KEY,
+    main VARCHAR(50) NOT NULL,
+    description VARCHAR(255) NOT NULL,
+    icon VARCHAR(3) NOT NULL,
+    CONSTRAINT unique_weather_condition UNIQUE (main, description)
+);
+
+INSERT INTO weather_conditions (id, main, description, icon)
+VALUES
+    (200, 'Thunderstorm', 'thunderstorm with light rain', '11'),
+    (201, 'Thunderstorm', 'thunderstorm with rain', '11'),
+    (202, 'Thunderstorm', 'thunderstorm with heavy rain', '11'),
+    (210, 'Thunderstorm', 'light thunderstorm', '11'),
+    (211, 'Thunderstorm', 'thunderstorm', '11'),
+    (212, 'Thunderstorm', 'heavy thunderstorm', '11'),
+    (221, 'Thunderstorm', 'ragged thunderstorm', '11'),
+    (230, 'Thunderstorm', 'thunderstorm with light drizzle', '11'),
+    (231, 'Thunderstorm', 'thunderstorm with drizzle', '11'),
+    (232, 'Thunderstorm', 'thunderstorm with heavy drizzle', '11'),
+    (300, 'Drizzle', 'light intensity drizzle', '09'),
+    (301, 'Drizzle', 'drizzle', '09'),
+    (302, 'Drizzle', 'heavy intensity drizzle', '09'),
+    (310, 'Drizzle', 'light intensity drizzle rain', '09'),
+    (311, 'Drizzle', 'drizzle rain', '09'),
+    (312, 'Drizzle', 'heavy intensity drizzle rain', '09'),
+    (313, 'Drizzle', 'shower rain and drizzle', '09'),
+    (314, 'Drizzle', 'heavy shower rain and drizzle', '09'),
+    (321, 'Drizzle', 'shower drizzle', '09'),
+    (500, 'Rain', 'light rain', '10'),
+    (501, 'Rain', 'moderate rain', '10'),
+    (502, 'Rain', 'heavy intensity rain', '10'),
+    (503, 'Rain', 'very heavy rain', '10'),
+    (504, 'Rain', 'extreme rain', '10'),
+    (511, 'Rain', 'freezing rain', '13'),
+    (520, 'Rain', 'light intensity shower rain', '09'),
+    (521, 'Rain', 'shower rain', '09'),
+    (522, 'Rain', 'heavy intensity shower rain', '09'),
+    (531, 'Rain', 'ragged shower rain', '09'),
+    (600, 'Snow', 'light snow', '13'),
+    (601, 'Snow', 'snow', '13'),
+    (602, 'Snow', 'heavy snow', '13'),
+    (611, 'Snow', 'sleet', '13'),
+    (612, 'Snow', 'light shower sleet', '13'),
+    (613, 'Snow', 'shower sleet', '13'),
+    (615, 'Snow', 'light rain and snow', '13'),
+    (616, 'Snow', 'rain and snow', '13'),
+    (620, 'Snow', 'light shower snow', '13'),
+    (621, 'Snow', 'shower snow', '13'),
+    (622, 'Snow', 'heavy shower snow', '13'),
+    (701, 'Mist', 'mist', '50'),
+    (711, 'Smoke', 'smoke', '50'),
+    (721, 'Haze', 'haze', '50'),
+    (731, 'Dust', 'sand/dust whirls', '50'),
+    (741, 'Fog', 'fog', '50'),
+    (751, 'Sand', 'sand', '50'),
+    (761, 'Dust', 'dust', '50'),
+    (762, 'Ash', 'volcanic ash', '50'),
+    (771, 'Squall', 'squalls', '50'),
+    (781, 'Tornado', 'tornado', '50'),
+    (800, 'Clear', 'clear sky', '01'),
+    (801, 'Clouds', 'few clouds', '02'),
+    (802, 'Clouds', 'scattered clouds', '03'),
+    (803, 'Clouds', 'broken clouds', '04'),
+    (804, 'Clouds', 'overcast clouds', '04')
+ON CONFLICT (id) DO NOTHING;
+
+DROP VIEW IF EXISTS latest_weather;
+
+ALTER TABLE weather_records RENAME TO weather_records_wide;
+ALTER TABLE weather_records_wide DROP CONSTRAINT IF EXISTS unique_weather_observation;
+DROP INDEX IF EXISTS idx_weather_records_city_id;
+DROP INDEX IF EXISTS idx_weather_records_recorded_at;
+DROP INDEX IF EXISTS idx_weather_records_city_recorded;
+DROP TRIGGER IF EXISTS weather_records_notify ON weather_records_wide;
+
+-- Free the partition names for the new table
+DO $$
+DECLARE
+    partition_name TEXT;
+BEGIN
+    FOR partition_name IN
+        SELECT child.relname
+        FROM pg_inherits
+        JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+        JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+        WHERE parent.relname = 'weather_records_wide'
+    LOOP
+        EXECUTE format('ALTER TABLE %I RENAME TO %I', partition_name, 'wide_' || partition_name);
+    END LOOP;
+END;
+$$;
+
+-- Keep issuing ids from the existing sequence
+ALTER SEQUENCE weather_records_id_seq OWNED BY NONE;
+
+CREATE TABLE weather_records (
+    id BIGINT NOT NULL DEFAULT nextval('weather_records_id_seq'),
+    city_id INTEGER NOT NULL REFERENCES cities(city_id) ON DELETE CASCADE,
+    temperature DECIMAL(5, 2) NOT NULL,
+    feels_like DECIMAL(5, 2) NOT NULL,
+    temp_min DECIMAL(5, 2) NOT NULL,
+    temp_max DECIMAL(5, 2) NOT NULL,
+    pressure INTEGER NOT NULL,
+    humidity INTEGER NOT NULL,
+    wind_speed DECIMAL(5, 2) NOT NULL,
+    wind_direction INTEGER NOT NULL,
+    cloudiness INTEGER NOT NULL,
+    visibility INTEGER NOT NULL,
+    condition_id SMALLINT NOT NULL,
+    is_day BOOLEAN NOT NULL,
+    recorded_at TIMESTAMP WITH TIME ZONE NOT NULL,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id, recorded_at),
+    CONSTRAINT unique_weather_observation UNIQUE (city_id, recorded_at)
+) PARTITION BY RANGE (recorded_at);
+
+ALTER SEQUENCE weather_records_id_seq OWNED BY weather_records.id;
+
+CREATE TABLE weather_records_default PARTITION OF weather_records DEFAULT;
+
+SELECT ensure_weather_partitions(
+    3,
+    COALESCE((SELECT MIN(recorded_at) FROM weather_records_wide), NOW())
+);
+
+CREATE INDEX idx_weather_records_city_id ON weather_records(city_id);
+CREATE INDEX idx_weather_records_recorded_at ON weather_records(recorded_at DESC);
+CREATE INDEX idx_weather_records_city_recorded ON weather_records(city_id, recorded_at DESC);
+
+INSERT INTO weather_conditions (id, main, description, icon)
+SELECT
+    ROW_NUMBER() OVER (ORDER BY unknown.main, unknown.description),
+    unknown.main,
+    unknown.description,
+    unknown.icon
+FROM (
+    SELECT
+        w.weather_main AS main,
+        w.weather_description AS description,
+        MIN(LEFT(w.weather_icon, 2)) AS icon
+    FROM weather_records_wide w
+    WHERE NOT EXISTS (
+        SELECT 1 FROM weather_conditions wc
+        WHERE wc.main = w.weather_main
+            AND wc.description = w.weather_description
+    )
+    GROUP BY w.weather_main, w.weather_description
+) unknown;
+
+INSERT INTO weather_records (
+    id, city_id, temperature, feels_like, temp_min, temp_max, pressure,
+    humidity, wind_speed, wind_direction, cloudiness, visibility,
+    condition_id, is_day, recorded_at, created_at
+)
+SELECT
+    w.id, w.city_id, w.temperature, w.feels_like, w.temp_min, w.temp_max, w.pressure,
+    w.humidity, w.wind_speed, w.wind_direction, w.cloudiness, w.visibility,
+    wc.id, RIGHT(w.weather_icon, 1) = 'd', w.recorded_at, w.created_at
+FROM weather_records_wide w
+JOIN weather_conditions wc
+    ON wc.main = w.weather_main
+    AND wc.description = w.weather_description;
+
+DROP TABLE weather_records_wide;
+
+CREATE OR REPLACE FUNCTION downsample_weather_records(
+    p_older_than TIMESTAMP WITH TIME ZONE
+)
+RETURNS BIGINT AS $$
+DECLARE
+    watermark TIMESTAMP WITH TIME ZONE;
+    upserted_count BIGINT;
+BEGIN
+    SELECT COALESCE(MAX(hour), '-infinity'::TIMESTAMP WITH TIME ZONE)
+        INTO watermark
+        FROM weather_records_hourly;
+
+    INSERT INTO weather_records_hourly AS h (
+        city_id, hour, avg_temperature, min_temperature, max_temperature,
+        avg_humidity, avg_pressure, avg_wind_speed, max_wind_speed,
+        avg_cloudiness, weather_main, sample_count
+    )
+    SELECT
+        wr.city_id,
+        date_trunc('hour', wr.recorded_at),
+        ROUND(AVG(wr.temperature)::DECIMAL, 2),
+        MIN(wr.temp_min),
+        MAX(wr.temp_max),
+        ROUND(AVG(wr.humidity)::DECIMAL, 2),
+        ROUND(AVG(wr.pressure)::DECIMAL, 2),
+        ROUND(AVG(wr.wind_speed)::DECIMAL, 2),
+        MAX(wr.wind_speed),
+        ROUND(AVG(wr.cloudiness)::DECIMAL, 2),
+        MODE() WITHIN GROUP (ORDER BY COALESCE(wc.main, 'Unknown')),
+        COUNT(*)
+    FROM weather_records wr
+    LEFT JOIN weather_conditions wc ON wc.id = wr.condition_id
+    WHERE wr.recorded_at >= watermark
+        AND wr.recorded_at < date_trunc('hour', p_older_than)
+    GROUP BY wr.city_id, date_trunc('hour', wr.recorded_at)
+    ON CONFLICT (city_id, hour) DO UPDATE SET
+        avg_temperature = EXCLUDED.avg_temperature,
+        min_temperature = EXCLUDED.min_temperature,
+        max_temperature = EXCLUDED.max_temperature,
+        avg_humidity = EXCLUDED.avg_humidity,
+        avg_pressure = EXCLUDED.avg_pressure,
+        avg_wind_speed = EXCLUDED.avg_wind_speed,
+        max_wind_speed = EXCLUDED.max_wind_speed,
+        avg_cloudiness = EXCLUDED.avg_cloudiness,
+        weather_main = EXCLUDED.weather_main,
+        sample_count = EXCLUDED.sample_count;
+    GET DIAGNOSTICS upserted_count = ROW_COUNT;
+    RETURN upserted_count;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION notify_weather_record()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM pg_notify('weather_records', row_to_json(e)::text)
+    FROM (
+        SELECT
+            NEW.id,
+            NEW.city_id,
+            c.name AS city_name,
+            c.country,
+            c.latitude,
+            c.longitude,
+            NEW.temperature,
+            NEW.feels_like,
+            NEW.temp_min,
+            NEW.temp_max,
+            NEW.pressure,
+            NEW.humidity,
+            NEW.wind_speed,
+            NEW.wind_direction,
+            NEW.cloudiness,
+            NEW.visibility,
+            COALESCE(wc.main, 'Unknown') AS weather_main,
+            COALESCE(wc.description, 'unknown') AS weather_description,
+            COALESCE(wc.icon, '50') || CASE WHEN NEW.is_day THEN 'd' ELSE 'n' END AS weather_icon,
+            NEW.recorded_at,
+            NEW.created_at,
+            NEW.condition_id
+        FROM cities c
+        LEFT JOIN weather_conditions wc ON wc.id = NEW.condition_id
+        WHERE c.city_id = NEW.city_id
+    ) e;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER weather_records_notify
+    AFTER INSERT ON weather_records
+    FOR EACH ROW
+    EXECUTE FUNCTION notify_weather_record();
+
+ALTER TABLE weather_records ENABLE ROW LEVEL SECURITY;
+ALTER TABLE weather_conditions ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Weather records are viewable by everyone"
+    ON weather_records FOR SELECT
+    USING (true);
+
+CREATE POLICY "Weather conditions are viewable by everyone"
+    ON weather_conditions FOR SELECT
+    USING (true);
+
+CREATE OR REPLACE VIEW weather_records_expanded AS
+SELECT
+    wr.id,
+    wr.city_id,
+    c.name AS city_name,
+    c.country,
+    c.latitude,
+    c.longitude,
+    wr.temperature,
+    wr.feels_like,
+    wr.temp_min,
+    wr.temp_max,
+    wr.pressure,
+    wr.humidity,
+    wr.wind_speed,
+    wr.wind_direction,
+    wr.cloudiness,
+    wr.visibility,
+    COALESCE(wc.main, 'Unknown') AS weather_main,
+    COALESCE(wc.description, 'unknown') AS weather_description,
+    COALESCE(wc.icon, '50') || CASE WHEN wr.is_day THEN 'd' ELSE 'n' END AS weather_icon,
+    wr.recorded_at,
+    wr.created_at,
+    wr.condition_id
+FROM weather_records wr
+JOIN cities c ON c.city_id = wr.city_id
+LEFT JOIN weather_conditions wc ON wc.id = wr.condition_id;
+
+CREATE OR REPLACE VIEW latest_weather AS
+SELECT DISTINCT ON (city_id) *
+FROM weather_records_expanded
+ORDER BY city_id, recorded_at DESC;
+
+CREATE OR REPLACE FUNCTION get_weather_analytics(
+    p_city_id INTEGER,
+    p_start_date TIMESTAMP WITH TIME ZONE DEFAULT NOW() - INTERVAL '7 days',
+    p_end_date TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+)
+RETURNS TABLE (
+    city_name VARCHAR,
+    country VARCHAR,
+    period_start TIMESTAMP WITH TIME ZONE,
+    period_end TIMESTAMP WITH TIME ZONE,
+    avg_temperature DECIMAL,
+    max_temperature DECIMAL,
+    min_temperature DECIMAL,
+    avg_humidity DECIMAL,
+    avg_wind_speed DECIMAL,
+    most_common_condition VARCHAR,
+    total_records BIGINT
+) AS $$
+BEGIN
+    RETURN QUERY
+    WITH per_condition AS (
+        SELECT
+            wr.condition_id,
+            COUNT(*) AS n,
+            SUM(wr.temperature) AS sum_temperature,
+            MAX(wr.temp_max) AS max_temperature,
+            MIN(wr.temp_min) AS min_temperature,
+            SUM(wr.humidity) AS sum_humidity,
+            SUM(wr.wind_speed) AS sum_wind_speed
+        FROM weather_records wr
+        WHERE wr.city_id = p_city_id
+            AND wr.recorded_at BETWEEN p_start_date AND p_end_date
+        GROUP BY wr.condition_id
+    )
+    SELECT
+        c.name,
+        c.country,
+        p_start_date,
+        p_end_date,
+        ROUND(SUM(pc.sum_temperature) / SUM(pc.n), 2),
+        MAX(pc.max_temperature),
+        MIN(pc.min_temperature),
+        ROUND(SUM(pc.sum_humidity)::DECIMAL / SUM(pc.n), 2),
+        ROUND(SUM(pc.sum_wind_speed) / SUM(pc.n), 2),
+        (
+            -- Same result as MODE() over the condition text: ties go to
+            -- the first in sort order
+            SELECT COALESCE(wc.main, 'Unknown')::VARCHAR AS main
+            FROM per_condition mc
+            LEFT JOIN weather_conditions wc ON wc.id = mc.condition_id
+            GROUP BY 1
+            ORDER BY SUM(mc.n) DESC, 1
+            LIMIT 1
+        ),
+        SUM(pc.n)::BIGINT
+    FROM per_condition pc
+    JOIN cities c ON c.city_id = p_city_id
+    GROUP BY c.name, c.country;
+END;
+$$ LANGUAGE plpgsql;
+
+COMMIT;
@@ -0,0 +1,64 @@
+-- Lock down the internal tables added since the schema was first applied:
+-- collector_workers and city_leases (sharding), city_demand (adaptive
+-- collection), upstream_quota (shared upstream budget) and collection_runs
+-- (collector run statistics). Without RLS anyone holding the public anon key
+-- could read or rewrite them through PostgREST.
+--
+-- Safe to run more than once. Apply after the functions in supabase-schema.sql
+-- exist; collection_runs is created here if it is missing.
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS collection_runs (
+    run_id UUID PRIMARY KEY,
+    worker_id TEXT NOT NULL,
+    started_at TIMESTAMP WITH TIME ZONE NOT NULL,
+    finished_at TIMESTAMP WITH TIME ZONE NOT NULL,
+    duration_seconds NUMERIC NOT NULL,
+    load_mode VARCHAR(20) NOT NULL,
+    cities_attempted INTEGER NOT NULL,
+    cities_succeeded INTEGER NOT NULL,
+    cities_unchanged INTEGER NOT NULL DEFAULT 0,
+    cities_failed INTEGER NOT NULL DEFAULT 0,
+    retries INTEGER NOT NULL DEFAULT 0,
+    fetch_p50_ms NUMERIC,
+    fetch_p95_ms NUMERIC,
+    fetch_p99_ms NUMERIC,
+    load_p50_ms NUMERIC,
+    load_p95_ms NUMERIC,
+    load_p99_ms NUMERIC,
+    cities_per_second NUMERIC,
+    stages JSONB NOT NULL DEFAULT '[]'::jsonb
+);
+
+-- Collector, demand, quota and run-log bookkeeping is private. RLS with no
+-- policies hides these tables from the anon and authenticated roles (the
+-- frontend ships the anon key); the API service and data pipeline use the
+-- service role, which bypasses RLS, and are the only callers of their functions.
+ALTER TABLE collector_workers ENABLE ROW LEVEL SECURITY;
+ALTER TABLE city_leases ENABLE ROW LEVEL SECURITY;
+ALTER TABLE city_demand ENABLE ROW LEVEL SECURITY;
+ALTER TABLE upstream_quota ENABLE ROW LEVEL SECURITY;
+ALTER TABLE collection_runs ENABLE ROW LEVEL SECURITY;
+
+REVOKE EXECUTE ON FUNCTION
+    collector_heartbeat(TEXT, INTEGER),
+    claim_city_leases(TEXT, INTEGER[], INTEGER, INTEGER),
+    release_collector(TEXT),
+    record_city_demand(JSONB),
+    get_city_demand(INTEGER),
+    take_upstream_tokens(VARCHAR, INTEGER, VARCHAR),
+    get_upstream_quota(VARCHAR)
+FROM PUBLIC, anon, authenticated;
+
+GRANT EXECUTE ON FUNCTION
+    collector_heartbeat(TEXT, INTEGER),
+    claim_city_leases(TEXT, INTEGER[], INTEGER, INTEGER),
+    release_collector(TEXT),
+    record_city_demand(JSONB),
+    get_city_demand(INTEGER),
+    take_upstream_tokens(VARCHAR, INTEGER, VARCHAR),
+    get_upstream_quota(VARCHAR)
+TO service_role;
+
+COMMIT;
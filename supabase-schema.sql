@@ -20,14 +20,82 @@ CREATE TABLE IF NOT EXISTS cities (
 CREATE INDEX IF NOT EXISTS idx_cities_city_id ON cities(city_id);
 CREATE INDEX IF NOT EXISTS idx_cities_name ON cities(name);
 
--- Weather records table
+-- OpenWeatherMap weather condition codes; weather_records stores only the
+-- code. Kept in sync with weather-common/weather_common/conditions.py.
+CREATE TABLE IF NOT EXISTS weather_conditions (
+    id SMALLINT PRIMARY KEY,
+    main VARCHAR(50) NOT NULL,
+    description VARCHAR(255) NOT NULL,
+    icon VARCHAR(3) NOT NULL,
+    CONSTRAINT unique_weather_condition UNIQUE (main, description)
+);
+
+INSERT INTO weather_conditions (id, main, description, icon)
+VALUES
+    (200, 'Thunderstorm', 'thunderstorm with light rain', '11'),
+    (201, 'Thunderstorm', 'thunderstorm with rain', '11'),
+    (202, 'Thunderstorm', 'thunderstorm with heavy rain', '11'),
+    (210, 'Thunderstorm', 'light thunderstorm', '11'),
+    (211, 'Thunderstorm', 'thunderstorm', '11'),
+    (212, 'Thunderstorm', 'heavy thunderstorm', '11'),
+    (221, 'Thunderstorm', 'ragged thunderstorm', '11'),
+    (230, 'Thunderstorm', 'thunderstorm with light drizzle', '11'),
+    (231, 'Thunderstorm', 'thunderstorm with drizzle', '11'),
+    (232, 'Thunderstorm', 'thunderstorm with heavy drizzle', '11'),
+    (300, 'Drizzle', 'light intensity drizzle', '09'),
+    (301, 'Drizzle', 'drizzle', '09'),
+    (302, 'Drizzle', 'heavy intensity drizzle', '09'),
+    (310, 'Drizzle', 'light intensity drizzle rain', '09'),
+    (311, 'Drizzle', 'drizzle rain', '09'),
+    (312, 'Drizzle', 'heavy intensity drizzle rain', '09'),
+    (313, 'Drizzle', 'shower rain and drizzle', '09'),
+    (314, 'Drizzle', 'heavy shower rain and drizzle', '09'),
+    (321, 'Drizzle', 'shower drizzle', '09'),
+    (500, 'Rain', 'light rain', '10'),
+    (501, 'Rain', 'moderate rain', '10'),
+    (502, 'Rain', 'heavy intensity rain', '10'),
+    (503, 'Rain', 'very heavy rain', '10'),
+    (504, 'Rain', 'extreme rain', '10'),
+    (511, 'Rain', 'freezing rain', '13'),
+    (520, 'Rain', 'light intensity shower rain', '09'),
+    (521, 'Rain', 'shower rain', '09'),
+    (522, 'Rain', 'heavy intensity shower rain', '09'),
+    (531, 'Rain', 'ragged shower rain', '09'),
+    (600, 'Snow', 'light snow', '13'),
+    (601, 'Snow', 'snow', '13'),
+    (602, 'Snow', 'heavy snow', '13'),
+    (611, 'Snow', 'sleet', '13'),
+    (612, 'Snow', 'light shower sleet', '13'),
+    (613, 'Snow', 'shower sleet', '13'),
+    (615, 'Snow', 'light rain and snow', '13'),
+    (616, 'Snow', 'rain and snow', '13'),
+    (620, 'Snow', 'light shower snow', '13'),
+    (621, 'Snow', 'shower snow', '13'),
+    (622, 'Snow', 'heavy shower snow', '13'),
+    (701, 'Mist', 'mist', '50'),
+    (711, 'Smoke', 'smoke', '50'),
+    (721, 'Haze', 'haze', '50'),
+    (731, 'Dust', 'sand/dust whirls', '50'),
+    (741, 'Fog', 'fog', '50'),
+    (751, 'Sand', 'sand', '50'),
+    (761, 'Dust', 'dust', '50'),
+    (762, 'Ash', 'volcanic ash', '50'),
+    (771, 'Squall', 'squalls', '50'),
+    (781, 'Tornado', 'tornado', '50'),
+    (800, 'Clear', 'clear sky', '01'),
+    (801, 'Clouds', 'few clouds', '02'),
+    (802, 'Clouds', 'scattered clouds', '03'),
+    (803, 'Clouds', 'broken clouds', '04'),
+    (804, 'Clouds', 'overcast clouds', '04')
+ON CONFLICT (id) DO NOTHING;
+
+-- Weather records table, range partitioned by month on recorded_at.
+-- The primary key must include the partition key. City details come from
+-- cities and condition text from weather_conditions (see
+-- weather_records_expanded below), keeping rows narrow.
 CREATE TABLE IF NOT EXISTS weather_records (
-    id BIGSERIAL PRIMARY KEY,
+    id BIGSERIAL,
     city_id INTEGER NOT NULL REFERENCES cities(city_id) ON DELETE CASCADE,
-    city_name VARCHAR(255) NOT NULL,
-    country VARCHAR(10) NOT NULL,
-    latitude DECIMAL(10, 7) NOT NULL,
-    longitude DECIMAL(10, 7) NOT NULL,
     temperature DECIMAL(5, 2) NOT NULL,
     feels_like DECIMAL(5, 2) NOT NULL,
     temp_min DECIMAL(5, 2) NOT NULL,
@@ -38,18 +106,481 @@ CREATE TABLE IF NOT EXISTS weather_records (
     wind_direction INTEGER NOT NULL,
     cloudiness INTEGER NOT NULL,
     visibility INTEGER NOT NULL,
-    weather_main VARCHAR(50) NOT NULL,
-    weather_description VARCHAR(255) NOT NULL,
-    weather_icon VARCHAR(10) NOT NULL,
+    -- weather_conditions.id; not a foreign key, so a code missing from the
+    -- lookup table reads as 'Unknown' instead of rejecting the insert
+    condition_id SMALLINT NOT NULL,
+    -- Selects the day ("d") or night ("n") variant of the condition icon
+    is_day BOOLEAN NOT NULL,
     recorded_at TIMESTAMP WITH TIME ZONE NOT NULL,
-    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
-);
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id, recorded_at)
+) PARTITION BY RANGE (recorded_at);
+
+-- Catch-all for rows outside the monthly partitions created below
+CREATE TABLE IF NOT EXISTS weather_records_default
+    PARTITION OF weather_records DEFAULT;
+
+-- Create the monthly partitions covering p_from through p_months_ahead
+-- months after the current month. Safe to call repeatedly.
+CREATE OR REPLACE FUNCTION ensure_weather_partitions(
+    p_months_ahead INTEGER DEFAULT 3,
+    p_from TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+)
+RETURNS INTEGER AS $$
+DECLARE
+    month_start DATE := date_trunc('month', p_from)::DATE;
+    last_month DATE := (date_trunc('month', NOW()) + make_interval(months => p_months_ahead))::DATE;
+    partition_name TEXT;
+    created_count INTEGER := 0;
+BEGIN
+    WHILE month_start <= last_month LOOP
+        partition_name := 'weather_records_p' || to_char(month_start, 'YYYY_MM');
+        IF to_regclass(partition_name) IS NULL THEN
+            EXECUTE format(
+                'CREATE TABLE %I PARTITION OF weather_records FOR VALUES FROM (%L) TO (%L)',
+                partition_name,
+                month_start,
+                (month_start + INTERVAL '1 month')::DATE
+            );
+            created_count := created_count + 1;
+        END IF;
+        month_start := (month_start + INTERVAL '1 month')::DATE;
+    END LOOP;
+    RETURN created_count;
+END;
+$$ LANGUAGE plpgsql;
+
+SELECT ensure_weather_partitions();
 
 -- Create indexes for weather_records
 CREATE INDEX IF NOT EXISTS idx_weather_records_city_id ON weather_records(city_id);
 CREATE INDEX IF NOT EXISTS idx_weather_records_recorded_at ON weather_records(recorded_at DESC);
 CREATE INDEX IF NOT EXISTS idx_weather_records_city_recorded ON weather_records(city_id, recorded_at DESC);
 
+-- Remove duplicate observations (same city and recorded_at), keeping the
+-- first stored row. Pass a city id to compact one city per transaction.
+CREATE OR REPLACE FUNCTION compact_weather_records(
+    p_city_id INTEGER DEFAULT NULL
+)
+RETURNS BIGINT AS $$
+DECLARE
+    deleted_count BIGINT;
+BEGIN
+    DELETE FROM weather_records wr
+    USING weather_records keep
+    WHERE wr.city_id = keep.city_id
+        AND wr.recorded_at = keep.recorded_at
+        AND wr.id > keep.id
+        AND (p_city_id IS NULL OR wr.city_id = p_city_id);
+    GET DIAGNOSTICS deleted_count = ROW_COUNT;
+    RETURN deleted_count;
+END;
+$$ LANGUAGE plpgsql;
+
+-- One row per observation: ingestion upserts with ON CONFLICT DO NOTHING
+DO $$
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1 FROM pg_constraint WHERE conname = 'unique_weather_observation'
+    ) THEN
+        PERFORM compact_weather_records();
+        ALTER TABLE weather_records
+            ADD CONSTRAINT unique_weather_observation UNIQUE (city_id, recorded_at);
+    END IF;
+END;
+$$;
+
+-- Periods longer than p_min_gap_minutes with no records for a city,
+-- including before the first and after the last record in the range.
+-- Walks idx_weather_records_city_recorded; used by the backfill CLI.
+CREATE OR REPLACE FUNCTION find_weather_gaps(
+    p_city_id INTEGER,
+    p_start TIMESTAMP WITH TIME ZONE,
+    p_end TIMESTAMP WITH TIME ZONE,
+    p_min_gap_minutes INTEGER DEFAULT 120
+)
+RETURNS TABLE (
+    gap_start TIMESTAMP WITH TIME ZONE,
+    gap_end TIMESTAMP WITH TIME ZONE
+) AS $$
+BEGIN
+    RETURN QUERY
+    SELECT g.previous_at, g.recorded_at
+    FROM (
+        SELECT
+            t.recorded_at,
+            LAG(t.recorded_at) OVER (ORDER BY t.recorded_at) AS previous_at
+        FROM (
+            SELECT wr.recorded_at
+            FROM weather_records wr
+            WHERE wr.city_id = p_city_id
+                AND wr.recorded_at BETWEEN p_start AND p_end
+            UNION ALL SELECT p_start
+            UNION ALL SELECT p_end
+        ) t
+    ) g
+    WHERE g.recorded_at - g.previous_at > make_interval(mins => p_min_gap_minutes)
+    ORDER BY g.previous_at;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Hourly aggregates of weather_records kept after raw rows are retired
+CREATE TABLE IF NOT EXISTS weather_records_hourly (
+    city_id INTEGER NOT NULL REFERENCES cities(city_id) ON DELETE CASCADE,
+    hour TIMESTAMP WITH TIME ZONE NOT NULL,
+    avg_temperature DECIMAL(5, 2) NOT NULL,
+    min_temperature DECIMAL(5, 2) NOT NULL,
+    max_temperature DECIMAL(5, 2) NOT NULL,
+    avg_humidity DECIMAL(5, 2) NOT NULL,
+    avg_pressure DECIMAL(7, 2) NOT NULL,
+    avg_wind_speed DECIMAL(5, 2) NOT NULL,
+    max_wind_speed DECIMAL(5, 2) NOT NULL,
+    avg_cloudiness DECIMAL(5, 2) NOT NULL,
+    weather_main VARCHAR(50) NOT NULL,
+    sample_count INTEGER NOT NULL,
+    PRIMARY KEY (city_id, hour)
+);
+
+-- Recompute the hourly aggregates of every raw row recorded in
+-- [p_from, p_to). Each hour is rebuilt from all of its raw rows, so rows
+-- that arrived late or were backfilled are folded in.
+CREATE OR REPLACE FUNCTION aggregate_weather_hours(
+    p_from TIMESTAMP WITH TIME ZONE,
+    p_to TIMESTAMP WITH TIME ZONE
+)
+RETURNS BIGINT AS $$
+DECLARE
+    upserted_count BIGINT;
+BEGIN
+    INSERT INTO weather_records_hourly AS h (
+        city_id, hour, avg_temperature, min_temperature, max_temperature,
+        avg_humidity, avg_pressure, avg_wind_speed, max_wind_speed,
+        avg_cloudiness, weather_main, sample_count
+    )
+    SELECT
+        wr.city_id,
+        date_trunc('hour', wr.recorded_at),
+        ROUND(AVG(wr.temperature)::DECIMAL, 2),
+        MIN(wr.temp_min),
+        MAX(wr.temp_max),
+        ROUND(AVG(wr.humidity)::DECIMAL, 2),
+        ROUND(AVG(wr.pressure)::DECIMAL, 2),
+        ROUND(AVG(wr.wind_speed)::DECIMAL, 2),
+        MAX(wr.wind_speed),
+        ROUND(AVG(wr.cloudiness)::DECIMAL, 2),
+        MODE() WITHIN GROUP (ORDER BY COALESCE(wc.main, 'Unknown')),
+        COUNT(*)
+    FROM weather_records wr
+    LEFT JOIN weather_conditions wc ON wc.id = wr.condition_id
+    WHERE wr.recorded_at >= p_from
+        AND wr.recorded_at < p_to
+    GROUP BY wr.city_id, date_trunc('hour', wr.recorded_at)
+    ON CONFLICT (city_id, hour) DO UPDATE SET
+        avg_temperature = EXCLUDED.avg_temperature,
+        min_temperature = EXCLUDED.min_temperature,
+        max_temperature = EXCLUDED.max_temperature,
+        avg_humidity = EXCLUDED.avg_humidity,
+        avg_pressure = EXCLUDED.avg_pressure,
+        avg_wind_speed = EXCLUDED.avg_wind_speed,
+        max_wind_speed = EXCLUDED.max_wind_speed,
+        avg_cloudiness = EXCLUDED.avg_cloudiness,
+        weather_main = EXCLUDED.weather_main,
+        sample_count = EXCLUDED.sample_count;
+    GET DIAGNOSTICS upserted_count = ROW_COUNT;
+    RETURN upserted_count;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Roll raw rows older than p_older_than up into hourly aggregates.
+-- Only hours after the newest existing aggregate are scanned (the last one
+-- is recomputed in case it was partial), so repeated runs stay cheap.
+-- Rows that arrive behind that watermark are picked up when their
+-- partition is dropped, see drop_weather_partitions.
+CREATE OR REPLACE FUNCTION downsample_weather_records(
+    p_older_than TIMESTAMP WITH TIME ZONE
+)
+RETURNS BIGINT AS $$
+DECLARE
+    watermark TIMESTAMP WITH TIME ZONE;
+BEGIN
+    SELECT COALESCE(MAX(hour), '-infinity'::TIMESTAMP WITH TIME ZONE)
+        INTO watermark
+        FROM weather_records_hourly;
+
+    RETURN aggregate_weather_hours(watermark, date_trunc('hour', p_older_than));
+END;
+$$ LANGUAGE plpgsql;
+
+-- Drop monthly partitions whose whole range is older than p_older_than.
+-- Every hour of a partition is re-aggregated just before it is dropped, so
+-- late and backfilled rows survive as hourly data even if they were behind
+-- the downsampling watermark. Expired rows in the default partition (months
+-- that never had a partition of their own) are aggregated and deleted too.
+CREATE OR REPLACE FUNCTION drop_weather_partitions(
+    p_older_than TIMESTAMP WITH TIME ZONE
+)
+RETURNS SETOF TEXT AS $$
+DECLARE
+    partition_name TEXT;
+    month_start DATE;
+    expired_before TIMESTAMP WITH TIME ZONE := date_trunc('month', p_older_than);
+BEGIN
+    FOR partition_name, month_start IN
+        SELECT child.relname, to_date(substring(child.relname FROM 18), 'YYYY_MM')
+        FROM pg_inherits
+        JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+        JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+        WHERE parent.relname = 'weather_records'
+            AND child.relname ~ '^weather_records_p[0-9]{4}_[0-9]{2}$'
+            AND to_date(substring(child.relname FROM 18), 'YYYY_MM') + INTERVAL '1 month' <= p_older_than
+        ORDER BY child.relname
+    LOOP
+        PERFORM aggregate_weather_hours(month_start, month_start + INTERVAL '1 month');
+        EXECUTE format('DROP TABLE %I', partition_name);
+        RETURN NEXT partition_name;
+    END LOOP;
+
+    -- Every monthly partition before expired_before is gone now, so what is
+    -- left in that range lives in weather_records_default
+    IF EXISTS (SELECT 1 FROM weather_records WHERE recorded_at < expired_before) THEN
+        PERFORM aggregate_weather_hours('-infinity', expired_before);
+        DELETE FROM weather_records WHERE recorded_at < expired_before;
+    END IF;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Collector processes currently alive (see data-pipeline/etl/sharding.py)
+CREATE TABLE IF NOT EXISTS collector_workers (
+    worker_id TEXT PRIMARY KEY,
+    started_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    heartbeat_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Which collector worker currently collects each city
+CREATE TABLE IF NOT EXISTS city_leases (
+    city_id INTEGER PRIMARY KEY,
+    worker_id TEXT NOT NULL,
+    expires_at TIMESTAMP WITH TIME ZONE NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_city_leases_worker_id ON city_leases(worker_id);
+
+-- Refresh a worker's heartbeat and return every live worker id
+CREATE OR REPLACE FUNCTION collector_heartbeat(
+    p_worker_id TEXT,
+    p_worker_ttl_seconds INTEGER
+)
+RETURNS SETOF TEXT AS $$
+BEGIN
+    INSERT INTO collector_workers (worker_id, heartbeat_at)
+    VALUES (p_worker_id, NOW())
+    ON CONFLICT (worker_id) DO UPDATE SET heartbeat_at = NOW();
+
+    DELETE FROM collector_workers
+    WHERE heartbeat_at < NOW() - make_interval(secs => p_worker_ttl_seconds * 10);
+
+    RETURN QUERY
+    SELECT w.worker_id
+    FROM collector_workers w
+    WHERE w.heartbeat_at > NOW() - make_interval(secs => p_worker_ttl_seconds)
+    ORDER BY w.worker_id;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Lease the given cities to a worker and release any others it holds.
+-- A city is granted when unleased, already held by the worker, expired, or
+-- held by a worker whose heartbeat is stale. Returns the granted city ids.
+CREATE OR REPLACE FUNCTION claim_city_leases(
+    p_worker_id TEXT,
+    p_city_ids INTEGER[],
+    p_ttl_seconds INTEGER,
+    p_worker_ttl_seconds INTEGER
+)
+RETURNS SETOF INTEGER AS $$
+BEGIN
+    DELETE FROM city_leases
+    WHERE worker_id = p_worker_id
+        AND NOT (city_id = ANY(p_city_ids));
+
+    RETURN QUERY
+    INSERT INTO city_leases AS l (city_id, worker_id, expires_at)
+    SELECT unnest(p_city_ids), p_worker_id, NOW() + make_interval(secs => p_ttl_seconds)
+    ON CONFLICT (city_id) DO UPDATE SET
+        worker_id = EXCLUDED.worker_id,
+        expires_at = EXCLUDED.expires_at
+    WHERE l.worker_id = p_worker_id
+        OR l.expires_at < NOW()
+        OR NOT EXISTS (
+            SELECT 1 FROM collector_workers w
+            WHERE w.worker_id = l.worker_id
+                AND w.heartbeat_at > NOW() - make_interval(secs => p_worker_ttl_seconds)
+        )
+    RETURNING l.city_id;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Remove a stopping worker and free its leases
+CREATE OR REPLACE FUNCTION release_collector(p_worker_id TEXT)
+RETURNS VOID AS $$
+BEGIN
+    DELETE FROM city_leases WHERE worker_id = p_worker_id;
+    DELETE FROM collector_workers WHERE worker_id = p_worker_id;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Requests served per city per hour by the API service, used by the data
+-- pipeline to collect popular cities more often
+CREATE TABLE IF NOT EXISTS city_demand (
+    city_id INTEGER NOT NULL,
+    hour TIMESTAMP WITH TIME ZONE NOT NULL,
+    served_count BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (city_id, hour)
+);
+
+-- Add a batch of {"city_id": count} to the current hour's buckets
+CREATE OR REPLACE FUNCTION record_city_demand(p_counts JSONB)
+RETURNS VOID AS $$
+BEGIN
+    INSERT INTO city_demand AS d (city_id, hour, served_count)
+    SELECT key::INTEGER, date_trunc('hour', NOW()), value::BIGINT
+    FROM jsonb_each_text(p_counts)
+    ON CONFLICT (city_id, hour) DO UPDATE
+        SET served_count = d.served_count + EXCLUDED.served_count;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Requests served per city over the last p_hours hours
+CREATE OR REPLACE FUNCTION get_city_demand(p_hours INTEGER DEFAULT 24)
+RETURNS TABLE (city_id INTEGER, served_count BIGINT) AS $$
+BEGIN
+    DELETE FROM city_demand WHERE hour < NOW() - INTERVAL '7 days';
+
+    RETURN QUERY
+    SELECT d.city_id, SUM(d.served_count)::BIGINT
+    FROM city_demand d
+    WHERE d.hour >= date_trunc('hour', NOW()) - make_interval(hours => p_hours)
+    GROUP BY d.city_id;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Shared OpenWeatherMap request budget (token bucket) used by both the API
+-- service and the data pipeline; see weather-common/weather_common/quota.py.
+-- Background callers cannot take the last interactive_reserve tokens.
+CREATE TABLE IF NOT EXISTS upstream_quota (
+    bucket VARCHAR(50) PRIMARY KEY,
+    capacity NUMERIC NOT NULL,
+    refill_per_second NUMERIC NOT NULL,
+    interactive_reserve NUMERIC NOT NULL DEFAULT 0,
+    tokens NUMERIC NOT NULL,
+    updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+    granted_interactive BIGINT NOT NULL DEFAULT 0,
+    granted_background BIGINT NOT NULL DEFAULT 0,
+    denied_interactive BIGINT NOT NULL DEFAULT 0,
+    denied_background BIGINT NOT NULL DEFAULT 0
+);
+
+-- Free OpenWeatherMap tier: 60 calls per minute
+INSERT INTO upstream_quota (bucket, capacity, refill_per_second, interactive_reserve, tokens)
+VALUES ('openweathermap', 60, 1, 15, 60)
+ON CONFLICT (bucket) DO NOTHING;
+
+-- Refill the bucket for the time elapsed, then take p_tokens if enough
+-- remain above the priority's floor. Returns
+-- {"granted": bool, "tokens": remaining, "retry_after": seconds}.
+CREATE OR REPLACE FUNCTION take_upstream_tokens(
+    p_bucket VARCHAR,
+    p_tokens INTEGER DEFAULT 1,
+    p_priority VARCHAR DEFAULT 'background'
+)
+RETURNS JSONB AS $$
+DECLARE
+    q upstream_quota%ROWTYPE;
+    available NUMERIC;
+    floor_tokens NUMERIC;
+    granted BOOLEAN;
+BEGIN
+    SELECT * INTO q FROM upstream_quota WHERE bucket = p_bucket FOR UPDATE;
+    IF NOT FOUND THEN
+        RETURN NULL;
+    END IF;
+
+    available := LEAST(
+        q.capacity,
+        q.tokens + EXTRACT(EPOCH FROM NOW() - q.updated_at) * q.refill_per_second
+    );
+    floor_tokens := CASE WHEN p_priority = 'interactive' THEN 0 ELSE q.interactive_reserve END;
+    granted := available - p_tokens >= floor_tokens;
+
+    UPDATE upstream_quota SET
+        tokens = CASE WHEN granted THEN available - p_tokens ELSE available END,
+        updated_at = NOW(),
+        granted_interactive = granted_interactive + (granted AND p_priority = 'interactive')::INTEGER,
+        granted_background = granted_background + (granted AND p_priority <> 'interactive')::INTEGER,
+        denied_interactive = denied_interactive + (NOT granted AND p_priority = 'interactive')::INTEGER,
+        denied_background = denied_background + (NOT granted AND p_priority <> 'interactive')::INTEGER
+    WHERE bucket = p_bucket;
+
+    RETURN jsonb_build_object(
+        'granted', granted,
+        'tokens', CASE WHEN granted THEN available - p_tokens ELSE available END,
+        'retry_after', CASE
+            WHEN granted THEN 0
+            ELSE COALESCE((floor_tokens + p_tokens - available) / NULLIF(q.refill_per_second, 0), 60)
+        END
+    );
+END;
+$$ LANGUAGE plpgsql;
+
+-- Current state of a quota bucket, with tokens refilled to now
+CREATE OR REPLACE FUNCTION get_upstream_quota(p_bucket VARCHAR DEFAULT 'openweathermap')
+RETURNS JSONB AS $$
+    SELECT jsonb_build_object(
+        'bucket', bucket,
+        'capacity', capacity,
+        'refill_per_second', refill_per_second,
+        'interactive_reserve', interactive_reserve,
+        'tokens', LEAST(
+            capacity,
+            tokens + EXTRACT(EPOCH FROM NOW() - updated_at) * refill_per_second
+        ),
+        'granted_interactive', granted_interactive,
+        'granted_background', granted_background,
+        'denied_interactive', denied_interactive,
+        'denied_background', denied_background
+    )
+    FROM upstream_quota
+    WHERE bucket = p_bucket;
+$$ LANGUAGE sql STABLE;
+
+-- One row per collector run (see data-pipeline/etl/run_telemetry.py).
+-- Latencies are per city in milliseconds; stages holds the full
+-- extract/transform/load counters. With load_mode 'spool',
+-- cities_succeeded counts records appended to the collector's spool, not
+-- rows already in weather_records. Pruned by the retention job.
+CREATE TABLE IF NOT EXISTS collection_runs (
+    run_id UUID PRIMARY KEY,
+    worker_id TEXT NOT NULL,
+    started_at TIMESTAMP WITH TIME ZONE NOT NULL,
+    finished_at TIMESTAMP WITH TIME ZONE NOT NULL,
+    duration_seconds NUMERIC NOT NULL,
+    load_mode VARCHAR(20) NOT NULL,
+    cities_attempted INTEGER NOT NULL,
+    cities_succeeded INTEGER NOT NULL,
+    cities_unchanged INTEGER NOT NULL DEFAULT 0,
+    cities_failed INTEGER NOT NULL DEFAULT 0,
+    retries INTEGER NOT NULL DEFAULT 0,
+    fetch_p50_ms NUMERIC,
+    fetch_p95_ms NUMERIC,
+    fetch_p99_ms NUMERIC,
+    load_p50_ms NUMERIC,
+    load_p95_ms NUMERIC,
+    load_p99_ms NUMERIC,
+    cities_per_second NUMERIC,
+    stages JSONB NOT NULL DEFAULT '[]'::jsonb
+);
+
+CREATE INDEX IF NOT EXISTS idx_collection_runs_started_at ON collection_runs(started_at DESC);
+
 -- User preferences table (for authenticated users)
 CREATE TABLE IF NOT EXISTS user_preferences (
     id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
@@ -107,6 +638,8 @@ CREATE POLICY "Users can delete own preferences"
 -- Make cities and weather_records readable by everyone (public data)
 ALTER TABLE cities ENABLE ROW LEVEL SECURITY;
 ALTER TABLE weather_records ENABLE ROW LEVEL SECURITY;
+ALTER TABLE weather_records_hourly ENABLE ROW LEVEL SECURITY;
+ALTER TABLE weather_conditions ENABLE ROW LEVEL SECURITY;
 
 CREATE POLICY "Cities are viewable by everyone"
     ON cities FOR SELECT
@@ -116,34 +649,83 @@ CREATE POLICY "Weather records are viewable by everyone"
     ON weather_records FOR SELECT
     USING (true);
 
+CREATE POLICY "Hourly weather records are viewable by everyone"
+    ON weather_records_hourly FOR SELECT
+    USING (true);
+
+CREATE POLICY "Weather conditions are viewable by everyone"
+    ON weather_conditions FOR SELECT
+    USING (true);
+
+-- Collector, demand, quota and run-log bookkeeping is private. RLS with no
+-- policies hides these tables from the anon and authenticated roles (the
+-- frontend ships the anon key); the API service and data pipeline use the
+-- service role, which bypasses RLS, and are the only callers of their functions.
+ALTER TABLE collector_workers ENABLE ROW LEVEL SECURITY;
+ALTER TABLE city_leases ENABLE ROW LEVEL SECURITY;
+ALTER TABLE city_demand ENABLE ROW LEVEL SECURITY;
+ALTER TABLE upstream_quota ENABLE ROW LEVEL SECURITY;
+ALTER TABLE collection_runs ENABLE ROW LEVEL SECURITY;
+
+REVOKE EXECUTE ON FUNCTION
+    collector_heartbeat(TEXT, INTEGER),
+    claim_city_leases(TEXT, INTEGER[], INTEGER, INTEGER),
+    release_collector(TEXT),
+    record_city_demand(JSONB),
+    get_city_demand(INTEGER),
+    take_upstream_tokens(VARCHAR, INTEGER, VARCHAR),
+    get_upstream_quota(VARCHAR)
+FROM PUBLIC, anon, authenticated;
+
+GRANT EXECUTE ON FUNCTION
+    collector_heartbeat(TEXT, INTEGER),
+    claim_city_leases(TEXT, INTEGER[], INTEGER, INTEGER),
+    release_collector(TEXT),
+    record_city_demand(JSONB),
+    get_city_demand(INTEGER),
+    take_upstream_tokens(VARCHAR, INTEGER, VARCHAR),
+    get_upstream_quota(VARCHAR)
+TO service_role;
+
+-- weather_records in its original wide layout, with city and condition
+-- details joined in. The API reads observations through this view.
+CREATE OR REPLACE VIEW weather_records_expanded AS
+SELECT
+    wr.id,
+    wr.city_id,
+    c.name AS city_name,
+    c.country,
+    c.latitude,
+    c.longitude,
+    wr.temperature,
+    wr.feels_like,
+    wr.temp_min,
+    wr.temp_max,
+    wr.pressure,
+    wr.humidity,
+    wr.wind_speed,
+    wr.wind_direction,
+    wr.cloudiness,
+    wr.visibility,
+    COALESCE(wc.main, 'Unknown') AS weather_main,
+    COALESCE(wc.description, 'unknown') AS weather_description,
+    COALESCE(wc.icon, '50') || CASE WHEN wr.is_day THEN 'd' ELSE 'n' END AS weather_icon,
+    wr.recorded_at,
+    wr.created_at,
+    wr.condition_id
+FROM weather_records wr
+JOIN cities c ON c.city_id = wr.city_id
+LEFT JOIN weather_conditions wc ON wc.id = wr.condition_id;
+
 -- View for latest weather per city
 CREATE OR REPLACE VIEW latest_weather AS
-SELECT DISTINCT ON (city_id)
-    id,
-    city_id,
-    city_name,
-    country,
-    latitude,
-    longitude,
-    temperature,
-    feels_like,
-    temp_min,
-    temp_max,
-    pressure,
-    humidity,
-    wind_speed,
-    wind_direction,
-    cloudiness,
-    visibility,
-    weather_main,
-    weather_description,
-    weather_icon,
-    recorded_at,
-    created_at
-FROM weather_records
+SELECT DISTINCT ON (city_id) *
+FROM weather_records_expanded
 ORDER BY city_id, recorded_at DESC;
 
--- Function to get weather analytics for a city
+-- Function to get weather analytics for a city. Rows are scanned once and
+-- grouped by their SMALLINT condition id; the most common condition is then
+-- picked from those few groups instead of sorting every row's text.
 CREATE OR REPLACE FUNCTION get_weather_analytics(
     p_city_id INTEGER,
     p_start_date TIMESTAMP WITH TIME ZONE DEFAULT NOW() - INTERVAL '7 days',
@@ -164,25 +746,126 @@ RETURNS TABLE (
 ) AS $$
 BEGIN
     RETURN QUERY
+    WITH per_condition AS (
+        SELECT
+            wr.condition_id,
+            COUNT(*) AS n,
+            SUM(wr.temperature) AS sum_temperature,
+            MAX(wr.temp_max) AS max_temperature,
+            MIN(wr.temp_min) AS min_temperature,
+            SUM(wr.humidity) AS sum_humidity,
+            SUM(wr.wind_speed) AS sum_wind_speed
+        FROM weather_records wr
+        WHERE wr.city_id = p_city_id
+            AND wr.recorded_at BETWEEN p_start_date AND p_end_date
+        GROUP BY wr.condition_id
+    )
     SELECT
-        wr.city_name,
-        wr.country,
+        c.name,
+        c.country,
         p_start_date,
         p_end_date,
-        ROUND(AVG(wr.temperature)::DECIMAL, 2) as avg_temperature,
-        MAX(wr.temp_max) as max_temperature,
-        MIN(wr.temp_min) as min_temperature,
-        ROUND(AVG(wr.humidity)::DECIMAL, 2) as avg_humidity,
-        ROUND(AVG(wr.wind_speed)::DECIMAL, 2) as avg_wind_speed,
-        MODE() WITHIN GROUP (ORDER BY wr.weather_main) as most_common_condition,
-        COUNT(*)::BIGINT as total_records
-    FROM weather_records wr
-    WHERE wr.city_id = p_city_id
-        AND wr.recorded_at BETWEEN p_start_date AND p_end_date
-    GROUP BY wr.city_name, wr.country;
+        ROUND(SUM(pc.sum_temperature) / SUM(pc.n), 2),
+        MAX(pc.max_temperature),
+        MIN(pc.min_temperature),
+        ROUND(SUM(pc.sum_humidity)::DECIMAL / SUM(pc.n), 2),
+        ROUND(SUM(pc.sum_wind_speed) / SUM(pc.n), 2),
+        (
+            -- Same result as MODE() over the condition text: ties go to
+            -- the first in sort order
+            SELECT COALESCE(wc.main, 'Unknown')::VARCHAR AS main
+            FROM per_condition mc
+            LEFT JOIN weather_conditions wc ON wc.id = mc.condition_id
+            GROUP BY 1
+            ORDER BY SUM(mc.n) DESC, 1
+            LIMIT 1
+        ),
+        SUM(pc.n)::BIGINT
+    FROM per_condition pc
+    JOIN cities c ON c.city_id = p_city_id
+    GROUP BY c.name, c.country;
 END;
 $$ LANGUAGE plpgsql;
 
+-- Cache validator for historical and analytics responses, computed over
+-- the same rows the response reads: the newest p_limit records of a city in
+-- the range (all of them when p_limit is NULL). Walks
+-- idx_weather_records_city_recorded, so it touches no more rows than the
+-- query it lets the API skip. A backfilled row inside those rows moves
+-- last_written_at, a removed one moves row_count or oldest_recorded_at.
+DROP FUNCTION IF EXISTS get_weather_history_marker(
+    INTEGER, TIMESTAMP WITH TIME ZONE, TIMESTAMP WITH TIME ZONE
+);
+CREATE OR REPLACE FUNCTION get_weather_history_marker(
+    p_city_id INTEGER,
+    p_start_date TIMESTAMP WITH TIME ZONE DEFAULT NULL,
+    p_end_date TIMESTAMP WITH TIME ZONE DEFAULT NULL,
+    p_limit INTEGER DEFAULT NULL
+)
+RETURNS TABLE (
+    row_count BIGINT,
+    latest_recorded_at TIMESTAMP WITH TIME ZONE,
+    oldest_recorded_at TIMESTAMP WITH TIME ZONE,
+    last_written_at TIMESTAMP WITH TIME ZONE
+) AS $$
+BEGIN
+    RETURN QUERY
+    SELECT COUNT(*), MAX(t.recorded_at), MIN(t.recorded_at), MAX(t.created_at)
+    FROM (
+        SELECT wr.recorded_at, wr.created_at
+        FROM weather_records wr
+        WHERE wr.city_id = p_city_id
+            AND wr.recorded_at >= COALESCE(p_start_date, '-infinity'::TIMESTAMP WITH TIME ZONE)
+            AND wr.recorded_at <= COALESCE(p_end_date, 'infinity'::TIMESTAMP WITH TIME ZONE)
+        ORDER BY wr.recorded_at DESC
+        LIMIT p_limit
+    ) t;
+END;
+$$ LANGUAGE plpgsql STABLE;
+
+-- Notify listeners (API service live updates) of every new weather record,
+-- in the weather_records_expanded layout clients receive
+CREATE OR REPLACE FUNCTION notify_weather_record()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM pg_notify('weather_records', row_to_json(e)::text)
+    FROM (
+        SELECT
+            NEW.id,
+            NEW.city_id,
+            c.name AS city_name,
+            c.country,
+            c.latitude,
+            c.longitude,
+            NEW.temperature,
+            NEW.feels_like,
+            NEW.temp_min,
+            NEW.temp_max,
+            NEW.pressure,
+            NEW.humidity,
+            NEW.wind_speed,
+            NEW.wind_direction,
+            NEW.cloudiness,
+            NEW.visibility,
+            COALESCE(wc.main, 'Unknown') AS weather_main,
+            COALESCE(wc.description, 'unknown') AS weather_description,
+            COALESCE(wc.icon, '50') || CASE WHEN NEW.is_day THEN 'd' ELSE 'n' END AS weather_icon,
+            NEW.recorded_at,
+            NEW.created_at,
+            NEW.condition_id
+        FROM cities c
+        LEFT JOIN weather_conditions wc ON wc.id = NEW.condition_id
+        WHERE c.city_id = NEW.city_id
+    ) e;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER weather_records_notify
+    AFTER INSERT ON weather_records
+    FOR EACH ROW
+    EXECUTE FUNCTION notify_weather_record();
+
 -- Insert some default cities for testing
 INSERT INTO cities (city_id, name, country, latitude, longitude, timezone)
 VALUES
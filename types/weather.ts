@@ -68,7 +68,20 @@ export interface WeatherRecord {
   weather_description: string;
   weather_icon: string;
   recorded_at: string;
-  created_at: string;
+  // Not included in compact historical responses
+  created_at?: string;
+}
+
+// Historical records in the compact columnar format
+// (Accept: application/vnd.weather.compact+json). Fields constant across the
+// response are in `constants`, the rest in `columns`; string fields in
+// `columns` are codes into `dictionaries`. recorded_at is epoch seconds.
+export interface CompactRecords {
+  format: 'compact-v2';
+  count: number;
+  constants: Partial<Record<keyof WeatherRecord, string | number | null>>;
+  dictionaries: Partial<Record<keyof WeatherRecord, string[]>>;
+  columns: Partial<Record<keyof WeatherRecord, (number | null)[]>>;
 }
 
 export interface City {
@@ -126,3 +139,43 @@ export interface ForecastResponse {
     sunset: number;
   };
 }
+
+export interface ForecastSeries {
+  city: ForecastResponse['city'];
+  cnt: number;
+  dt: number[];
+  series: Record<string, (number | string | null)[]>;
+}
+
+export interface OverviewSection<T = unknown> {
+  status: 'ok' | 'empty' | 'error';
+  data: T | null;
+  error: string | null;
+  elapsed_ms: number;
+}
+
+export interface CityOverview {
+  city: City;
+  generated_at: string;
+  sections: {
+    current: OverviewSection<CurrentWeather>;
+    forecast: OverviewSection<ForecastResponse | ForecastSeries>;
+    latest: OverviewSection<WeatherRecord>;
+    analytics_24h: OverviewSection<WeatherAnalytics>;
+    analytics_7d: OverviewSection<WeatherAnalytics>;
+    analytics_30d: OverviewSection<WeatherAnalytics>;
+    insight: OverviewSection<string>;
+  };
+}
+
+export interface NearbyWeatherResponse {
+  lat: number;
+  lon: number;
+  radius_km: number;
+  index_ms: number;
+  cities: {
+    city: City;
+    distance_km: number;
+    weather: WeatherRecord | null;
+  }[];
+}
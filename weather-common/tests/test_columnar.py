@@ -0,0 +1,97 @@
+from datetime import datetime, timezone
+import pytest
+from weather_common.columnar import FIELDS, RecordBatch
+
+
+def make_row(index: int, **overrides) -> dict:
+    row = {
+        "id": 100 + index,
+        "city_id": 2643743,
+        "city_name": "London",
+        "country": "GB",
+        "latitude": 51.5085,
+        "longitude": -0.1257,
+        "temperature": 10.0 + index,
+        "feels_like": 9.0 + index,
+        "temp_min": 8.0,
+        "temp_max": 12.5,
+        "pressure": 1012,
+        "humidity": 80,
+        "wind_speed": 4.1,
+        "wind_direction": 240,
+        "cloudiness": 75,
+        "visibility": 10000,
+        "weather_main": "Clouds" if index % 2 else "Rain",
+        "weather_description": "broken clouds" if index % 2 else "light rain",
+        "weather_icon": "04d" if index % 2 else "10d",
+        "recorded_at": datetime(2026, 1, 1, index, 0, 0, 250000, tzinfo=timezone.utc).isoformat()
+    }
+    row.update(overrides)
+    return row
+
+
+def test_rows_round_trip():
+    rows = [make_row(i) for i in range(5)]
+    batch = RecordBatch.from_rows(rows)
+
+    assert len(batch) == 5
+    assert batch.to_rows() == rows
+    assert batch.column("weather_main") == [row["weather_main"] for row in rows]
+    assert batch.mode("weather_main") == "Rain"
+
+
+def test_unstored_id_is_none():
+    batch = RecordBatch.from_rows([make_row(0, id=None)])
+    assert batch.to_rows()[0]["id"] is None
+
+
+def test_slice_shares_buffers_and_dictionaries():
+    batch = RecordBatch.from_rows([make_row(i) for i in range(6)])
+    part = batch.slice(2, 5)
+
+    assert len(part) == 3
+    assert part.dictionaries is batch.dictionaries
+    assert part.columns["temperature"].obj is batch.columns["temperature"].obj
+    assert [row["id"] for row in part.to_rows()] == [102, 103, 104]
+    assert len(batch.slice(4, 2)) == 0
+    assert len(batch.slice(-2)) == 2
+
+
+def test_aggregates():
+    batch = RecordBatch.from_rows([make_row(i) for i in range(4)])
+    assert batch.mean("temperature") == 11.5
+    assert batch.min("temperature") == 10.0
+    assert batch.max("temperature") == 13.0
+    assert RecordBatch.from_rows([]).mean("temperature") is None
+
+
+def test_compact_format():
+    batch = RecordBatch.from_rows([make_row(i) for i in range(3)])
+    compact = batch.to_compact()
+
+    assert compact["count"] == 3
+    assert compact["constants"]["city_name"] == "London"
+    assert "temperature" in compact["columns"]
+    codes = compact["columns"]["weather_main"]
+    assert [compact["dictionaries"]["weather_main"][code] for code in codes] == ["Rain", "Clouds", "Rain"]
+    assert set(compact["constants"]) | set(compact["columns"]) == set(FIELDS)
+    assert all(isinstance(value, float) for value in compact["columns"]["recorded_at"])
+
+
+def test_compact_recorded_at_is_epoch_when_constant():
+    row = make_row(0)
+    compact = RecordBatch.from_rows([row]).to_compact()
+    expected = datetime.fromisoformat(row["recorded_at"]).timestamp()
+    assert compact["constants"]["recorded_at"] == expected
+
+
+def test_to_arrow():
+    pa = pytest.importorskip("pyarrow")
+    rows = [make_row(i) for i in range(4)]
+    table = RecordBatch.from_rows(rows).slice(1).to_arrow()
+
+    assert table.num_rows == 3
+    assert table.column("temperature").to_pylist() == [11.0, 12.0, 13.0]
+    assert table.column("weather_main").type == pa.dictionary(pa.uint32(), pa.string())
+    assert table.column("weather_main").to_pylist() == ["Clouds", "Rain", "Clouds"]
+    assert table.column("recorded_at").to_pylist()[0] == datetime.fromisoformat(rows[1]["recorded_at"])
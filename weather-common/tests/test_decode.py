@@ -0,0 +1,32 @@
+import json
+import os
+import time
+from datetime import datetime, timezone
+import pytest
+from weather_common.decode import decode_current_weather, decode_history_item
+from weather_common.synthetic import SyntheticWeather, synthetic_cities
+
+DT = 1767225600  # 2026-01-01T00:00:00Z
+
+
+@pytest.fixture
+def host_timezone():
+    """Run the test with a non-UTC local timezone, restoring it afterwards"""
+    previous = os.environ.get("TZ")
+    os.environ["TZ"] = "America/New_York"
+    time.tzset()
+    yield
+    if previous is None:
+        del os.environ["TZ"]
+    else:
+        os.environ["TZ"] = previous
+    time.tzset()
+
+
+def test_recorded_at_is_utc_whatever_the_host_timezone(host_timezone):
+    city = synthetic_cities(1)[0]
+    payload = SyntheticWeather(0).current_payload(city, DT)
+    expected = datetime.fromtimestamp(DT, timezone.utc).isoformat()
+
+    assert decode_current_weather(json.dumps(payload)).record["recorded_at"] == expected
+    assert decode_history_item(payload, city.city_id)["recorded_at"] == expected
@@ -0,0 +1,56 @@
+from weather_common.columnar import RecordBatch, RecordBatchBuilder
+from weather_common.models import WeatherRecord
+from weather_common.conditions import (
+    CONDITIONS,
+    WeatherCondition,
+    condition_for,
+    weather_icon
+)
+from weather_common.quota import (
+    INTERACTIVE,
+    BACKGROUND,
+    QuotaExhaustedError,
+    UpstreamQuota
+)
+from weather_common.synthetic import (
+    SyntheticCity,
+    SyntheticWeather,
+    city_for_name,
+    synthetic_cities
+)
+from weather_common.decode import (
+    RECORD_FIELDS,
+    CITY_FIELDS,
+    DecodedObservation,
+    decode_current_weather,
+    decode_current_weather_batch,
+    decode_group_response,
+    decode_history_item,
+    expand_record
+)
+
+__all__ = [
+    "RecordBatch",
+    "RecordBatchBuilder",
+    "WeatherRecord",
+    "CONDITIONS",
+    "WeatherCondition",
+    "condition_for",
+    "weather_icon",
+    "INTERACTIVE",
+    "BACKGROUND",
+    "QuotaExhaustedError",
+    "UpstreamQuota",
+    "SyntheticCity",
+    "SyntheticWeather",
+    "city_for_name",
+    "synthetic_cities",
+    "RECORD_FIELDS",
+    "CITY_FIELDS",
+    "DecodedObservation",
+    "decode_current_weather",
+    "decode_current_weather_batch",
+    "decode_group_response",
+    "decode_history_item",
+    "expand_record"
+]
@@ -0,0 +1,297 @@
+from array import array
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Sequence
+
+# Integer columns, stored as signed 64-bit; id uses -1 for "not stored yet"
+INT_FIELDS = (
+    "id",
+    "city_id",
+    "pressure",
+    "humidity",
+    "wind_direction",
+    "cloudiness",
+    "visibility"
+)
+
+# Float columns, stored as 64-bit; recorded_at is epoch seconds
+FLOAT_FIELDS = (
+    "latitude",
+    "longitude",
+    "temperature",
+    "feels_like",
+    "temp_min",
+    "temp_max",
+    "wind_speed",
+    "recorded_at"
+)
+
+# Low-cardinality strings, stored as codes into a per-batch dictionary
+DICT_FIELDS = (
+    "city_name",
+    "country",
+    "weather_main",
+    "weather_description",
+    "weather_icon"
+)
+
+FIELDS = INT_FIELDS + FLOAT_FIELDS + DICT_FIELDS
+
+
+def _to_epoch(value) -> float:
+    """recorded_at as epoch seconds; naive values are local time, as produced by the decoder"""
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    return value.timestamp()
+
+
+def _epoch_json(value: float):
+    """Epoch seconds for JSON, as an integer when there is no fraction"""
+    return int(value) if value.is_integer() else value
+
+
+class RecordBatchBuilder:
+    """Accumulates weather observation rows (WeatherRecord layout) into column arrays"""
+
+    def __init__(self):
+        self._ints = {field: array("q") for field in INT_FIELDS}
+        self._floats = {field: array("d") for field in FLOAT_FIELDS}
+        self._codes = {field: array("I") for field in DICT_FIELDS}
+        self._dictionaries: Dict[str, List[str]] = {field: [] for field in DICT_FIELDS}
+        self._lookup: Dict[str, Dict[str, int]] = {field: {} for field in DICT_FIELDS}
+
+    def __len__(self) -> int:
+        return len(self._ints["city_id"])
+
+    def append(self, row: dict) -> None:
+        """
+        Add one row
+
+        Args:
+            row: weather_records_expanded row, or a decoded row after expand_record
+        """
+        for field in INT_FIELDS:
+            value = row.get(field)
+            self._ints[field].append(-1 if value is None else int(value))
+        for field in FLOAT_FIELDS:
+            value = row[field]
+            self._floats[field].append(_to_epoch(value) if field == "recorded_at" else float(value))
+        for field in DICT_FIELDS:
+            value = row[field]
+            lookup = self._lookup[field]
+            code = lookup.get(value)
+            if code is None:
+                code = lookup[value] = len(self._dictionaries[field])
+                self._dictionaries[field].append(value)
+            self._codes[field].append(code)
+
+    def extend(self, rows: Iterable[dict]) -> None:
+        """Add many rows"""
+        for row in rows:
+            self.append(row)
+
+    def finish(self) -> "RecordBatch":
+        """Freeze the accumulated rows into a RecordBatch"""
+        columns = {}
+        columns.update({field: memoryview(values) for field, values in self._ints.items()})
+        columns.update({field: memoryview(values) for field, values in self._floats.items()})
+        columns.update({field: memoryview(values) for field, values in self._codes.items()})
+        return RecordBatch(len(self), columns, self._dictionaries)
+
+
+class RecordBatch:
+    """
+    Columnar batch of weather observations.
+
+    Numeric fields are typed arrays; city_name, country and the condition
+    strings are dictionary encoded. Batches are immutable, and slice() shares
+    the parent's buffers and dictionaries instead of copying. Use to_rows(),
+    to_columns() or to_arrow() at the edges.
+    """
+
+    def __init__(
+        self,
+        length: int,
+        columns: Dict[str, memoryview],
+        dictionaries: Dict[str, List[str]]
+    ):
+        self.length = length
+        self.columns = columns
+        self.dictionaries = dictionaries
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[dict]) -> "RecordBatch":
+        """
+        Build a batch from observation rows in the WeatherRecord layout
+
+        Args:
+            rows: Row dicts, e.g. from the weather_records_expanded view
+
+        Returns:
+            RecordBatch holding the rows
+        """
+        builder = RecordBatchBuilder()
+        builder.extend(rows)
+        return builder.finish()
+
+    def __len__(self) -> int:
+        return self.length
+
+    def slice(self, start: int, stop: Optional[int] = None) -> "RecordBatch":
+        """
+        Zero-copy view of a contiguous range of rows
+
+        Args:
+            start: First row
+            stop: One past the last row (defaults to the end)
+
+        Returns:
+            RecordBatch sharing this batch's buffers
+        """
+        start, stop, _ = slice(start, stop).indices(self.length)
+        stop = max(start, stop)
+        columns = {field: view[start:stop] for field, view in self.columns.items()}
+        return RecordBatch(stop - start, columns, self.dictionaries)
+
+    def column(self, field: str) -> Sequence:
+        """
+        Values of one field, decoded
+
+        Args:
+            field: Field name
+
+        Returns:
+            Typed view for numeric fields, list of strings for encoded fields
+        """
+        if field in DICT_FIELDS:
+            dictionary = self.dictionaries[field]
+            return [dictionary[code] for code in self.columns[field]]
+        return self.columns[field]
+
+    def is_constant(self, field: str) -> bool:
+        """Whether every row has the same value for a field"""
+        view = self.columns[field]
+        return len(view) == 0 or all(value == view[0] for value in view)
+
+    def mean(self, field: str) -> Optional[float]:
+        """Mean of a numeric field, or None for an empty batch"""
+        view = self.columns[field]
+        return sum(view) / len(view) if len(view) else None
+
+    def min(self, field: str) -> Optional[float]:
+        """Minimum of a numeric field, or None for an empty batch"""
+        view = self.columns[field]
+        return min(view) if len(view) else None
+
+    def max(self, field: str) -> Optional[float]:
+        """Maximum of a numeric field, or None for an empty batch"""
+        view = self.columns[field]
+        return max(view) if len(view) else None
+
+    def mode(self, field: str) -> Optional[str]:
+        """Most common value of a dictionary-encoded field, counted on codes"""
+        view = self.columns[field]
+        if not len(view):
+            return None
+        code, _ = Counter(view).most_common(1)[0]
+        return self.dictionaries[field][code]
+
+    def recorded_at(self, index: int) -> datetime:
+        """recorded_at of one row as an aware UTC datetime"""
+        return datetime.fromtimestamp(self.columns["recorded_at"][index], timezone.utc)
+
+    def to_columns(self) -> Dict[str, list]:
+        """JSON-friendly dict of field -> list of values (recorded_at as ISO strings)"""
+        result = {}
+        for field in FIELDS:
+            if field == "recorded_at":
+                result[field] = [self.recorded_at(i).isoformat() for i in range(self.length)]
+            elif field in DICT_FIELDS:
+                result[field] = self.column(field)
+            else:
+                result[field] = self.columns[field].tolist()
+        result["id"] = [None if value == -1 else value for value in result["id"]]
+        return result
+
+    def to_rows(self) -> List[dict]:
+        """List of row dicts, as returned by the database"""
+        columns = self.to_columns()
+        return [
+            {field: columns[field][i] for field in FIELDS}
+            for i in range(self.length)
+        ]
+
+    def to_compact(self) -> dict:
+        """
+        JSON-friendly compact form: fields that are constant across the batch
+        are sent once under "constants", the rest as per-field arrays with
+        encoded fields as codes into "dictionaries". recorded_at is always
+        epoch seconds, whether constant or a column.
+        """
+        constants = {}
+        columns = {}
+        dictionaries = {}
+        for field in FIELDS:
+            view = self.columns[field]
+            if self.length and self.is_constant(field):
+                value = view[0]
+                if field in DICT_FIELDS:
+                    value = self.dictionaries[field][value]
+                elif field == "recorded_at":
+                    value = _epoch_json(value)
+                elif field == "id" and value == -1:
+                    value = None
+                constants[field] = value
+                continue
+
+            values = view.tolist()
+            if field == "id":
+                values = [None if value == -1 else value for value in values]
+            elif field == "recorded_at":
+                values = [_epoch_json(value) for value in values]
+            elif field in DICT_FIELDS:
+                # Renumber so the dictionary only holds values used by this batch
+                used = {}
+                values = [used.setdefault(code, len(used)) for code in values]
+                dictionaries[field] = [self.dictionaries[field][code] for code in used]
+            columns[field] = values
+
+        return {
+            "format": "compact-v2",
+            "count": self.length,
+            "constants": constants,
+            "dictionaries": dictionaries,
+            "columns": columns
+        }
+
+    def to_arrow(self):
+        """
+        Convert to a pyarrow Table. Numeric columns wrap the existing buffers
+        without copying; encoded columns become Arrow dictionary arrays.
+        Requires pyarrow.
+        """
+        import pyarrow as pa
+        import pyarrow.compute as pc
+
+        arrays = {}
+        for field in INT_FIELDS:
+            arrays[field] = pa.Array.from_buffers(
+                pa.int64(), self.length, [None, pa.py_buffer(self.columns[field])]
+            )
+        for field in FLOAT_FIELDS:
+            values = pa.Array.from_buffers(
+                pa.float64(), self.length, [None, pa.py_buffer(self.columns[field])]
+            )
+            if field == "recorded_at":
+                # Round first: a safe cast refuses to drop sub-microsecond fractions
+                micros = pc.round(pc.multiply(values, 1_000_000))
+                values = pc.cast(micros, pa.int64()).cast(pa.timestamp("us", tz="UTC"))
+            arrays[field] = values
+        for field in DICT_FIELDS:
+            indices = pa.Array.from_buffers(
+                pa.uint32(), self.length, [None, pa.py_buffer(self.columns[field])]
+            )
+            arrays[field] = pa.DictionaryArray.from_arrays(
+                indices, pa.array(self.dictionaries[field], pa.string())
+            )
+        return pa.table(arrays)
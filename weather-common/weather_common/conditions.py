@@ -0,0 +1,99 @@
+from typing import Dict, NamedTuple
+
+
+class WeatherCondition(NamedTuple):
+    """One OpenWeatherMap weather condition code"""
+    id: int
+    main: str
+    description: str
+    icon: str
+
+    def row(self) -> dict:
+        """weather_conditions table row"""
+        return self._asdict()
+
+
+# OpenWeatherMap's published condition codes. weather_records stores only the
+# code (plus a day/night flag for the icon); supabase-schema.sql seeds the
+# weather_conditions lookup table from the same list.
+CONDITIONS: Dict[int, WeatherCondition] = {
+    condition.id: condition
+    for condition in [
+        WeatherCondition(200, "Thunderstorm", "thunderstorm with light rain", "11"),
+        WeatherCondition(201, "Thunderstorm", "thunderstorm with rain", "11"),
+        WeatherCondition(202, "Thunderstorm", "thunderstorm with heavy rain", "11"),
+        WeatherCondition(210, "Thunderstorm", "light thunderstorm", "11"),
+        WeatherCondition(211, "Thunderstorm", "thunderstorm", "11"),
+        WeatherCondition(212, "Thunderstorm", "heavy thunderstorm", "11"),
+        WeatherCondition(221, "Thunderstorm", "ragged thunderstorm", "11"),
+        WeatherCondition(230, "Thunderstorm", "thunderstorm with light drizzle", "11"),
+        WeatherCondition(231, "Thunderstorm", "thunderstorm with drizzle", "11"),
+        WeatherCondition(232, "Thunderstorm", "thunderstorm with heavy drizzle", "11"),
+        WeatherCondition(300, "Drizzle", "light intensity drizzle", "09"),
+        WeatherCondition(301, "Drizzle", "drizzle", "09"),
+        WeatherCondition(302, "Drizzle", "heavy intensity drizzle", "09"),
+        WeatherCondition(310, "Drizzle", "light intensity drizzle rain", "09"),
+        WeatherCondition(311, "Drizzle", "drizzle rain", "09"),
+        WeatherCondition(312, "Drizzle", "heavy intensity drizzle rain", "09"),
+        WeatherCondition(313, "Drizzle", "shower rain and drizzle", "09"),
+        WeatherCondition(314, "Drizzle", "heavy shower rain and drizzle", "09"),
+        WeatherCondition(321, "Drizzle", "shower drizzle", "09"),
+        WeatherCondition(500, "Rain", "light rain", "10"),
+        WeatherCondition(501, "Rain", "moderate rain", "10"),
+        WeatherCondition(502, "Rain", "heavy intensity rain", "10"),
+        WeatherCondition(503, "Rain", "very heavy rain", "10"),
+        WeatherCondition(504, "Rain", "extreme rain", "10"),
+        WeatherCondition(511, "Rain", "freezing rain", "13"),
+        WeatherCondition(520, "Rain", "light intensity shower rain", "09"),
+        WeatherCondition(521, "Rain", "shower rain", "09"),
+        WeatherCondition(522, "Rain", "heavy intensity shower rain", "09"),
+        WeatherCondition(531, "Rain", "ragged shower rain", "09"),
+        WeatherCondition(600, "Snow", "light snow", "13"),
+        WeatherCondition(601, "Snow", "snow", "13"),
+        WeatherCondition(602, "Snow", "heavy snow", "13"),
+        WeatherCondition(611, "Snow", "sleet", "13"),
+        WeatherCondition(612, "Snow", "light shower sleet", "13"),
+        WeatherCondition(613, "Snow", "shower sleet", "13"),
+        WeatherCondition(615, "Snow", "light rain and snow", "13"),
+        WeatherCondition(616, "Snow", "rain and snow", "13"),
+        WeatherCondition(620, "Snow", "light shower snow", "13"),
+        WeatherCondition(621, "Snow", "shower snow", "13"),
+        WeatherCondition(622, "Snow", "heavy shower snow", "13"),
+        WeatherCondition(701, "Mist", "mist", "50"),
+        WeatherCondition(711, "Smoke", "smoke", "50"),
+        WeatherCondition(721, "Haze", "haze", "50"),
+        WeatherCondition(731, "Dust", "sand/dust whirls", "50"),
+        WeatherCondition(741, "Fog", "fog", "50"),
+        WeatherCondition(751, "Sand", "sand", "50"),
+        WeatherCondition(761, "Dust", "dust", "50"),
+        WeatherCondition(762, "Ash", "volcanic ash", "50"),
+        WeatherCondition(771, "Squall", "squalls", "50"),
+        WeatherCondition(781, "Tornado", "tornado", "50"),
+        WeatherCondition(800, "Clear", "clear sky", "01"),
+        WeatherCondition(801, "Clouds", "few clouds", "02"),
+        WeatherCondition(802, "Clouds", "scattered clouds", "03"),
+        WeatherCondition(803, "Clouds", "broken clouds", "04"),
+        WeatherCondition(804, "Clouds", "overcast clouds", "04"),
+    ]
+}
+
+
+def condition_for(condition_id: int) -> WeatherCondition:
+    """
+    Look up a condition code, with a placeholder for codes not in the list
+
+    Args:
+        condition_id: OpenWeatherMap condition id
+
+    Returns:
+        WeatherCondition
+    """
+    condition = CONDITIONS.get(condition_id)
+    if condition is None:
+        return WeatherCondition(condition_id, "Unknown", "unknown", "50")
+    return condition
+
+
+def weather_icon(condition_id: int, is_day: bool) -> str:
+    """Icon code such as "10d" for a condition and time of day"""
+    return condition_for(condition_id).icon + ("d" if is_day else "n")
@@ -0,0 +1,177 @@
+from datetime import datetime, timezone
+from typing import Iterable, List, NamedTuple, Union
+from weather_common.conditions import condition_for, weather_icon
+
+try:
+    import orjson
+
+    def _loads(payload: Union[bytes, str]):
+        return orjson.loads(payload)
+except ImportError:
+    import json
+
+    def _loads(payload: Union[bytes, str]):
+        return json.loads(payload)
+
+
+# Column order of a weather_records row (without id and created_at). City
+# details live in cities and condition text in weather_conditions.
+RECORD_FIELDS = (
+    "city_id",
+    "temperature",
+    "feels_like",
+    "temp_min",
+    "temp_max",
+    "pressure",
+    "humidity",
+    "wind_speed",
+    "wind_direction",
+    "cloudiness",
+    "visibility",
+    "condition_id",
+    "is_day",
+    "recorded_at"
+)
+
+# Column order of a cities row (without id and created_at)
+CITY_FIELDS = ("city_id", "name", "country", "latitude", "longitude", "timezone")
+
+Payload = Union[bytes, str, dict]
+
+
+class DecodedObservation(NamedTuple):
+    """One current-weather observation as database-ready rows"""
+    record: dict
+    city: dict
+    dt: int
+
+
+def _record_row(city_id: int, data: dict) -> dict:
+    """weather_records row from an observation shaped like the current-weather payload"""
+    main = data["main"]
+    wind = data["wind"]
+    condition = data["weather"][0]
+    return {
+        "city_id": city_id,
+        "temperature": main["temp"],
+        "feels_like": main["feels_like"],
+        "temp_min": main["temp_min"],
+        "temp_max": main["temp_max"],
+        "pressure": main["pressure"],
+        "humidity": main["humidity"],
+        "wind_speed": wind["speed"],
+        # OpenWeatherMap omits these in calm or clear conditions
+        "wind_direction": wind.get("deg", 0),
+        "cloudiness": data["clouds"]["all"],
+        "visibility": data.get("visibility", 10000),
+        "condition_id": condition["id"],
+        "is_day": condition["icon"].endswith("d"),
+        "recorded_at": datetime.fromtimestamp(data["dt"], timezone.utc).isoformat()
+    }
+
+
+def decode_current_weather(payload: Payload) -> DecodedObservation:
+    """
+    Decode an OpenWeatherMap current-weather payload straight into the
+    weather_records and cities rows, without intermediate models.
+
+    Args:
+        payload: Raw response bytes/str, or an already parsed dict
+
+    Returns:
+        DecodedObservation with the record row, city row and upstream dt
+
+    Raises:
+        ValueError: If a required field is missing
+    """
+    data = payload if isinstance(payload, dict) else _loads(payload)
+
+    try:
+        coord = data["coord"]
+        city_id = data["id"]
+        record = _record_row(city_id, data)
+        city = {
+            "city_id": city_id,
+            "name": data["name"],
+            "country": data["sys"]["country"],
+            "latitude": coord["lat"],
+            "longitude": coord["lon"],
+            "timezone": data.get("timezone", 0)
+        }
+    except (KeyError, IndexError, TypeError) as e:
+        raise ValueError(f"Malformed weather payload: missing {e}") from e
+
+    return DecodedObservation(record, city, data["dt"])
+
+
+def decode_history_item(item: dict, city_id: int) -> dict:
+    """
+    Decode one observation from the history API's "list"
+
+    Args:
+        item: History observation (current-weather layout without city details)
+        city_id: City the observation belongs to
+
+    Returns:
+        weather_records row
+
+    Raises:
+        ValueError: If a required field is missing
+    """
+    try:
+        return _record_row(city_id, item)
+    except (KeyError, IndexError, TypeError) as e:
+        raise ValueError(f"Malformed history item: missing {e}") from e
+
+
+def expand_record(record: dict, city: dict) -> dict:
+    """
+    Join a weather_records row with its city and condition, giving the
+    WeatherRecord layout served by the weather_records_expanded view
+
+    Args:
+        record: weather_records row, as decoded or as returned on insert
+        city: cities row for record["city_id"]
+
+    Returns:
+        Row dict with city and condition details inlined
+    """
+    condition = condition_for(record["condition_id"])
+    expanded = {
+        "city_name": city["name"],
+        "country": city["country"],
+        "latitude": city["latitude"],
+        "longitude": city["longitude"],
+        "weather_main": condition.main,
+        "weather_description": condition.description,
+        "weather_icon": weather_icon(condition.id, record["is_day"])
+    }
+    expanded.update(record)
+    return expanded
+
+
+def decode_current_weather_batch(payloads: Iterable[Payload]) -> List[DecodedObservation]:
+    """
+    Decode many current-weather payloads
+
+    Args:
+        payloads: Raw response bodies or parsed dicts
+
+    Returns:
+        List of DecodedObservation in input order
+    """
+    return [decode_current_weather(payload) for payload in payloads]
+
+
+def decode_group_response(payload: Payload) -> List[DecodedObservation]:
+    """
+    Decode a multi-city response (the /group endpoint's {"list": [...]})
+
+    Args:
+        payload: Raw response bytes/str, or an already parsed dict
+
+    Returns:
+        List of DecodedObservation, one per city
+    """
+    data = payload if isinstance(payload, dict) else _loads(payload)
+    return [decode_current_weather(item) for item in data.get("list", [])]
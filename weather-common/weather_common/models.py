@@ -0,0 +1,31 @@
+from datetime import datetime
+from typing import Optional
+from pydantic import BaseModel
+
+
+class WeatherRecord(BaseModel):
+    """Database model for storing weather records"""
+    id: Optional[int] = None
+    city_id: int
+    city_name: str
+    country: str
+    latitude: float
+    longitude: float
+    temperature: float
+    feels_like: float
+    temp_min: float
+    temp_max: float
+    pressure: int
+    humidity: int
+    wind_speed: float
+    wind_direction: int
+    cloudiness: int
+    visibility: int
+    weather_main: str
+    weather_description: str
+    weather_icon: str
+    recorded_at: datetime
+    created_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
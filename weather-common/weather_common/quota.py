@@ -0,0 +1,135 @@
+import asyncio
+import threading
+from typing import Any, Optional
+
+INTERACTIVE = "interactive"
+BACKGROUND = "background"
+PRIORITIES = (INTERACTIVE, BACKGROUND)
+
+
+class QuotaExhaustedError(Exception):
+    """Raised when the shared upstream budget has no tokens for this priority"""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"Upstream request budget exhausted, retry in {retry_after:.1f}s")
+        self.retry_after = retry_after
+
+
+class UpstreamQuota:
+    """
+    Client for the shared OpenWeatherMap token bucket kept in Postgres
+    (upstream_quota table, take_upstream_tokens function).
+
+    The API service and the data pipeline draw from the same bucket. Background
+    callers cannot take the last `interactive_reserve` tokens, so collection
+    never starves user-facing requests. Tokens are claimed from the database
+    `chunk_size` at a time and spent locally, so most requests do not need a
+    database round trip; unspent tokens in a chunk are simply not returned.
+
+    If the database cannot be reached the quota fails open, so an outage of
+    the bookkeeping does not take the upstream calls down with it.
+    """
+
+    def __init__(
+        self,
+        supabase: Any,
+        priority: str,
+        bucket: str = "openweathermap",
+        chunk_size: int = 1
+    ):
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown quota priority: {priority}")
+        self.supabase = supabase
+        self.priority = priority
+        self.bucket = bucket
+        self.chunk_size = max(1, chunk_size)
+        self.remaining: Optional[float] = None
+        self._local = 0
+        self._lock = threading.Lock()
+
+    def try_acquire(self) -> float:
+        """
+        Take one token
+
+        Returns:
+            0.0 when granted, otherwise seconds until enough tokens refill
+        """
+        with self._lock:
+            if self._local > 0:
+                self._local -= 1
+                return 0.0
+
+            try:
+                response = self.supabase.rpc(
+                    "take_upstream_tokens",
+                    {
+                        "p_bucket": self.bucket,
+                        "p_tokens": self.chunk_size,
+                        "p_priority": self.priority
+                    }
+                ).execute()
+            except Exception as e:
+                print(f"Upstream quota unavailable, allowing request: {e}")
+                return 0.0
+
+            result = response.data or {}
+            if isinstance(result, list):
+                result = result[0] if result else {}
+            if not result:
+                # Bucket not configured
+                return 0.0
+
+            self.remaining = float(result["tokens"])
+            if not result["granted"]:
+                return max(float(result["retry_after"]), 0.1)
+
+            self._local = self.chunk_size - 1
+            return 0.0
+
+    def acquire(self) -> None:
+        """
+        Take one token or fail immediately
+
+        Raises:
+            QuotaExhaustedError: When no token is available for this priority
+        """
+        retry_after = self.try_acquire()
+        if retry_after:
+            raise QuotaExhaustedError(retry_after)
+
+    async def wait(self, max_wait: Optional[float] = None) -> None:
+        """
+        Take one token, sleeping until the bucket refills
+
+        Args:
+            max_wait: Give up after this many seconds in total
+
+        Raises:
+            QuotaExhaustedError: When max_wait is exceeded
+        """
+        waited = 0.0
+        while True:
+            if self._local > 0:
+                retry_after = self.try_acquire()
+            else:
+                retry_after = await asyncio.to_thread(self.try_acquire)
+            if not retry_after:
+                return
+            if max_wait is not None and waited + retry_after > max_wait:
+                raise QuotaExhaustedError(retry_after)
+            await asyncio.sleep(retry_after)
+            waited += retry_after
+
+    def status(self) -> dict:
+        """
+        Current state of the shared bucket
+
+        Returns:
+            Row from get_upstream_quota: capacity, tokens, refill rate, reserve
+            and cumulative grant/deny counters per priority
+        """
+        response = self.supabase.rpc("get_upstream_quota", {"p_bucket": self.bucket}).execute()
+        result = response.data or {}
+        if isinstance(result, list):
+            result = result[0] if result else {}
+        return result
@@ -0,0 +1,273 @@
+import hashlib
+import math
+from datetime import datetime, timedelta, timezone
+from typing import Iterator, List, NamedTuple, Optional, Sequence
+from weather_common.conditions import condition_for, weather_icon
+
+# Synthetic cities get ids far above the OpenWeatherMap range so seeded rows
+# never collide with real ones
+SYNTHETIC_CITY_ID_BASE = 90_000_000
+
+_MASK = (1 << 64) - 1
+_COUNTRIES = ["GB", "FR", "DE", "ES", "IT", "US", "CA", "BR", "JP", "IN", "AU", "ZA", "NG", "AR", "SE"]
+
+
+class SyntheticCity(NamedTuple):
+    """City the generator produces weather for"""
+    city_id: int
+    name: str
+    country: str
+    latitude: float
+    longitude: float
+    timezone: int
+
+    def row(self) -> dict:
+        """cities table row"""
+        return self._asdict()
+
+
+# Real coordinates for the cities the frontend uses by default
+KNOWN_CITIES = {
+    city.name.lower(): city
+    for city in [
+        SyntheticCity(2643743, "London", "GB", 51.5085, -0.1257, 0),
+        SyntheticCity(2988507, "Paris", "FR", 48.8534, 2.3488, 3600),
+        SyntheticCity(1850144, "Tokyo", "JP", 35.6895, 139.6917, 32400),
+        SyntheticCity(5128581, "New York", "US", 40.7143, -74.006, -18000),
+        SyntheticCity(2147714, "Sydney", "AU", -33.8679, 151.2073, 36000),
+    ]
+}
+
+
+def _mix(value: int) -> int:
+    """splitmix64 finalizer: a fast, well-distributed integer hash"""
+    value = (value + 0x9E3779B97F4A7C15) & _MASK
+    value = ((value ^ (value >> 30)) * 0xBF58476D1CE4E5B9) & _MASK
+    value = ((value ^ (value >> 27)) * 0x94D049BB133111EB) & _MASK
+    return value ^ (value >> 31)
+
+
+def _unit(*parts: int) -> float:
+    """Deterministic value in [-1, 1) for a tuple of integers"""
+    value = 0
+    for part in parts:
+        value = _mix(value ^ (part & _MASK))
+    return (value >> 11) / (1 << 52) - 1.0
+
+
+def city_for_name(name: str) -> SyntheticCity:
+    """
+    Stable synthetic city for any name; known cities keep their real ids and
+    coordinates
+
+    Args:
+        name: City name, optionally with ",country"
+
+    Returns:
+        SyntheticCity
+    """
+    base = name.split(",")[0].strip()
+    known = KNOWN_CITIES.get(base.lower())
+    if known:
+        return known
+
+    digest = int.from_bytes(hashlib.blake2b(base.lower().encode(), digest_size=8).digest(), "big")
+    latitude = round(-55 + (digest % 12_500) / 100, 4)
+    longitude = round(-180 + (digest >> 16) % 36_000 / 100, 4)
+    return SyntheticCity(
+        city_id=SYNTHETIC_CITY_ID_BASE + digest % 10_000_000,
+        name=base.title() or "Unknown",
+        country=_COUNTRIES[(digest >> 40) % len(_COUNTRIES)],
+        latitude=latitude,
+        longitude=longitude,
+        timezone=round(longitude / 15) * 3600
+    )
+
+
+def synthetic_cities(count: int, seed: int = 0) -> List[SyntheticCity]:
+    """
+    Deterministic set of cities spread over the inhabited latitudes
+
+    Args:
+        count: Number of cities
+        seed: Changes the layout
+
+    Returns:
+        List of SyntheticCity with ids from SYNTHETIC_CITY_ID_BASE
+    """
+    cities = []
+    for index in range(count):
+        latitude = round(_unit(seed, index, 1) * 55 + 10, 4)
+        longitude = round(_unit(seed, index, 2) * 180, 4)
+        cities.append(SyntheticCity(
+            city_id=SYNTHETIC_CITY_ID_BASE + index,
+            name=f"Synthetic City {index:05d}",
+            country=_COUNTRIES[index % len(_COUNTRIES)],
+            latitude=latitude,
+            longitude=longitude,
+            timezone=round(longitude / 15) * 3600
+        ))
+    return cities
+
+
+class SyntheticWeather:
+    """
+    Deterministic weather: a latitude-dependent seasonal cycle, a diurnal
+    cycle in local solar time, and smooth noise interpolated between hourly
+    knots. The same (seed, city, timestamp) always gives the same observation,
+    so demo responses are stable and seeded databases are reproducible.
+    """
+
+    def __init__(self, seed: int = 0):
+        self.seed = seed
+
+    def _noise(self, city_id: int, channel: int, ts: float) -> float:
+        """Smooth noise in [-1, 1) varying over a few hours"""
+        hour, fraction = divmod(ts / 3600, 1)
+        hour = int(hour)
+        a = _unit(self.seed, city_id, channel, hour)
+        b = _unit(self.seed, city_id, channel, hour + 1)
+        weight = fraction * fraction * (3 - 2 * fraction)
+        return a + (b - a) * weight
+
+    def observation(self, city: SyntheticCity, ts: float) -> dict:
+        """
+        weather_records row for a city at a unix timestamp
+
+        Args:
+            city: City to generate for
+            ts: Unix timestamp (UTC)
+
+        Returns:
+            Row dict with the same fields as decode_current_weather's record
+        """
+        abs_lat = abs(city.latitude)
+        day_of_year = (ts / 86400) % 365.25
+        # Warmest around day 200 in the north, day 17 in the south
+        peak = 200 if city.latitude >= 0 else 17
+        seasonal = math.cos(2 * math.pi * (day_of_year - peak) / 365.25)
+        local_hour = (ts / 3600 + city.longitude / 15) % 24
+        diurnal = math.cos(2 * math.pi * (local_hour - 15) / 24)
+
+        mean_temp = 27 - 0.3 * abs_lat
+        seasonal_amp = 0.15 * abs_lat
+        diurnal_amp = 4 + 0.05 * abs_lat
+        noise = self._noise(city.city_id, 1, ts)
+        temperature = mean_temp + seasonal_amp * seasonal + diurnal_amp * diurnal + 3 * noise
+
+        humidity = int(min(100, max(15, 70 - 15 * diurnal + 20 * self._noise(city.city_id, 2, ts))))
+        cloud_signal = self._noise(city.city_id, 3, ts)
+        cloudiness = int(min(100, max(0, 50 + 60 * cloud_signal)))
+        wind_speed = round(abs(self._noise(city.city_id, 4, ts)) * 9 + 0.5, 2)
+        pressure = int(1013 + 12 * self._noise(city.city_id, 5, ts) - 4 * cloud_signal)
+        wind_direction = int((_unit(self.seed, city.city_id, 6, int(ts // 10800)) + 1) * 180) % 360
+
+        if cloudiness > 85 and humidity > 75:
+            # Light snow or light rain
+            condition_id = 600 if temperature < 0 else 500
+        elif cloudiness > 50:
+            condition_id = 803  # broken clouds
+        elif cloudiness > 10:
+            condition_id = 801  # few clouds
+        else:
+            condition_id = 800  # clear sky
+
+        return {
+            "city_id": city.city_id,
+            "temperature": round(temperature, 2),
+            "feels_like": round(temperature - wind_speed * 0.4 + (humidity - 50) * 0.03, 2),
+            "temp_min": round(temperature - 1.5, 2),
+            "temp_max": round(temperature + 1.5, 2),
+            "pressure": pressure,
+            "humidity": humidity,
+            "wind_speed": wind_speed,
+            "wind_direction": wind_direction,
+            "cloudiness": cloudiness,
+            "visibility": 10000 if cloudiness < 80 else 6000,
+            "condition_id": condition_id,
+            "is_day": 6 <= local_hour < 18,
+            "recorded_at": datetime.fromtimestamp(ts, timezone.utc).isoformat()
+        }
+
+    def current_payload(self, city: SyntheticCity, ts: float) -> dict:
+        """
+        Upstream-shaped /weather payload for a city at a unix timestamp
+
+        Args:
+            city: City to generate for
+            ts: Unix timestamp (UTC)
+
+        Returns:
+            Dict shaped like an OpenWeatherMap current weather response
+        """
+        record = self.observation(city, ts)
+        condition = condition_for(record["condition_id"])
+        midnight = int(ts - (ts + city.timezone) % 86400)
+        day_length = 12 + 4 * math.sin(math.radians(city.latitude)) * math.cos(
+            2 * math.pi * ((ts / 86400) % 365.25 - 172) / 365.25
+        )
+        return {
+            "coord": {"lon": city.longitude, "lat": city.latitude},
+            "weather": [{
+                "id": condition.id,
+                "main": condition.main,
+                "description": condition.description,
+                "icon": weather_icon(condition.id, record["is_day"])
+            }],
+            "base": "stations",
+            "main": {
+                "temp": record["temperature"],
+                "feels_like": record["feels_like"],
+                "temp_min": record["temp_min"],
+                "temp_max": record["temp_max"],
+                "pressure": record["pressure"],
+                "humidity": record["humidity"]
+            },
+            "visibility": record["visibility"],
+            "wind": {"speed": record["wind_speed"], "deg": record["wind_direction"]},
+            "clouds": {"all": record["cloudiness"]},
+            "dt": int(ts),
+            "sys": {
+                "country": city.country,
+                "sunrise": int(midnight + (12 - day_length / 2) * 3600),
+                "sunset": int(midnight + (12 + day_length / 2) * 3600)
+            },
+            "timezone": city.timezone,
+            "id": city.city_id,
+            "name": city.name,
+            "cod": 200
+        }
+
+    def records(
+        self,
+        cities: Sequence[SyntheticCity],
+        start: datetime,
+        end: datetime,
+        step: timedelta = timedelta(minutes=30),
+        jitter_seconds: Optional[int] = None
+    ) -> Iterator[dict]:
+        """
+        weather_records rows for every city at every step in [start, end)
+
+        Args:
+            cities: Cities to generate for
+            start: First timestamp (aware)
+            end: End of the range (aware, exclusive)
+            step: Time between observations
+            jitter_seconds: Shift each observation by up to this many seconds,
+                like real collection timing; defaults to none
+
+        Returns:
+            Iterator of row dicts, ordered by time then city
+        """
+        first = start.timestamp()
+        last = end.timestamp()
+        step_seconds = step.total_seconds()
+        ts = first
+        while ts < last:
+            for city in cities:
+                at = ts
+                if jitter_seconds:
+                    at += int((_unit(self.seed, city.city_id, 7, int(ts)) + 1) / 2 * jitter_seconds)
+                yield self.observation(city, at)
+            ts += step_seconds